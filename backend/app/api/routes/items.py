@@ -6,6 +6,7 @@ from sqlmodel import func, select
 
 from app.api.deps import CurrentUser, SessionDep
 from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app.modules.crud_ops import delete_owned, record_exists, update_owned
 
 router = APIRouter(prefix="/items", tags=["items"])
 
@@ -79,17 +80,17 @@ def update_item(
     """
     Update an item.
     """
-    item = session.get(Item, id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
-        raise HTTPException(status_code=400, detail="Not enough permissions")
+    owner_id = None if current_user.is_superuser else current_user.id
     update_dict = item_in.model_dump(exclude_unset=True)
-    item.sqlmodel_update(update_dict)
-    session.add(item)
+    item = update_owned(session, Item, id, update_dict, owner_id=owner_id)
+    if item is None:
+        if not record_exists(session, Item, id):
+            raise HTTPException(status_code=404, detail="Item not found")
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    # Serialize before commit so the expired instance isn't reloaded
+    item_public = ItemPublic.model_validate(item)
     session.commit()
-    session.refresh(item)
-    return item
+    return item_public
 
 
 @router.delete("/{id}")
@@ -99,11 +100,10 @@ def delete_item(
     """
     Delete an item.
     """
-    item = session.get(Item, id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
+    owner_id = None if current_user.is_superuser else current_user.id
+    if not delete_owned(session, Item, id, owner_id=owner_id):
+        if not record_exists(session, Item, id):
+            raise HTTPException(status_code=404, detail="Item not found")
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
     session.commit()
     return Message(message="Item deleted successfully")
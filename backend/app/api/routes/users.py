@@ -1,8 +1,8 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlmodel import func, select
 
 from app import crud
 from app.api.deps import (
@@ -13,7 +13,6 @@ from app.api.deps import (
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.models import (
-    Item,
     Message,
     UpdatePassword,
     User,
@@ -24,6 +23,7 @@ from app.models import (
     UserUpdate,
     UserUpdateMe,
 )
+from app.modules.core import purge
 from app.utils import generate_new_account_email, send_email
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -126,7 +126,9 @@ def read_user_me(current_user: CurrentUser) -> Any:
 
 
 @router.delete("/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+def delete_user_me(
+    session: SessionDep, current_user: CurrentUser, background_tasks: BackgroundTasks
+) -> Any:
     """
     Delete own user.
     """
@@ -134,9 +136,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    session.delete(current_user)
-    session.commit()
-    return Message(message="User deleted successfully")
+    return _delete_user(session, current_user, background_tasks)
 
 
 @router.post("/signup", response_model=UserPublic)
@@ -207,7 +207,10 @@ def update_user(
 
 @router.delete("/{user_id}", dependencies=[Depends(get_current_active_superuser)])
 def delete_user(
-    session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
 ) -> Message:
     """
     Delete a user.
@@ -219,8 +222,19 @@ def delete_user(
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    statement = delete(Item).where(col(Item.owner_id) == user_id)
-    session.exec(statement)  # type: ignore
-    session.delete(user)
-    session.commit()
+    return _delete_user(session, user, background_tasks)
+
+
+def _delete_user(
+    session: SessionDep, user: User, background_tasks: BackgroundTasks
+) -> Message:
+    """
+    Delete a user, relying on ON DELETE CASCADE for owned rows. Users owning
+    very many rows are deactivated and purged in batches in the background.
+    """
+    if purge.should_purge_async(session, user.id):
+        purge.deactivate_user(session, user)
+        background_tasks.add_task(purge.purge_user, user.id)
+        return Message(message="User deletion scheduled")
+    purge.delete_user(session, user)
     return Message(message="User deleted successfully")
@@ -93,6 +93,37 @@ class Settings(BaseSettings):
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # 模块迁移是否在单个事务中执行（每个迁移一个 savepoint，迁移与记录一起提交）
+    MODULE_MIGRATIONS_TRANSACTIONAL: bool = True
+
+    # 删除用户时，子记录超过该数量则改为后台分批清理
+    USER_PURGE_ASYNC_THRESHOLD: int = 10000
+    USER_PURGE_BATCH_SIZE: int = 1000
+
+    # 软删除墓碑压缩：保留期、批量大小以及低峰窗口（UTC小时，左闭右开）
+    SOFT_DELETE_COMPACTION_ENABLED: bool = True
+    SOFT_DELETE_RETENTION_HOURS: int = 24 * 7
+    SOFT_DELETE_COMPACTION_BATCH_SIZE: int = 500
+    SOFT_DELETE_COMPACTION_PAUSE_SECONDS: float = 0.2
+    SOFT_DELETE_COMPACTION_INTERVAL_SECONDS: int = 600
+    SOFT_DELETE_COMPACTION_START_HOUR: int = 2
+    SOFT_DELETE_COMPACTION_END_HOUR: int = 5
+
+    # 请求埋点：/metrics 指标输出与慢查询日志阈值（毫秒）
+    METRICS_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200.0
+
+    # N+1 检测（仅本地模式）：超出路由查询预算或同一 SQL 重复执行时告警或抛出异常
+    QUERY_BUDGET_MODE: Literal["off", "warn", "raise"] = "warn"
+    QUERY_BUDGET_DEFAULT: int = 10
+    QUERY_REPEAT_THRESHOLD: int = 5
+
+    # 采样分析：worker 级采样间隔与最长运行时间，请求级（X-Profile 头）采样间隔
+    PROFILING_ENABLED: bool = True
+    PROFILING_INTERVAL_MS: float = 5.0
+    PROFILING_MAX_SECONDS: int = 300
+    PROFILING_REQUEST_INTERVAL_MS: float = 1.0
+
     EMAIL_TEST_USER: EmailStr = "test@example.com"
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
@@ -0,0 +1,270 @@
+"""
+请求耗时与数据库查询埋点
+
+- ASGI 中间件：按路由统计请求耗时直方图，响应附带 Server-Timing 头
+- SQLAlchemy 引擎事件：统计每个请求的查询次数与耗时，记录慢查询及发起它的路由
+- /metrics 以 Prometheus 文本格式输出
+  指标保存在各进程内存中，多 worker 部署时（Dockerfile 中 --workers 4）一次抓取只返回
+  应答该请求的 worker 的数据；需要全量数据时按 worker 分别暴露端口抓取，
+  或改用 prometheus_client 的 multiprocess 目录模式
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """带标签的累积直方图（Prometheus 语义）"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float],
+        label_names: Sequence[str],
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # {标签值: [各桶计数..., +Inf 计数, 总和]}
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            base = ",".join(
+                f'{k}="{v}"' for k, v in zip(self.label_names, labels, strict=True)
+            )
+            sep = "," if base else ""
+            cumulative = 0.0
+            for bound, count in zip(
+                self.buckets, series[: len(self.buckets)], strict=True
+            ):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative:g}'
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cumulative:g}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative:g}")
+        return lines
+
+
+class Counter:
+    """带标签的计数器"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ",".join(
+                f'{k}="{v}"' for k, v in zip(self.label_names, labels, strict=True)
+            )
+            lines.append(f"{self.name}{{{base}}} {value:g}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    LATENCY_BUCKETS,
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "DB queries issued per HTTP request",
+    QUERY_COUNT_BUCKETS,
+    ("method", "route"),
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "DB query latency by issuing route",
+    LATENCY_BUCKETS,
+    ("route",),
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "Queries slower than SLOW_QUERY_MS",
+    ("route",),
+)
+
+METRICS = [REQUEST_LATENCY, REQUEST_QUERIES, QUERY_LATENCY, SLOW_QUERIES]
+
+
+def register_metric(metric):
+    """模块自定义指标加入 /metrics 输出"""
+    METRICS.append(metric)
+    return metric
+
+
+@dataclass
+class RequestStats:
+    """单个请求的统计，经 contextvar 传递到线程池中的同步处理函数"""
+
+    route: str
+    query_count: int = 0
+    query_seconds: float = 0.0
+    # 每条 SQL 的执行次数，用于发现 N+1
+    statements: Dict[str, int] = field(default_factory=dict)
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def render_metrics() -> str:
+    """Prometheus 文本格式输出所有指标"""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== 数据库查询埋点 =====
+def _before_cursor_execute(
+    conn, _cursor, _statement, _parameters, _context, _executemany
+):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _handle_error(context):
+    """执行失败的查询不会触发 after_cursor_execute，在这里弹出它的开始时间"""
+    conn = context.connection
+    if (
+        conn is not None
+        and context.execution_context is not None
+        and conn.info.get("query_start")
+    ):
+        conn.info["query_start"].pop()
+
+
+def _after_cursor_execute(
+    conn, _cursor, statement, _parameters, _context, _executemany
+):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    route = stats.route if stats else "-"
+    if stats:
+        stats.query_count += 1
+        stats.query_seconds += elapsed
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+    QUERY_LATENCY.observe(elapsed, route)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(route)
+        logger.warning(
+            f"慢查询 {elapsed * 1000:.1f}ms [{route}]: {' '.join(statement.split())[:500]}"
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为引擎注册查询计时事件（重复调用安全）"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ===== 请求埋点中间件 =====
+def _route_template(scope: Scope) -> str:
+    """
+    返回匹配到的路由模板（如 /api/v1/items/{id}），避免以具体 ID 作为标签
+    在进入路由之前解析，使处理过程中的查询也能归到正确的路由
+    """
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", []):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return getattr(candidate, "path", scope["path"])
+    return "unmatched"
+
+
+class InstrumentationMiddleware:
+    """纯 ASGI 中间件：统计耗时与查询数并写入 Server-Timing 头"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = RequestStats(route=_route_template(scope))
+        token = _request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                server_timing = (
+                    f"app;dur={elapsed_ms:.1f}, "
+                    f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.query_count} queries"'
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            method = scope["method"]
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start, method, stats.route, str(status_code)
+            )
+            REQUEST_QUERIES.observe(stats.query_count, method, stats.route)
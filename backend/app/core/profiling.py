@@ -0,0 +1,256 @@
+"""
+采样分析器
+后台线程定期读取所有线程的调用栈（sys._current_frames），聚合为 folded stacks 格式
+（每行 "帧;帧;帧 次数"），可直接导入 speedscope 或用 flamegraph.pl 生成火焰图。
+
+- worker 级：超级用户通过 /profiling/start、/profiling/stop 在当前 worker 上启停
+- 请求级：超级用户的请求带上 X-Profile 头时，响应替换为该请求期间的采样结果
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+# 栈顶为这些函数的线程处于空闲等待（事件循环 select、线程池取任务等），默认不计入
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """按固定间隔采样所有线程调用栈的分析器"""
+
+    def __init__(
+        self,
+        interval_ms: float = 5.0,
+        max_seconds: Optional[float] = None,
+        include_idle: bool = False,
+    ):
+        if interval_ms <= 0:
+            # 间隔为 0 时采样线程会空转占满一个核
+            raise ValueError("interval_ms 必须大于 0")
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def duration_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own_id)
+            if self.max_seconds and self.duration_seconds >= self.max_seconds:
+                logger.warning(f"采样分析已运行 {self.max_seconds}s，自动停止")
+                break
+        self.stopped_at = time.perf_counter()
+
+    def sample(self, skip_thread: Optional[int] = None) -> None:
+        """采集一次所有线程的调用栈"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            code = frame.f_code
+            if (
+                not self.include_idle
+                and (Path(code.co_filename).name, code.co_name) in IDLE_FRAMES
+            ):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """folded stacks 格式输出，按次数降序"""
+        return (
+            "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+            + "\n"
+        )
+
+    def summary(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "running": self.running,
+            "samples": self.samples,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "interval_ms": self.interval * 1000,
+            "top": [
+                {"frame": stack.rsplit(";", 1)[-1], "count": count}
+                for stack, count in self.stacks.most_common(10)
+            ],
+        }
+
+
+# ===== worker 级分析 =====
+_worker_profiler: Optional[SamplingProfiler] = None
+_worker_lock = threading.Lock()
+
+
+def start_worker_profiler(interval_ms: Optional[float] = None) -> SamplingProfiler:
+    """在当前 worker 上启动采样，已在运行时抛出 409"""
+    global _worker_profiler
+    with _worker_lock:
+        if _worker_profiler is not None and _worker_profiler.running:
+            raise HTTPException(status_code=409, detail="Profiler already running")
+        _worker_profiler = SamplingProfiler(
+            interval_ms=interval_ms or settings.PROFILING_INTERVAL_MS,
+            max_seconds=settings.PROFILING_MAX_SECONDS,
+        )
+        _worker_profiler.start()
+        logger.info(f"worker {os.getpid()} 开始采样分析")
+        return _worker_profiler
+
+
+def stop_worker_profiler() -> SamplingProfiler:
+    with _worker_lock:
+        if _worker_profiler is None:
+            raise HTTPException(status_code=404, detail="Profiler has not been started")
+        _worker_profiler.stop()
+        logger.info(
+            f"worker {os.getpid()} 停止采样分析，共 {_worker_profiler.samples} 次采样"
+        )
+        return _worker_profiler
+
+
+def get_worker_profiler() -> SamplingProfiler:
+    if _worker_profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler has not been started")
+    return _worker_profiler
+
+
+# ===== 请求级分析 =====
+def _authorize_superuser(token: str) -> None:
+    """复用 get_current_user / get_current_active_superuser 校验令牌"""
+    from app.api.deps import get_current_active_superuser, get_current_user
+
+    with Session(engine) as session:
+        get_current_active_superuser(get_current_user(session, token))
+
+
+class ProfilingMiddleware:
+    """
+    请求带 X-Profile 头时，对该请求采样并以 folded stacks 文本替换响应，
+    原响应状态码放在 X-Profile-Status 头中。仅超级用户可用。
+    采样覆盖 worker 内所有非空闲线程，并发请求较多时结果会包含其他请求。
+    采样持续到响应体发送完毕；SSE 等不会结束的事件流不做采样，原样返回
+    （X-Profile-Status: skipped）。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if PROFILE_HEADER not in headers:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = headers.get(b"authorization", b"").decode()
+        scheme, _, token = authorization.partition(" ")
+        try:
+            if scheme.lower() != "bearer" or not token:
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            await run_in_threadpool(_authorize_superuser, token)
+        except HTTPException as e:
+            await JSONResponse({"detail": e.detail}, status_code=e.status_code)(
+                scope, receive, send
+            )
+            return
+
+        status_code = 500
+        passthrough = False
+        profiler = SamplingProfiler(interval_ms=settings.PROFILING_REQUEST_INTERVAL_MS)
+
+        async def capture(message: Message) -> None:
+            nonlocal status_code, passthrough
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(
+                    b"content-type", b""
+                )
+                if content_type.startswith(b"text/event-stream"):
+                    passthrough = True
+                    profiler.stop()
+                    headers = [
+                        *message.get("headers", []),
+                        (b"x-profile-status", b"skipped"),
+                    ]
+                    message = {**message, "headers": headers}
+            if passthrough:
+                await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.stop()
+        if passthrough:
+            return
+
+        response = PlainTextResponse(
+            profiler.folded(),
+            headers={
+                "X-Profile-Status": str(status_code),
+                "X-Profile-Samples": str(profiler.samples),
+                "X-Profile-Duration-Ms": f"{profiler.duration_seconds * 1000:.1f}",
+            },
+        )
+        await response(scope, receive, send)
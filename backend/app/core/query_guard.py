@@ -0,0 +1,125 @@
+"""
+N+1 查询检测
+按路由设置每个请求的查询预算，并检测同一条 SQL 在一个请求内被重复执行（典型的 N+1，
+如序列化时逐行触发 User.items / TradingView.owner 的懒加载）。
+
+- QueryBudgetMiddleware：本地开发模式下启用，超出预算时告警（warn）或抛出异常（raise）
+- count_queries / assert_query_budget：测试中直接统计一段代码发出的查询
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.instrumentation import RequestStats, current_request_stats
+
+logger = logging.getLogger(__name__)
+
+# 按 "METHOD 路由模板" 设置的查询预算，未列出的路由使用 QUERY_BUDGET_DEFAULT
+# 路由模板带 API_V1_STR 前缀（与注册路由时一致）；认证依赖本身会查询一次当前用户
+ROUTE_QUERY_BUDGETS: Dict[str, int] = {
+    f"GET {settings.API_V1_STR}/items/": 3,
+    f"GET {settings.API_V1_STR}/items/{{id}}": 2,
+    f"GET {settings.API_V1_STR}/tradingview/": 3,
+    f"GET {settings.API_V1_STR}/tradingview/{{id}}": 2,
+    f"GET {settings.API_V1_STR}/tradingview/search": 3,
+    f"GET {settings.API_V1_STR}/tradingview/stats": 4,
+    f"GET {settings.API_V1_STR}/users/": 3,
+    f"GET {settings.API_V1_STR}/users/me": 1,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """请求的查询数超出预算，或出现重复执行的同一条 SQL"""
+
+
+def route_budget(method: str, route: str) -> int:
+    return ROUTE_QUERY_BUDGETS.get(f"{method} {route}", settings.QUERY_BUDGET_DEFAULT)
+
+
+def find_violations(stats: RequestStats, budget: int) -> List[str]:
+    """返回超预算与重复查询的描述，没有问题时返回空列表"""
+    violations = []
+    if stats.query_count > budget:
+        violations.append(f"查询 {stats.query_count} 次，超出预算 {budget}")
+    for statement, count in stats.statements.items():
+        if count >= settings.QUERY_REPEAT_THRESHOLD:
+            violations.append(f"同一查询执行 {count} 次（疑似 N+1）: {statement[:200]}")
+    return violations
+
+
+class QueryBudgetMiddleware:
+    """
+    本地模式的查询预算检查，依赖 InstrumentationMiddleware 采集的请求统计，
+    需添加在它之前（即位于其内层）
+    """
+
+    def __init__(self, app: ASGIApp, mode: Optional[str] = None):
+        self.app = app
+        self.mode = mode
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+        stats = current_request_stats()
+        mode = self.mode or settings.QUERY_BUDGET_MODE
+        if scope["type"] != "http" or stats is None or mode == "off":
+            return
+        violations = find_violations(stats, route_budget(scope["method"], stats.route))
+        if not violations:
+            return
+        message = f"{scope['method']} {stats.route}: " + "; ".join(violations)
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@dataclass
+class QueryCounter:
+    """count_queries 的统计结果"""
+
+    statements: List[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    """统计代码块内该引擎上执行的所有查询（包括 TestClient 在其他线程中处理的请求）"""
+    counter = QueryCounter()
+    lock = threading.Lock()
+
+    def after_cursor_execute(
+        _conn, _cursor, statement, _parameters, _context, _executemany
+    ):
+        with lock:
+            counter.statements.append(" ".join(statement.split()))
+
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "after_cursor_execute", after_cursor_execute)
+
+
+@contextmanager
+def assert_query_budget(engine: Engine, budget: int) -> Iterator[QueryCounter]:
+    """代码块内的查询数超出 budget 或出现重复查询时抛出 QueryBudgetExceeded"""
+    with count_queries(engine) as counter:
+        yield counter
+    stats = RequestStats(route="-", query_count=counter.count)
+    for statement in counter.statements:
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+    violations = find_violations(stats, budget)
+    if violations:
+        raise QueryBudgetExceeded(
+            "; ".join(violations) + "\n" + "\n".join(counter.statements)
+        )
@@ -1,20 +1,26 @@
 """
 新的模块化主应用文件
 """
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
 
 import sentry_sdk
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.core.db import engine
+from app.core.instrumentation import InstrumentationMiddleware, instrument_engine, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_guard import QueryBudgetMiddleware
 from app.modules import registry
-from app.modules.core import CoreModule
-from app.modules.items import ItemsModule
-from app.modules.tradingview import TradingViewModule
 from app.modules.migration_manager import migration_manager
+from app.modules.migration_runner import run_migrations_once
+from app.modules.compaction import run_compaction_scheduler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,61 +44,78 @@ async def lifespan(app: FastAPI):
     # 运行模块迁移
     await run_module_migrations()
     
+    report = registry.startup_report()
+    logger.info(f"模块启动耗时 {report['total_ms']}ms: {report['modules']}")
+    
+    # 启动软删除墓碑压缩定时任务
+    compaction_task = None
+    if settings.SOFT_DELETE_COMPACTION_ENABLED:
+        compaction_task = asyncio.create_task(run_compaction_scheduler())
+    
     logger.info("应用启动完成")
     
     yield
     
     # 关闭时执行
     logger.info("正在关闭应用...")
+    if compaction_task:
+        compaction_task.cancel()
+    # 写完告警队列、停止回测进程池和事件监听（可能阻塞数秒，放到线程中执行）
+    await asyncio.to_thread(registry.shutdown)
 
 
 async def initialize_modules():
-    """初始化并注册所有模块"""
+    """按 ENABLED_MODULES 延迟导入并注册模块，未启用的模块不会被导入"""
     logger.info("开始注册模块...")
     
-    # 始终注册核心模块
-    core_module = CoreModule()
-    registry.register_module("core", core_module)
-    
-    # 根据配置注册其他模块
     enabled_modules = getattr(settings, 'ENABLED_MODULES', ["core", "items", "tradingview"])
+    # 始终注册核心模块
+    module_names = ["core"] + [name for name in enabled_modules if name != "core"]
     
-    if "items" in enabled_modules:
-        items_module = ItemsModule()
-        registry.register_module("items", items_module)
-        logger.info("Items模块已注册")
-    
-    if "tradingview" in enabled_modules:
-        tradingview_module = TradingViewModule()
-        registry.register_module("tradingview", tradingview_module)
-        logger.info("TradingView模块已注册")
+    for name in module_names:
+        if registry.load_module(name):
+            logger.info(f"{name}模块已注册")
     
     logger.info(f"共注册了 {len(registry.modules)} 个模块")
     
     # 注册所有启用模块的路由
     logger.info("注册模块路由...")
-    for router in registry.get_active_routers():
-        app.include_router(router, prefix=settings.API_V1_STR)
+    for name, module in registry.modules.items():
+        if module['enabled']:
+            start = time.perf_counter()
+            app.include_router(module['router'], prefix=settings.API_V1_STR)
+            registry.record_timing(name, "router_ms", round((time.perf_counter() - start) * 1000, 2))
     logger.info(f"路由注册完成，共注册 {len(registry.get_active_routers())} 个路由器")
 
 
 async def run_module_migrations():
-    """运行所有启用模块的迁移"""
+    """
+    按依赖关系规划并运行所有启用模块的迁移，互不依赖的模块并发执行
+    多 worker 下由 advisory lock 保证只有一个 worker 执行
+    """
     logger.info("开始运行模块迁移...")
     
-    enabled_modules = [name for name, module in registry.modules.items() if module['enabled']]
+    dependencies = {
+        name: module['instance'].dependencies
+        for name, module in registry.modules.items() if module['enabled']
+    }
+    start = time.perf_counter()
+    report = await run_migrations_once(migration_manager, dependencies)
+    if report is None:
+        registry.record_phase("migrations_ms", round((time.perf_counter() - start) * 1000, 2))
+        return
     
-    # 按依赖顺序运行迁移：core -> items -> tradingview
-    migration_order = ["core", "items", "tradingview"]
+    for module_name, elapsed_ms in report.timings_ms.items():
+        registry.record_timing(module_name, "migration_ms", elapsed_ms)
+    registry.record_phase("migrations_ms", report.total_ms)
+    logger.info(f"模块迁移总耗时 {report.total_ms}ms")
     
-    for module_name in migration_order:
-        if module_name in enabled_modules:
-            success = migration_manager.migrate_module(module_name)
-            if success:
-                logger.info(f"模块 {module_name} 迁移完成")
-            else:
-                logger.error(f"模块 {module_name} 迁移失败")
-                raise RuntimeError(f"模块 {module_name} 迁移失败")
+    for module_name, success in report.results.items():
+        if success:
+            logger.info(f"模块 {module_name} 迁移完成")
+        else:
+            logger.error(f"模块 {module_name} 迁移失败")
+            raise RuntimeError(f"模块 {module_name} 迁移失败")
 
 
 # Sentry配置
@@ -117,6 +140,18 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+# 请求耗时与数据库查询埋点
+# 本地模式下检查每个请求的查询预算（N+1 检测），需位于埋点中间件内层
+if settings.METRICS_ENABLED:
+    instrument_engine(engine)
+    if settings.ENVIRONMENT == "local":
+        app.add_middleware(QueryBudgetMiddleware)
+    app.add_middleware(InstrumentationMiddleware)
+
+# 超级用户请求带 X-Profile 头时返回该请求的采样结果
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 
 # 路由注册已移到 initialize_modules() 函数中
 
@@ -133,6 +168,12 @@ async def list_modules():
     return registry.list_modules()
 
 
+@app.get("/modules/startup")
+async def module_startup_report():
+    """模块启动耗时报告（导入、路由构建、迁移检查）"""
+    return registry.startup_report()
+
+
 @app.get("/modules/{module_name}")
 async def get_module_info(module_name: str):
     """获取特定模块信息"""
@@ -143,6 +184,13 @@ async def get_module_info(module_name: str):
 
 
 @app.get("/migrations/status")
-async def migration_status():
-    """获取迁移状态"""
+def migration_status():
+    """获取迁移状态（迁移文件清单来自启动时的缓存，只查询一次数据库）"""
     return migration_manager.get_migration_status()
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        """Prometheus 格式的请求与查询指标（仅应答本次抓取的 worker 进程的数据）"""
+        return render_metrics()
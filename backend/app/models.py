@@ -25,8 +25,30 @@ from app.modules.models_config import (
     ItemUpdate,
     # TradingView 模块
     TradingView,
+    TradingViewAlert,
+    TradingViewAlertRule,
+    TradingViewAlertRuleCreate,
+    TradingViewAlertRulePublic,
+    TradingViewAlertRulesPublic,
+    TradingViewBacktest,
+    TradingViewBacktestCreate,
+    TradingViewBacktestPublic,
+    TradingViewBacktestsPublic,
+    TradingViewBar,
+    TradingViewBarSeries,
+    TradingViewBarsIngest,
     TradingViewCreate,
+    TradingViewEventTicket,
+    TradingViewIndicatorState,
+    TradingViewIndicators,
+    TradingViewIndicatorsLatest,
     TradingViewPublic,
-    TradingViewsPublic,
+    TradingViewStrategiesPublic,
+    TradingViewSweepCreate,
+    TradingViewStrategy,
+    TradingViewStrategyCreate,
+    TradingViewStrategyPublic,
     TradingViewUpdate,
+    TradingViewWebhook,
+    TradingViewsPublic,
 )
\ No newline at end of file
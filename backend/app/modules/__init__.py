@@ -2,6 +2,9 @@
 模块化系统核心
 支持动态加载、启用/禁用模块，模块独立迁移
 """
+import importlib
+import time
+from importlib.metadata import entry_points
 from typing import Dict, List, Optional, Type
 from fastapi import APIRouter
 from sqlmodel import SQLModel
@@ -9,14 +12,84 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# 内置模块的导入路径，"包路径:类名"；第三方模块可通过 entry point 组 app.modules 注册
+BUILTIN_MODULES: Dict[str, str] = {
+    "core": "app.modules.core:CoreModule",
+    "items": "app.modules.items:ItemsModule",
+    "tradingview": "app.modules.tradingview:TradingViewModule",
+}
+MODULE_ENTRY_POINT_GROUP = "app.modules"
+
+
+def resolve_module_path(name: str) -> Optional[str]:
+    """根据模块名查找导入路径，不导入模块本身"""
+    if name in BUILTIN_MODULES:
+        return BUILTIN_MODULES[name]
+    for ep in entry_points(group=MODULE_ENTRY_POINT_GROUP):
+        if ep.name == name:
+            return ep.value
+    return None
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
 
 class ModuleRegistry:
     """模块注册器 - 管理所有模块的注册、启用、禁用"""
     
     def __init__(self):
         self.modules: Dict[str, dict] = {}
+        self.startup_timings: Dict[str, Dict[str, float]] = {}
+        self.startup_phases: Dict[str, float] = {}
         self._initialized = False
     
+    def load_module(self, name: str) -> bool:
+        """
+        按名称延迟导入并注册模块，同时记录导入和路由构建耗时
+        未知的模块名（如 ENABLED_MODULES 拼写错误）抛出 ValueError，而不是静默跳过
+        """
+        path = resolve_module_path(name)
+        if not path:
+            raise ValueError(
+                f"未知模块: {name}，内置模块为 {', '.join(BUILTIN_MODULES)}，"
+                f"第三方模块需在 entry point 组 {MODULE_ENTRY_POINT_GROUP} 中注册"
+            )
+        
+        module_path, class_name = path.split(":")
+        start = time.perf_counter()
+        module_class = getattr(importlib.import_module(module_path), class_name)
+        self.record_timing(name, "import_ms", _elapsed_ms(start))
+        
+        start = time.perf_counter()
+        module_instance = module_class()
+        self.record_timing(name, "setup_ms", _elapsed_ms(start))
+        
+        return self.register_module(name, module_instance)
+    
+    def record_timing(self, name: str, phase: str, elapsed_ms: float):
+        """记录模块某个启动阶段的耗时（毫秒）"""
+        self.startup_timings.setdefault(name, {})[phase] = elapsed_ms
+    
+    def record_phase(self, phase: str, elapsed_ms: float):
+        """记录跨模块阶段的整体耗时（如并发执行的迁移）"""
+        self.startup_phases[phase] = elapsed_ms
+    
+    def startup_report(self) -> Dict[str, object]:
+        """启动耗时报告，并发执行的迁移按整体墙钟时间计入总耗时"""
+        total = sum(
+            elapsed
+            for phases in self.startup_timings.values()
+            for phase, elapsed in phases.items()
+            if phase != "migration_ms"
+        )
+        total += sum(self.startup_phases.values())
+        return {
+            "modules": self.startup_timings,
+            "phases": self.startup_phases,
+            "total_ms": round(total, 2),
+        }
+    
     def register_module(self, name: str, module_instance) -> bool:
         """注册模块"""
         try:
@@ -55,6 +128,16 @@ class ModuleRegistry:
             return True
         return False
     
+    def shutdown(self) -> None:
+        """应用关闭时按注册的逆序禁用所有已启用模块，让模块写完队列、停止后台线程和进程池"""
+        for name in reversed(list(self.modules)):
+            if not self.modules[name]['enabled']:
+                continue
+            try:
+                self.disable_module(name)
+            except Exception as e:
+                logger.error(f"模块 {name} 关闭失败: {e}")
+    
     def get_active_routers(self) -> List[APIRouter]:
         """获取所有启用模块的路由"""
         routers = []
@@ -82,7 +165,8 @@ class ModuleRegistry:
                 'enabled': module['enabled'],
                 'has_migration': module['migration_path'] is not None,
                 'models_count': len(module['models']),
-                'config': module['config']
+                'config': module['config'],
+                'startup_timings': self.startup_timings.get(name, {})
             }
             for name, module in self.modules.items()  
         }
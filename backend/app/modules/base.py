@@ -94,6 +94,7 @@ class CRUDModule(BaseModule):
                          public_model: Type[SQLModel]):
         """设置标准CRUD路由"""
         from app.api.deps import CurrentUser, SessionDep
+        from app.modules.crud_ops import delete_owned, record_exists, update_owned
         from sqlmodel import func, select
         from fastapi import HTTPException
         import uuid
@@ -177,7 +178,9 @@ class CRUDModule(BaseModule):
             session.add(db_item)
             session.commit()
             session.refresh(db_item)
-            return db_item
+            result = public_model.model_validate(db_item)
+            self.on_record_changed("created", db_item.id, getattr(db_item, 'owner_id', None), result)
+            return result
         
         # 获取单个记录
         @self.router.get("/{id}", response_model=public_model)
@@ -199,36 +202,41 @@ class CRUDModule(BaseModule):
         def update_item(
             *, session: SessionDep, current_user: CurrentUser, id: uuid.UUID, item_in: update_model
         ) -> Any:
-            """更新记录"""
-            item = session.get(model_class, id)
-            if not item:
-                raise HTTPException(status_code=404, detail="Item not found")
-            
-            # 检查权限
-            if not current_user.is_superuser and hasattr(item, 'owner_id'):
-                if item.owner_id != current_user.id:
-                    raise HTTPException(status_code=403, detail="Not enough permissions")
-            
+            """更新记录（单语句完成所有权校验与更新）"""
+            owner_id = None if current_user.is_superuser else current_user.id
             update_dict = item_in.model_dump(exclude_unset=True)
-            item.sqlmodel_update(update_dict)
-            session.add(item)
+            item = update_owned(session, model_class, id, update_dict, owner_id=owner_id)
+            if item is None:
+                if not record_exists(session, model_class, id):
+                    raise HTTPException(status_code=404, detail="Item not found")
+                raise HTTPException(status_code=403, detail="Not enough permissions")
+            
+            # 提交前序列化，避免提交后对象过期触发额外的刷新查询
+            result = public_model.model_validate(item)
             session.commit()
-            session.refresh(item)
-            return item
+            self.on_record_changed("updated", id, getattr(result, 'owner_id', None), result)
+            return result
         
         # 删除记录
         @self.router.delete("/{id}")
         def delete_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
-            """删除记录"""
-            item = session.get(model_class, id)
-            if not item:
-                raise HTTPException(status_code=404, detail="Item not found")
-            
-            # 检查权限
-            if not current_user.is_superuser and hasattr(item, 'owner_id'):
-                if item.owner_id != current_user.id:
-                    raise HTTPException(status_code=403, detail="Not enough permissions")
+            """删除记录（单语句完成所有权校验与删除）"""
+            owner_id = None if current_user.is_superuser else current_user.id
+            deleted = delete_owned(session, model_class, id, owner_id=owner_id)
+            if deleted is None:
+                if not record_exists(session, model_class, id):
+                    raise HTTPException(status_code=404, detail="Item not found")
+                raise HTTPException(status_code=403, detail="Not enough permissions")
             
-            session.delete(item)
             session.commit()
+            # 所有者取自 DELETE ... RETURNING，超级用户删除他人记录时同样准确
+            self.on_record_changed("deleted", id, getattr(deleted, "owner_id", None), None)
             return {"message": "Item deleted successfully"}
+    
+    def on_record_changed(self, action: str, id: Any, owner_id: Optional[Any],
+                          record: Optional[SQLModel]) -> None:
+        """
+        标准CRUD路由提交后的回调（子类可重写，如推送实时事件）
+        action 为 created / updated / deleted；record 为公共模型，删除时为 None
+        """
+        pass
@@ -0,0 +1,104 @@
+"""
+外键级联依赖图与分批删除
+
+数据库 ON DELETE CASCADE 会在一个语句里删除全部子孙记录，
+对于拥有大量K线、告警等子记录的父记录，单个事务可能删除数百万行。
+这里沿外键图（可多级）找出依赖某张表的所有表，
+估算级联规模，并按子孙表在前的顺序分批删除，最后再删父记录本身。
+"""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, Table, delete, func, select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import Session, SQLModel
+
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+# (子表外键列, 被引用的父表列)
+Hop = Tuple[Column, Column]
+
+
+def cascade_paths(root: Table) -> List[Tuple[Table, List[Hop]]]:
+    """
+    返回通过外键（可多级）依赖 root 的表，以及每张表到 root 的最短外键路径
+    路径从该表开始、以引用 root 的一跳结束；结果中子孙表排在其父表之前，可按顺序删除
+    """
+    paths = {root: []}
+    frontier = [root]
+    while frontier:
+        parent = frontier.pop(0)
+        for table in SQLModel.metadata.sorted_tables:
+            if table in paths:
+                continue
+            for fk in table.foreign_keys:
+                if fk.column.table is parent:
+                    paths[table] = [(fk.parent, fk.column), *paths[parent]]
+                    frontier.append(table)
+                    break
+    return [
+        (table, paths[table])
+        for table in reversed(SQLModel.metadata.sorted_tables)
+        if table in paths and table is not root
+    ]
+
+
+def cascade_filter(path: List[Hop], root_filter: ColumnElement) -> ColumnElement:
+    """由 root 上的条件逐级构造子表的 IN 子查询条件"""
+    condition = root_filter
+    for child_col, parent_col in reversed(path):
+        condition = child_col.in_(select(parent_col).where(condition))
+    return condition
+
+
+def count_rows(
+    session: Session, table: Table, condition: ColumnElement, limit: int
+) -> int:
+    """统计满足条件的行数，最多统计 limit 行（有界查询）"""
+    sub = select(*table.primary_key.columns).where(condition).limit(limit).subquery()
+    return session.execute(
+        select(func.count()).select_from(sub),
+        execution_options={"include_deleted": True},
+    ).scalar_one()
+
+
+def delete_in_batches(
+    table: Table,
+    condition: ColumnElement,
+    batch_size: int,
+    max_batches: Optional[int] = None,
+    pause_seconds: float = 0.0,
+    skip_locked: bool = False,
+) -> Tuple[int, int]:
+    """
+    按主键分批删除满足条件的行，每批一个独立短事务
+    返回 (删除行数, 实际删除了行的批数)；复合主键按整行主键分批，不会一次删掉某个前缀下的全部行
+    """
+    pk_cols = list(table.primary_key.columns)
+    pk = pk_cols[0] if len(pk_cols) == 1 else tuple_(*pk_cols)
+    deleted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batch_keys = select(*pk_cols).where(condition).limit(batch_size)
+        if skip_locked:
+            batch_keys = batch_keys.with_for_update(skip_locked=True)
+        with Session(engine) as session:
+            result = session.execute(
+                delete(table).where(pk.in_(batch_keys)),
+                execution_options={"include_deleted": True},
+            )
+            session.commit()
+        deleted += result.rowcount
+        # 没有删到任何行的查询不计入批数
+        batches += 1 if result.rowcount else 0
+        if result.rowcount < batch_size:
+            break
+        if pause_seconds and (max_batches is None or batches < max_batches):
+            time.sleep(pause_seconds)
+    if deleted:
+        logger.info(f"{table.name} 分批删除 {deleted} 行（{batches} 批）")
+    return deleted, batches
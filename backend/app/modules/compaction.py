@@ -0,0 +1,94 @@
+"""
+软删除墓碑压缩任务
+在低峰时段分批物理删除超过保留期的软删除记录，
+每批独立短事务 + SKIP LOCKED，避免长时间持有行锁；
+级联的子孙记录先分批删除，批大小对所有表都生效
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Type
+
+from sqlalchemy import and_
+from sqlmodel import SQLModel
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.modules.cascade import cascade_filter, cascade_paths, delete_in_batches
+from app.modules.soft_delete import soft_delete_models
+
+logger = logging.getLogger(__name__)
+
+
+def in_offpeak_window(now: Optional[datetime] = None) -> bool:
+    """当前时间（UTC）是否处于低峰窗口，支持跨午夜的窗口如 22-4"""
+    hour = (now or datetime.now(timezone.utc)).hour
+    start = settings.SOFT_DELETE_COMPACTION_START_HOUR
+    end = settings.SOFT_DELETE_COMPACTION_END_HOUR
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def compact_model(
+    model_class: Type[SQLModel],
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    分批清理单个模型的墓碑，返回删除的行数（包括子孙表的记录）
+    先按外键图分批删除过期墓碑的子孙记录（如项目下的K线、告警），再删墓碑本身，
+    这样删除墓碑时不再级联出大事务；max_batches 限制全部表合计的批数
+    """
+    batch_size = batch_size or settings.SOFT_DELETE_COMPACTION_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        hours=settings.SOFT_DELETE_RETENTION_HOURS
+    )
+    table = model_class.__table__
+    expired = and_(table.c.deleted_at.is_not(None), table.c.deleted_at < cutoff)
+    deleted = 0
+    remaining = max_batches
+
+    for target, path in [*cascade_paths(table), (table, [])]:
+        if remaining is not None and remaining <= 0:
+            break
+        rows, batches = delete_in_batches(
+            target,
+            cascade_filter(path, expired),
+            batch_size,
+            max_batches=remaining,
+            # 批次之间稍作停顿，给在线流量让路
+            pause_seconds=settings.SOFT_DELETE_COMPACTION_PAUSE_SECONDS,
+            skip_locked=True,
+        )
+        deleted += rows
+        if remaining is not None:
+            remaining -= batches
+
+    if deleted:
+        logger.info(f"{table.name} 墓碑清理完成，共删除 {deleted} 行")
+    return deleted
+
+
+def compact_all(
+    batch_size: Optional[int] = None, max_batches: Optional[int] = None
+) -> Dict[str, int]:
+    """清理所有启用软删除的模型"""
+    return {
+        model.__tablename__: compact_model(model, batch_size, max_batches)
+        for model in soft_delete_models()
+    }
+
+
+async def run_compaction_scheduler() -> None:
+    """定时任务：周期性检查，仅在低峰窗口内执行清理"""
+    interval = settings.SOFT_DELETE_COMPACTION_INTERVAL_SECONDS
+    while True:
+        await asyncio.sleep(interval)
+        if not in_offpeak_window():
+            continue
+        try:
+            await run_in_threadpool(compact_all)
+        except Exception as e:
+            logger.error(f"墓碑清理失败: {e}")
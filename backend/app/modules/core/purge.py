@@ -0,0 +1,92 @@
+"""
+用户删除与后台清理
+
+普通用户直接 DELETE，由数据库 ON DELETE CASCADE 级联删除子记录；
+拥有大量记录的用户先停用，再由后台任务分批删除子记录，
+避免单个超大事务长时间持有行锁。
+记录数沿外键图统计，项目下的K线、告警等间接子记录同样计入。
+"""
+
+import logging
+import uuid
+from typing import List, Tuple
+
+from sqlalchemy import Table, delete
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.modules.cascade import (
+    cascade_filter,
+    cascade_paths,
+    count_rows,
+    delete_in_batches,
+)
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+def _owned_tables(user_id: uuid.UUID) -> List[Tuple[Table, ColumnElement]]:
+    """
+    返回所有直接或经由其他表（如 tradingview -> tradingview_bar）级联引用 user.id 的表
+    及限定到该用户的条件，子孙表排在前面（包括后续模块新增的表）
+    """
+    return [
+        (table, cascade_filter(path, User.__table__.c.id == user_id))
+        for table, path in cascade_paths(User.__table__)
+    ]
+
+
+def count_owned_records(session: Session, user_id: uuid.UUID, limit: int) -> int:
+    """统计用户直接与间接拥有的子记录数量，每张表最多统计 limit 行（有界查询）"""
+    total = 0
+    for table, condition in _owned_tables(user_id):
+        total += count_rows(session, table, condition, limit)
+        if total > limit:
+            break
+    return total
+
+
+def should_purge_async(session: Session, user_id: uuid.UUID) -> bool:
+    """子记录数量超过阈值时应改用后台分批清理"""
+    threshold = settings.USER_PURGE_ASYNC_THRESHOLD
+    return count_owned_records(session, user_id, threshold) > threshold
+
+
+def delete_user(session: Session, user: User) -> None:
+    """直接删除用户，子记录交给数据库级联删除"""
+    session.delete(user)
+    session.commit()
+
+
+def deactivate_user(session: Session, user: User) -> None:
+    """停用用户，等待后台清理"""
+    user.is_active = False
+    session.add(user)
+    session.commit()
+
+
+def purge_user(user_id: uuid.UUID, batch_size: int | None = None) -> int:
+    """
+    后台分批清理用户的子记录，最后删除用户本身
+
+    先删子孙表（如K线、告警），再删项目等直接子记录，每批在独立事务中执行，
+    删除父记录时不再触发大规模级联。返回删除的子记录总数。
+    """
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    deleted = 0
+
+    for table, condition in _owned_tables(user_id):
+        table_deleted, _ = delete_in_batches(table, condition, batch_size)
+        deleted += table_deleted
+        logger.info(f"用户 {user_id} 的 {table.name} 记录清理完成")
+
+    with Session(engine) as session:
+        session.execute(delete(User).where(User.id == user_id))
+        session.commit()
+
+    logger.info(f"用户 {user_id} 清理完成，共删除 {deleted} 条子记录")
+    return deleted
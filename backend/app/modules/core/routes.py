@@ -4,11 +4,13 @@
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import func, select
 
 from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app.core import profiling
 from app.core.config import settings
 from app.core.security import create_access_token
 from app.utils import generate_password_reset_token, generate_reset_password_email, verify_password_reset_token
@@ -25,7 +27,7 @@ from .models import (
     UserUpdate,
     UserUpdateMe,
 )
-from . import crud
+from . import crud, purge
 
 
 router = APIRouter()
@@ -178,7 +180,9 @@ def read_user_me(current_user: CurrentUser) -> Any:
 
 
 @router.delete("/users/me", response_model=Message)
-def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
+def delete_user_me(
+    session: SessionDep, current_user: CurrentUser, background_tasks: BackgroundTasks
+) -> Any:
     """
     Delete own user.
     """
@@ -186,9 +190,7 @@ def delete_user_me(session: SessionDep, current_user: CurrentUser) -> Any:
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    session.delete(current_user)
-    session.commit()
-    return Message(message="User deleted successfully")
+    return _delete_user(session, current_user, background_tasks)
 
 
 @router.get("/users/{user_id}", dependencies=[Depends(get_current_active_superuser)], response_model=UserPublic)
@@ -234,7 +236,12 @@ def update_user(*, session: SessionDep, user_id: uuid.UUID, user_in: UserUpdate)
 
 
 @router.delete("/users/{user_id}", dependencies=[Depends(get_current_active_superuser)])
-def delete_user(session: SessionDep, current_user: CurrentUser, user_id: uuid.UUID) -> Message:
+def delete_user(
+    session: SessionDep,
+    current_user: CurrentUser,
+    user_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
+) -> Message:
     """
     Delete a user.
     """
@@ -245,10 +252,46 @@ def delete_user(session: SessionDep, current_user: CurrentUser, user_id: uuid.UU
         raise HTTPException(
             status_code=403, detail="Super users are not allowed to delete themselves"
         )
-    session.delete(user)
-    session.commit()
+    return _delete_user(session, user, background_tasks)
+
+
+def _delete_user(session: SessionDep, user: User, background_tasks: BackgroundTasks) -> Message:
+    """删除用户：记录量大的用户先停用，再交给后台任务分批清理"""
+    if purge.should_purge_async(session, user.id):
+        purge.deactivate_user(session, user)
+        background_tasks.add_task(purge.purge_user, user.id)
+        return Message(message="User deletion scheduled")
+    purge.delete_user(session, user)
     return Message(message="User deleted successfully")
 
 
+# ===== 采样分析（仅超级用户，作用于处理该请求的 worker） =====
+@router.post("/profiling/start", dependencies=[Depends(get_current_active_superuser)])
+def start_profiling(interval_ms: float | None = Query(default=None, ge=1, le=1000)) -> Any:
+    """在当前 worker 上启动采样分析，超过 PROFILING_MAX_SECONDS 自动停止"""
+    return profiling.start_worker_profiler(interval_ms).summary()
+
+
+@router.post("/profiling/stop", dependencies=[Depends(get_current_active_superuser)])
+def stop_profiling() -> Any:
+    """停止当前 worker 的采样分析，返回热点摘要"""
+    return profiling.stop_worker_profiler().summary()
+
+
+@router.get("/profiling/status", dependencies=[Depends(get_current_active_superuser)])
+def profiling_status() -> Any:
+    return profiling.get_worker_profiler().summary()
+
+
+@router.get(
+    "/profiling/flame",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_class=PlainTextResponse,
+)
+def profiling_flame() -> Any:
+    """folded stacks 格式的采样结果，可导入 speedscope 或 flamegraph.pl 生成火焰图"""
+    return profiling.get_worker_profiler().folded()
+
+
 # 导入必要的函数
 from app.core.security import get_password_hash
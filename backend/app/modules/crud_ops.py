@@ -0,0 +1,79 @@
+"""
+通用CRUD语句助手 - 带所有权校验的单语句更新/删除
+把 "先 session.get 再在Python里比较 owner_id" 合并为一条
+UPDATE/DELETE ... WHERE id = :id AND owner_id = :uid RETURNING，
+减少一次往返，并消除读取与写入之间的竞态窗口
+"""
+
+import uuid
+from typing import Any, Dict, Optional, Type
+
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.engine import Row
+from sqlmodel import Session, SQLModel
+
+from app.modules.soft_delete import is_soft_delete_model, utcnow
+
+
+def _owned_filter(
+    stmt: Any, model_class: Type[SQLModel], id: uuid.UUID, owner_id: Optional[uuid.UUID]
+) -> Any:
+    """附加主键条件和（可选的）所有者条件"""
+    stmt = stmt.where(model_class.id == id)
+    if owner_id is not None and hasattr(model_class, "owner_id"):
+        stmt = stmt.where(model_class.owner_id == owner_id)
+    return stmt
+
+
+def update_owned(
+    session: Session,
+    model_class: Type[SQLModel],
+    id: uuid.UUID,
+    values: Dict[str, Any],
+    owner_id: Optional[uuid.UUID] = None,
+) -> Any:
+    """
+    单语句更新记录并返回更新后的对象
+
+    owner_id 为 None 时不做所有权限制（超级用户）。
+    未命中时返回 None，调用方可用 record_exists 区分 404 与 403。
+    不提交事务，由调用方 commit。
+    """
+    if not values:
+        # 没有需要更新的字段：退化为一次带相同条件的查询
+        stmt = _owned_filter(select(model_class), model_class, id, owner_id)
+        return session.execute(stmt).scalars().first()
+
+    stmt = _owned_filter(update(model_class), model_class, id, owner_id)
+    stmt = stmt.values(**values).returning(model_class)
+    return session.execute(stmt).scalars().first()
+
+
+def delete_owned(
+    session: Session,
+    model_class: Type[SQLModel],
+    id: uuid.UUID,
+    owner_id: Optional[uuid.UUID] = None,
+) -> Optional[Row]:
+    """
+    单语句删除记录，返回被删除记录的 (id, owner_id)（模型没有 owner_id 时只有 id）
+
+    所有者由同一条 DELETE/UPDATE ... RETURNING 返回，超级用户删除他人记录时无需先查询。
+    未命中时返回 None，调用方可用 record_exists 区分 404 与 403。
+    启用软删除的模型只写入 deleted_at 墓碑，由 compaction 任务稍后清理。
+    不提交事务，由调用方 commit。
+    """
+    if is_soft_delete_model(model_class):
+        stmt = _owned_filter(update(model_class), model_class, id, owner_id)
+        stmt = stmt.values(deleted_at=utcnow())
+    else:
+        stmt = _owned_filter(delete(model_class), model_class, id, owner_id)
+    columns = [model_class.id]
+    if hasattr(model_class, "owner_id"):
+        columns.append(model_class.owner_id)
+    return session.execute(stmt.returning(*columns)).first()
+
+
+def record_exists(session: Session, model_class: Type[SQLModel], id: uuid.UUID) -> bool:
+    """检查记录是否存在（仅在更新/删除未命中时调用，用于区分404和403）"""
+    return bool(session.execute(select(exists().where(model_class.id == id))).scalar())
@@ -0,0 +1,203 @@
+"""
+模块迁移演练（dry run）
+在最终会回滚的事务中执行模块的待应用迁移，逐条语句记录：
+耗时、影响行数以及新获取的表级锁，
+用于在生产规模的快照上预估迁移时长和锁影响
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+from sqlmodel import Session
+
+from .migration_manager import ModuleMigrationManager
+from .migration_ops import pop_online_statements
+
+logger = logging.getLogger(__name__)
+
+LOCKS_QUERY = text("""
+    SELECT c.relname, l.mode
+    FROM pg_locks l JOIN pg_class c ON c.oid = l.relation
+    WHERE l.pid = pg_backend_pid() AND l.granted AND l.locktype = 'relation'
+      AND c.relname NOT LIKE 'pg\\_%'
+""")
+
+
+@dataclass
+class StatementReport:
+    """单条语句的演练结果"""
+
+    sql: str
+    duration_ms: float
+    rowcount: int
+    locks: List[str] = field(default_factory=list)
+
+
+@dataclass
+class MigrationDryRunReport:
+    """单个迁移的演练结果"""
+
+    module_name: str
+    migration_name: str
+    statements: List[StatementReport] = field(default_factory=list)
+    deferred: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(s.duration_ms for s in self.statements), 2)
+
+
+def split_sql(sql: str) -> List[str]:
+    """按分号拆分多语句 SQL，忽略引号、$$ 引用块和注释中的分号"""
+    statements = []
+    current: List[str] = []
+    i = 0
+    quote: Optional[str] = None
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if sql.startswith(quote, i):
+                current.append(quote)
+                i += len(quote)
+                quote = None
+                continue
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "$":
+            end = sql.find("$", i + 1)
+            tag = sql[i : end + 1] if end != -1 else ""
+            if tag and (tag == "$$" or tag[1:-1].isidentifier()):
+                quote = tag
+                current.append(tag)
+                i += len(tag)
+                continue
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif ch == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+            i += 1
+            continue
+        current.append(ch)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+class DryRunSession:
+    """
+    迁移演练用的会话代理
+    拦截 exec/execute：无参数的文本 SQL 拆成单条语句逐条执行并计时，
+    其余方法原样转发给真实会话
+    """
+
+    def __init__(self, session: Session):
+        self._session = session
+        self._seen_locks: Set[Tuple[str, str]] = set()
+        self.statements: List[StatementReport] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def _new_locks(self) -> List[str]:
+        locks = set(self._session.execute(LOCKS_QUERY).fetchall())
+        new = sorted(locks - self._seen_locks)
+        self._seen_locks |= locks
+        return [f"{relation}: {mode}" for relation, mode in new]
+
+    def _timed(self, label: str, run) -> Any:
+        start = time.perf_counter()
+        result = run()
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        rowcount = getattr(result, "rowcount", -1)
+        self.statements.append(
+            StatementReport(
+                sql=" ".join(label.split())[:200],
+                duration_ms=duration_ms,
+                rowcount=rowcount if rowcount is not None else -1,
+                locks=self._new_locks(),
+            )
+        )
+        return result
+
+    def execute(self, statement: Any, params: Any = None, **kwargs: Any) -> Any:
+        if (
+            isinstance(statement, TextClause)
+            and not params
+            and not statement._bindparams
+        ):
+            result = None
+            for sql in split_sql(statement.text):
+                result = self._timed(
+                    sql, lambda sql=sql: self._session.execute(text(sql), **kwargs)
+                )
+            return result
+        return self._timed(
+            str(statement), lambda: self._session.execute(statement, params, **kwargs)
+        )
+
+    def exec(self, statement: Any, **kwargs: Any) -> Any:
+        if isinstance(statement, TextClause):
+            return self.execute(statement, kwargs.pop("params", None), **kwargs)
+        return self._timed(
+            str(statement), lambda: self._session.exec(statement, **kwargs)
+        )
+
+
+def dry_run_module(
+    manager: ModuleMigrationManager,
+    module_name: str,
+    pending: Optional[List[str]] = None,
+) -> List[MigrationDryRunReport]:
+    """
+    在单个事务中演练模块的全部待应用迁移，结束后回滚
+
+    事务外操作（并发建索引、分批回填）不会执行，只列在 deferred 中；
+    并发建索引会以普通 CREATE INDEX 的形式在事务内演练，以便估算耗时。
+    """
+    if pending is None:
+        pending = manager.get_pending_migrations(module_name)
+    reports = []
+
+    with Session(manager.engine) as session:
+        proxy = DryRunSession(session)
+        try:
+            for migration_name in pending:
+                report = MigrationDryRunReport(module_name, migration_name)
+                reports.append(report)
+                proxy.statements = []
+                try:
+                    migration_module = manager._load_migration(
+                        module_name, migration_name
+                    )
+                    migration_module.upgrade(proxy)
+                    for operation in pop_online_statements(session):
+                        if callable(operation):
+                            report.deferred.append("分批回填（演练中不执行）")
+                            continue
+                        report.deferred.append(operation)
+                        if "INDEX CONCURRENTLY" in operation and operation.startswith(
+                            "CREATE"
+                        ):
+                            proxy.execute(text(operation.replace(" CONCURRENTLY", "")))
+                except Exception as e:
+                    report.error = str(e)
+                    logger.error(f"演练迁移 {module_name}.{migration_name} 失败: {e}")
+                    break
+                finally:
+                    report.statements = proxy.statements
+        finally:
+            session.rollback()
+
+    return reports
@@ -3,16 +3,23 @@
 支持每个模块有独立的迁移文件和版本控制
 """
 import os
+import hashlib
 import importlib
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterable, List, Optional
 from pathlib import Path
+from sqlalchemy.exc import ProgrammingError
 from sqlmodel import Session, create_engine, text
 from app.core.config import settings
 from app.core.db import engine
+from app.modules.migration_ops import pop_online_statements, run_online_statements
 
 logger = logging.getLogger(__name__)
 
+# 模块根目录，不依赖当前工作目录
+MODULES_DIR = Path(__file__).resolve().parent
+
 
 class ModuleMigrationManager:
     """模块迁移管理器"""
@@ -20,86 +27,200 @@ class ModuleMigrationManager:
     def __init__(self):
         self.engine = engine
         self.migrations_table = "module_migrations"
-        self._ensure_migrations_table()
+        self.schema_version_table = "module_schema_version"
+        # 记录表延迟到首次使用时创建，导入时不访问数据库
+        self._tables_ready = False
+        self._tables_lock = threading.Lock()
+        # 迁移文件清单缓存：{模块名: {迁移名: 文件内容校验和}}
+        self._manifest: Optional[Dict[str, Dict[str, str]]] = None
     
     def _ensure_migrations_table(self):
-        """确保模块迁移记录表存在"""
+        """
+        确保模块迁移记录表和 schema 版本表存在（每个进程只执行一次）
+        含 ALTER TABLE，只在写入路径（迁移锁内、标记/移除记录）调用，只读查询不调用
+        """
+        if self._tables_ready:
+            return
+        with self._tables_lock:
+            if self._tables_ready:
+                return
+            with Session(self.engine) as session:
+                session.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {self.migrations_table} (
+                        id SERIAL PRIMARY KEY,
+                        module_name VARCHAR(255) NOT NULL,
+                        migration_name VARCHAR(255) NOT NULL,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE(module_name, migration_name)
+                    )
+                """))
+                session.execute(text(f"""
+                    ALTER TABLE {self.migrations_table}
+                    ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)
+                """))
+                session.execute(text(f"""
+                    CREATE TABLE IF NOT EXISTS {self.schema_version_table} (
+                        id INTEGER PRIMARY KEY,
+                        version_hash VARCHAR(64) NOT NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """))
+                session.commit()
+            self._tables_ready = True
+    
+    def load_manifest(self) -> Dict[str, Dict[str, str]]:
+        """扫描所有模块的迁移文件并计算校验和（结果缓存在内存中）"""
+        manifest: Dict[str, Dict[str, str]] = {}
+        for module_dir in sorted(MODULES_DIR.iterdir()):
+            migrations_dir = module_dir / "migrations"
+            if not module_dir.is_dir() or not migrations_dir.is_dir():
+                continue
+            manifest[module_dir.name] = {
+                file.stem: hashlib.sha256(file.read_bytes()).hexdigest()
+                for file in sorted(migrations_dir.glob("*.py"))
+                if file.name != "__init__.py"
+            }
+        self._manifest = manifest
+        return manifest
+    
+    @property
+    def manifest(self) -> Dict[str, Dict[str, str]]:
+        if self._manifest is None:
+            self.load_manifest()
+        return self._manifest
+    
+    def list_migration_files(self, module_name: str) -> List[str]:
+        """列出模块的迁移文件名（按文件名排序）"""
+        return list(self.manifest.get(module_name, {}))
+    
+    def schema_version_hash(self, module_names: Iterable[str]) -> str:
+        """根据启用模块及其迁移文件（含内容校验和）计算 schema 版本哈希"""
+        digest = hashlib.sha256()
+        for module_name in sorted(module_names):
+            for migration_name, checksum in self.manifest.get(module_name, {}).items():
+                digest.update(f"{module_name}:{migration_name}:{checksum}\n".encode())
+        return digest.hexdigest()
+    
+    def get_schema_version(self) -> Optional[str]:
+        """读取已记录的 schema 版本哈希；记录表不存在时返回 None（单次查询）"""
+        try:
+            with Session(self.engine) as session:
+                return session.execute(text(
+                    f"SELECT version_hash FROM {self.schema_version_table} WHERE id = 1"
+                )).scalar()
+        except ProgrammingError:
+            return None
+    
+    def set_schema_version(self, version_hash: str):
+        """记录当前 schema 版本哈希"""
+        self._ensure_migrations_table()
         with Session(self.engine) as session:
             session.execute(text(f"""
-                CREATE TABLE IF NOT EXISTS {self.migrations_table} (
-                    id SERIAL PRIMARY KEY,
-                    module_name VARCHAR(255) NOT NULL,
-                    migration_name VARCHAR(255) NOT NULL,
-                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(module_name, migration_name)
-                )
-            """))
+                INSERT INTO {self.schema_version_table} (id, version_hash, updated_at)
+                VALUES (1, :version_hash, CURRENT_TIMESTAMP)
+                ON CONFLICT (id) DO UPDATE
+                SET version_hash = EXCLUDED.version_hash, updated_at = EXCLUDED.updated_at
+            """), {"version_hash": version_hash})
             session.commit()
     
     def get_applied_migrations(self, module_name: str) -> List[str]:
-        """获取已应用的迁移列表"""
-        with Session(self.engine) as session:
-            stmt = text(f"""
-                SELECT migration_name FROM {self.migrations_table} 
-                WHERE module_name = :module_name 
-                ORDER BY applied_at
-            """)
-            result = session.execute(stmt, {"module_name": module_name})
-            return [row[0] for row in result.fetchall()]
+        """获取已应用的迁移列表（记录表不存在时为空）"""
+        return list(self.get_applied_records().get(module_name, {}))
+    
+    def get_applied_records(self) -> Dict[str, Dict[str, Optional[str]]]:
+        """
+        一次查询获取所有模块已应用的迁移及其记录的校验和
+        只读：记录表不存在时返回空，尚未添加 checksum 列的旧表校验和记为 None
+        """
+        records: Dict[str, Dict[str, Optional[str]]] = {}
+        for checksum_column in ("checksum", "NULL"):
+            try:
+                with Session(self.engine) as session:
+                    rows = session.execute(text(f"""
+                        SELECT module_name, migration_name, {checksum_column} FROM {self.migrations_table}
+                        ORDER BY applied_at
+                    """)).fetchall()
+            except ProgrammingError:
+                if self._tables_ready:
+                    raise
+                continue
+            for module_name, migration_name, checksum in rows:
+                records.setdefault(module_name, {})[migration_name] = checksum
+            break
+        return records
+    
+    def get_all_applied_migrations(self) -> Dict[str, List[str]]:
+        """一次查询获取所有模块已应用的迁移"""
+        return {
+            module_name: list(migrations)
+            for module_name, migrations in self.get_applied_records().items()
+        }
     
     def mark_migration_applied(self, module_name: str, migration_name: str):
         """标记迁移为已应用"""
+        self._ensure_migrations_table()
         with Session(self.engine) as session:
-            stmt = text(f"""
-                INSERT INTO {self.migrations_table} (module_name, migration_name)
-                VALUES (:module_name, :migration_name)
-                ON CONFLICT (module_name, migration_name) DO NOTHING
-            """)
-            session.execute(stmt, {"module_name": module_name, "migration_name": migration_name})
+            self._record_applied(session, module_name, migration_name)
             session.commit()
     
+    def _record_applied(self, session: Session, module_name: str, migration_name: str):
+        """在给定会话（事务）中写入迁移记录及迁移文件校验和"""
+        stmt = text(f"""
+            INSERT INTO {self.migrations_table} (module_name, migration_name, checksum)
+            VALUES (:module_name, :migration_name, :checksum)
+            ON CONFLICT (module_name, migration_name) DO NOTHING
+        """)
+        session.execute(stmt, {
+            "module_name": module_name,
+            "migration_name": migration_name,
+            "checksum": self.manifest.get(module_name, {}).get(migration_name),
+        })
+    
     def remove_migration_record(self, module_name: str, migration_name: str):
         """移除迁移记录"""
+        self._ensure_migrations_table()
         with Session(self.engine) as session:
             stmt = text(f"""
                 DELETE FROM {self.migrations_table} 
                 WHERE module_name = :module_name AND migration_name = :migration_name
             """)
             session.execute(stmt, {"module_name": module_name, "migration_name": migration_name})
+            # 回滚后 schema 版本失效，下次启动重新检查
+            session.execute(text(f"DELETE FROM {self.schema_version_table}"))
             session.commit()
     
-    def get_pending_migrations(self, module_name: str) -> List[str]:
-        """获取待应用的迁移"""
-        module_migrations_dir = Path(f"app/modules/{module_name}/migrations")
-        if not module_migrations_dir.exists():
+    def get_pending_migrations(self, module_name: str,
+                               applied: Optional[List[str]] = None) -> List[str]:
+        """获取待应用的迁移，applied 为预先查询的已应用列表时不再查询数据库"""
+        migration_files = self.list_migration_files(module_name)
+        if not migration_files:
             return []
         
-        # 获取所有迁移文件
-        migration_files = []
-        for file in module_migrations_dir.glob("*.py"):
-            if file.name != "__init__.py":
-                migration_files.append(file.stem)
-        
-        migration_files.sort()  # 按文件名排序
-        
         # 获取已应用的迁移
-        applied = set(self.get_applied_migrations(module_name))
+        if applied is None:
+            applied = self.get_applied_migrations(module_name)
+        applied_set = set(applied)
         
         # 返回未应用的迁移
-        return [m for m in migration_files if m not in applied]
+        return [m for m in migration_files if m not in applied_set]
+    
+    def _load_migration(self, module_name: str, migration_name: str):
+        return importlib.import_module(
+            f"app.modules.{module_name}.migrations.{migration_name}"
+        )
     
     def run_migration(self, module_name: str, migration_name: str) -> bool:
         """运行单个迁移"""
         try:
-            migration_module = importlib.import_module(
-                f"app.modules.{module_name}.migrations.{migration_name}"
-            )
+            migration_module = self._load_migration(module_name, migration_name)
             
             if hasattr(migration_module, 'upgrade'):
                 with Session(self.engine) as session:
                     migration_module.upgrade(session)
                     session.commit()
+                    online_statements = pop_online_statements(session)
                 
+                run_online_statements(self.engine, online_statements)
                 self.mark_migration_applied(module_name, migration_name)
                 logger.info(f"迁移 {module_name}.{migration_name} 应用成功")
                 return True
@@ -111,12 +232,62 @@ class ModuleMigrationManager:
             logger.error(f"运行迁移 {module_name}.{migration_name} 失败: {e}")
             return False
     
+    def migrate_module_transactional(self, module_name: str, pending: List[str]) -> bool:
+        """
+        在单个事务中应用模块的待应用迁移及其迁移记录
+
+        每个迁移使用独立的 savepoint：某个迁移失败时只回滚它自己，
+        之前成功的迁移连同记录一起提交。登记了事务外语句（如并发建索引）的迁移
+        会先提交当前事务、执行这些语句，再为后续迁移开启新事务；
+        事务外语句失败时撤销该迁移的记录，下次启动重新应用。
+        """
+        remaining = list(pending)
+        while remaining:
+            online_migration = None
+            online_statements: List[str] = []
+            failed = False
+            
+            with Session(self.engine) as session:
+                while remaining:
+                    migration_name = remaining.pop(0)
+                    try:
+                        migration_module = self._load_migration(module_name, migration_name)
+                        if not hasattr(migration_module, 'upgrade'):
+                            raise RuntimeError(f"迁移文件 {migration_name} 缺少 upgrade 函数")
+                        with session.begin_nested():
+                            migration_module.upgrade(session)
+                            self._record_applied(session, module_name, migration_name)
+                    except Exception as e:
+                        logger.error(f"运行迁移 {module_name}.{migration_name} 失败: {e}")
+                        pop_online_statements(session)
+                        failed = True
+                        break
+                    
+                    logger.info(f"迁移 {module_name}.{migration_name} 应用成功")
+                    online_statements = pop_online_statements(session)
+                    if online_statements:
+                        online_migration = migration_name
+                        break
+                
+                session.commit()
+            
+            if online_statements:
+                try:
+                    run_online_statements(self.engine, online_statements)
+                except Exception as e:
+                    logger.error(f"迁移 {module_name}.{online_migration} 的在线变更失败: {e}")
+                    self.remove_migration_record(module_name, online_migration)
+                    return False
+            
+            if failed:
+                return False
+        
+        return True
+    
     def rollback_migration(self, module_name: str, migration_name: str) -> bool:
         """回滚单个迁移"""
         try:
-            migration_module = importlib.import_module(
-                f"app.modules.{module_name}.migrations.{migration_name}"
-            )
+            migration_module = self._load_migration(module_name, migration_name)
             
             if hasattr(migration_module, 'downgrade'):
                 with Session(self.engine) as session:
@@ -134,15 +305,30 @@ class ModuleMigrationManager:
             logger.error(f"回滚迁移 {module_name}.{migration_name} 失败: {e}")
             return False
     
-    def migrate_module(self, module_name: str) -> bool:
-        """运行模块的所有待应用迁移"""
-        pending = self.get_pending_migrations(module_name)
+    def migrate_module(self, module_name: str, pending: Optional[List[str]] = None,
+                       transactional: Optional[bool] = None) -> bool:
+        """
+        运行模块的所有待应用迁移，pending 可由迁移计划预先计算
+
+        transactional 默认取 MODULE_MIGRATIONS_TRANSACTIONAL 配置
+        """
+        if pending is None:
+            pending = self.get_pending_migrations(module_name)
         if not pending:
             logger.info(f"模块 {module_name} 没有待应用的迁移")
             return True
+        if transactional is None:
+            transactional = settings.MODULE_MIGRATIONS_TRANSACTIONAL
         
         logger.info(f"开始为模块 {module_name} 应用 {len(pending)} 个迁移")
         
+        if transactional:
+            if not self.migrate_module_transactional(module_name, pending):
+                logger.error(f"模块 {module_name} 迁移失败")
+                return False
+            logger.info(f"模块 {module_name} 所有迁移应用完成")
+            return True
+        
         for migration in pending:
             if not self.run_migration(module_name, migration):
                 logger.error(f"模块 {module_name} 迁移在 {migration} 处失败")
@@ -153,39 +339,46 @@ class ModuleMigrationManager:
     
     def migrate_all_modules(self, module_names: List[str]) -> Dict[str, bool]:
         """运行所有模块的迁移"""
+        applied = self.get_all_applied_migrations()
         results = {}
         for module_name in module_names:
-            results[module_name] = self.migrate_module(module_name)
+            pending = self.get_pending_migrations(module_name, applied.get(module_name, []))
+            results[module_name] = self.migrate_module(module_name, pending)
         return results
     
     def get_migration_status(self) -> Dict[str, Dict[str, any]]:
-        """获取所有模块的迁移状态"""
+        """
+        获取所有模块的迁移状态
+
+        迁移文件清单来自内存缓存，数据库只查询一次；
+        已应用但文件内容已被修改的迁移列在 modified_migrations 中
+        """
+        records = self.get_applied_records()
         status = {}
         
-        # 检查所有已知模块
-        modules_dir = Path("app/modules")
-        for module_dir in modules_dir.iterdir():
-            if module_dir.is_dir() and module_dir.name not in ["__pycache__"]:
-                module_name = module_dir.name
-                migrations_dir = module_dir / "migrations"
-                
-                if migrations_dir.exists():
-                    applied = self.get_applied_migrations(module_name)
-                    pending = self.get_pending_migrations(module_name)
-                    
-                    status[module_name] = {
-                        "applied_count": len(applied),
-                        "pending_count": len(pending),
-                        "applied_migrations": applied,
-                        "pending_migrations": pending
-                    }
+        for module_name, files in self.manifest.items():
+            applied_records = records.get(module_name, {})
+            applied = list(applied_records)
+            pending = [m for m in files if m not in applied_records]
+            modified = [
+                m for m, checksum in applied_records.items()
+                if checksum and m in files and files[m] != checksum
+            ]
+            
+            status[module_name] = {
+                "applied_count": len(applied),
+                "pending_count": len(pending),
+                "applied_migrations": applied,
+                "pending_migrations": pending,
+                "modified_migrations": modified,
+            }
         
         return status
     
     def create_migration_file(self, module_name: str, migration_name: str, 
                             up_sql: str = "", down_sql: str = "") -> str:
         """创建迁移文件"""
-        migrations_dir = Path(f"app/modules/{module_name}/migrations")
+        migrations_dir = MODULES_DIR / module_name / "migrations"
         migrations_dir.mkdir(exist_ok=True)
         
         # 创建__init__.py文件
@@ -199,6 +392,9 @@ class ModuleMigrationManager:
         file_name = f"{timestamp}_{migration_name}.py"
         file_path = migrations_dir / file_name
         
+        up_body = f"    session.exec(text('''{up_sql}'''))" if up_sql else "    pass"
+        down_body = f"    session.exec(text('''{down_sql}'''))" if down_sql else "    pass"
+        
         # 迁移文件模板
         template = f'''"""
 {migration_name} 迁移
@@ -212,16 +408,18 @@ from sqlmodel import Session, text
 def upgrade(session: Session):
     """升级迁移"""
     # 在这里添加升级逻辑
-{f"    session.exec(text('''{up_sql}'''))" if up_sql else "    pass"}
+{up_body}
 
 
 def downgrade(session: Session):
     """降级迁移"""
     # 在这里添加降级逻辑
-{f"    session.exec(text('''{down_sql}'''))" if down_sql else "    pass"}
+{down_body}
 '''
         
         file_path.write_text(template)
+        # 新文件加入后清单失效，下次使用时重新扫描
+        self._manifest = None
         logger.info(f"迁移文件已创建: {file_path}")
         return str(file_path)
 
@@ -0,0 +1,270 @@
+"""
+模块迁移在线变更工具
+供迁移文件使用，在大表上做结构变更时避免长时间持锁，例如：
+
+    from app.modules.migration_ops import (
+        backfill, create_index_concurrently, execute_with_lock_timeout,
+    )
+
+    def upgrade(session: Session):
+        execute_with_lock_timeout(session, "ALTER TABLE item ADD COLUMN IF NOT EXISTS slug VARCHAR(255)")
+        backfill(session, "item", "slug = lower(title)", where="slug IS NULL")
+        create_index_concurrently(session, "idx_item_slug", "item", ["slug"])
+
+CREATE/DROP INDEX CONCURRENTLY 不能在事务中执行，分批回填也不应放在迁移的大事务里，
+这里只登记操作，由迁移管理器在迁移事务提交后依次执行
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+logger = logging.getLogger(__name__)
+
+# session.info 中登记事务外操作的键
+ONLINE_STATEMENTS_KEY = "online_statements"
+
+# 事务外操作：SQL 语句，或接收 engine 的可调用对象（如分批回填）
+OnlineOperation = Union[str, Callable[[Engine], None]]
+
+
+def defer_online(session: Session, operation: OnlineOperation) -> None:
+    """登记一个需要在事务外执行的操作"""
+    session.info.setdefault(ONLINE_STATEMENTS_KEY, []).append(operation)
+
+
+def pop_online_statements(session: Session) -> List[OnlineOperation]:
+    """取出并清空已登记的事务外操作"""
+    return session.info.pop(ONLINE_STATEMENTS_KEY, [])
+
+
+def create_index_concurrently(
+    session: Session,
+    index_name: str,
+    table: str,
+    columns: Sequence[str],
+    where: Optional[str] = None,
+    unique: bool = False,
+) -> None:
+    """在线创建索引（不阻塞写入），事务提交后执行"""
+    unique_sql = "UNIQUE " if unique else ""
+    where_sql = f" WHERE {where}" if where else ""
+    defer_online(
+        session,
+        f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {index_name} "
+        f'ON "{table}" ({", ".join(columns)}){where_sql}',
+    )
+
+
+def drop_index_concurrently(session: Session, index_name: str) -> None:
+    """在线删除索引，事务提交后执行"""
+    defer_online(session, f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def _drop_invalid_index(conn, sql: str) -> None:
+    """
+    并发建索引失败会留下 INVALID 索引，IF NOT EXISTS 会跳过它，
+    因此重试前先删除同名的无效索引
+    """
+    if "INDEX CONCURRENTLY IF NOT EXISTS" not in sql:
+        return
+    index_name = sql.split("IF NOT EXISTS", 1)[1].split()[0]
+    invalid = conn.execute(
+        text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """),
+        {"name": index_name},
+    ).first()
+    if invalid:
+        logger.warning(f"删除无效索引 {index_name} 后重建")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+
+def run_online_statements(engine: Engine, statements: List[OnlineOperation]) -> None:
+    """依次执行事务外操作，SQL 语句在 AUTOCOMMIT 连接上执行"""
+    for operation in statements:
+        if callable(operation):
+            operation(engine)
+            continue
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            _drop_invalid_index(conn, operation)
+            logger.info(f"执行在线变更: {operation}")
+            conn.execute(text(operation))
+
+
+def _is_lock_timeout(error: OperationalError) -> bool:
+    """是否为 lock_timeout 触发的错误（SQLSTATE 55P03 lock_not_available）"""
+    return getattr(error.orig, "sqlstate", None) == "55P03"
+
+
+def execute_with_lock_timeout(
+    session: Session,
+    sql: str,
+    timeout: str = "3s",
+    retries: int = 5,
+    backoff_seconds: float = 1.0,
+    params: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    带 lock_timeout 保护执行 DDL
+
+    拿不到锁时快速失败而不是排队阻塞后续所有查询；每次在独立 savepoint 中执行，
+    超时后按指数退避重试，超过重试次数则抛出异常。
+    SET LOCAL 在 savepoint 释放后仍持续到外层事务结束，因此执行后恢复原值，
+    同一事务中后续的迁移不会继承该超时。
+    """
+    previous = session.execute(text("SELECT current_setting('lock_timeout')")).scalar()
+    for attempt in range(retries + 1):
+        try:
+            with session.begin_nested():
+                session.execute(
+                    text("SELECT set_config('lock_timeout', :timeout, true)"),
+                    {"timeout": timeout},
+                )
+                session.execute(text(sql), params or {})
+            return
+        except OperationalError as e:
+            if not _is_lock_timeout(e) or attempt == retries:
+                raise
+            wait = backoff_seconds * (2**attempt)
+            logger.warning(
+                f"获取锁超时，{wait}s 后重试 ({attempt + 1}/{retries}): {sql}"
+            )
+            time.sleep(wait)
+        finally:
+            session.execute(
+                text("SELECT set_config('lock_timeout', :previous, true)"),
+                {"previous": previous},
+            )
+
+
+@dataclass
+class BackfillProgress:
+    """分批回填进度"""
+
+    table: str
+    rows_done: int
+    batches: int
+    estimated_total: int
+    elapsed_seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_done / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def percent(self) -> Optional[float]:
+        if self.estimated_total <= 0:
+            return None
+        return min(100.0, round(self.rows_done * 100 / self.estimated_total, 1))
+
+
+def _log_progress(progress: BackfillProgress) -> None:
+    percent = f"{progress.percent}%" if progress.percent is not None else "未知"
+    logger.info(
+        f"回填 {progress.table}: {progress.rows_done} 行 ({percent}), "
+        f"{progress.rows_per_second:.0f} 行/秒, 已用 {progress.elapsed_seconds:.1f}s"
+    )
+
+
+def run_backfill(
+    engine: Engine,
+    table: str,
+    set_sql: str,
+    where: str = "TRUE",
+    batch_size: int = 1000,
+    pause_seconds: float = 0.05,
+    lock_timeout: str = "3s",
+    key: str = "id",
+    params: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[[BackfillProgress], None]] = None,
+) -> int:
+    """
+    按主键分批回填，每批一个短事务，立即执行
+
+    使用主键游标（key > 上一批最大值）推进，where 条件不需要在更新后变为假；
+    批次之间暂停 pause_seconds 以限制对线上流量的影响。返回更新的总行数。
+    """
+    progress = progress or _log_progress
+    with engine.connect() as conn:
+        estimated_total = int(
+            conn.execute(
+                text(
+                    "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = :table"
+                ),
+                {"table": table},
+            ).scalar()
+            or 0
+        )
+
+    def batch_stmt(after_last_key: bool):
+        cursor = f"{key} > :last_key AND " if after_last_key else ""
+        return text(f"""
+            WITH batch AS (
+                SELECT {key} FROM "{table}"
+                WHERE {cursor}({where})
+                ORDER BY {key}
+                LIMIT :batch_size
+            )
+            UPDATE "{table}" AS t SET {set_sql}
+            FROM batch WHERE t.{key} = batch.{key}
+            RETURNING t.{key}
+        """)
+
+    # 第一批不设下界（UUID 主键没有 min() 聚合），之后从上一批最大主键之后继续
+    first_batch = batch_stmt(False)
+    next_batch = batch_stmt(True)
+
+    start = time.perf_counter()
+    rows_done = 0
+    batches = 0
+    last_key = None
+    while True:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+            if last_key is None:
+                stmt, cursor = first_batch, {}
+            else:
+                stmt, cursor = next_batch, {"last_key": last_key}
+            keys = [
+                row[0]
+                for row in conn.execute(
+                    stmt, {**(params or {}), **cursor, "batch_size": batch_size}
+                )
+            ]
+        if not keys:
+            break
+        rows_done += len(keys)
+        batches += 1
+        last_key = max(keys)
+        progress(
+            BackfillProgress(
+                table=table,
+                rows_done=rows_done,
+                batches=batches,
+                estimated_total=estimated_total,
+                elapsed_seconds=time.perf_counter() - start,
+            )
+        )
+        if len(keys) < batch_size:
+            break
+        time.sleep(pause_seconds)
+
+    logger.info(f"回填 {table} 完成，共 {rows_done} 行，{batches} 批")
+    return rows_done
+
+
+def backfill(
+    session: Session, table: str, set_sql: str, where: str = "TRUE", **kwargs: Any
+) -> None:
+    """在迁移中登记分批回填，迁移事务提交后执行（参数同 run_backfill）"""
+    defer_online(
+        session, lambda engine: run_backfill(engine, table, set_sql, where, **kwargs)
+    )
@@ -0,0 +1,104 @@
+"""
+模块迁移计划器
+按 BaseModule.dependencies 拓扑排序模块，分成若干"批次"：
+同一批次内的模块互不依赖，在独立连接上并发执行迁移
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .migration_manager import ModuleMigrationManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MigrationPlan:
+    """迁移计划：按批次排列的模块及其待应用迁移"""
+
+    waves: List[List[str]]
+    pending: Dict[str, List[str]]
+
+
+@dataclass
+class MigrationReport:
+    """迁移执行结果"""
+
+    results: Dict[str, bool] = field(default_factory=dict)
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return all(self.results.values())
+
+
+def sort_modules(dependencies: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    按依赖关系分层拓扑排序
+
+    返回批次列表，每个批次内的模块只依赖之前批次中的模块。
+    依赖缺失或存在循环依赖时抛出 RuntimeError。
+    """
+    for name, deps in dependencies.items():
+        missing = [dep for dep in deps if dep not in dependencies]
+        if missing:
+            raise RuntimeError(f"模块 {name} 缺少依赖: {', '.join(missing)}")
+
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    waves: List[List[str]] = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            raise RuntimeError(f"模块存在循环依赖: {', '.join(sorted(remaining))}")
+        waves.append(ready)
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return waves
+
+
+def build_plan(
+    manager: ModuleMigrationManager, dependencies: Dict[str, List[str]]
+) -> MigrationPlan:
+    """生成迁移计划，已应用的迁移只查询一次"""
+    waves = sort_modules(dependencies)
+    applied = manager.get_all_applied_migrations()
+    pending = {
+        name: manager.get_pending_migrations(name, applied.get(name, []))
+        for name in dependencies
+    }
+    return MigrationPlan(waves=waves, pending=pending)
+
+
+async def execute_plan(
+    manager: ModuleMigrationManager, plan: MigrationPlan
+) -> MigrationReport:
+    """按批次执行迁移，批次内各模块在独立线程（独立数据库连接）中并发运行"""
+    report = MigrationReport()
+    start = time.perf_counter()
+
+    async def run(name: str) -> None:
+        module_start = time.perf_counter()
+        report.results[name] = await asyncio.to_thread(
+            manager.migrate_module, name, plan.pending[name]
+        )
+        report.timings_ms[name] = round((time.perf_counter() - module_start) * 1000, 2)
+
+    for wave in plan.waves:
+        to_run = [name for name in wave if plan.pending[name]]
+        for name in wave:
+            if not plan.pending[name]:
+                report.results[name] = True
+                report.timings_ms[name] = 0.0
+        await asyncio.gather(*(run(name) for name in to_run))
+        if not report.success:
+            # 后续批次依赖当前批次，失败后不再继续
+            break
+
+    report.total_ms = round((time.perf_counter() - start) * 1000, 2)
+    return report
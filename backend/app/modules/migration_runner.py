@@ -0,0 +1,67 @@
+"""
+部署级迁移执行器
+多个 Uvicorn worker 同时启动时，只有一个 worker 真正执行迁移：
+1. 快速检查：一次查询比较 schema 版本哈希，一致则直接返回
+2. 否则获取 Postgres advisory lock，拿到锁后再检查一次，仍需迁移才执行
+"""
+
+import asyncio
+import logging
+import zlib
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from .migration_manager import ModuleMigrationManager
+from .migration_planner import MigrationReport, build_plan, execute_plan
+
+logger = logging.getLogger(__name__)
+
+# advisory lock 的键，所有 worker 必须一致
+MIGRATION_LOCK_KEY = zlib.crc32(b"app.module_migrations")
+
+
+async def run_migrations_once(
+    manager: ModuleMigrationManager, dependencies: Dict[str, List[str]]
+) -> Optional[MigrationReport]:
+    """
+    在 advisory lock 保护下执行迁移
+
+    schema 已是最新时返回 None（只花费一次数据库往返），否则返回迁移报告。
+    """
+    version_hash = manager.schema_version_hash(dependencies)
+    if await asyncio.to_thread(manager.get_schema_version) == version_hash:
+        logger.info("模块 schema 已是最新，跳过迁移")
+        return None
+
+    # advisory lock 是会话级的，必须在同一个连接上加锁和解锁；
+    # 连接使用自动提交，等锁与迁移期间不会一直处于 idle in transaction
+    conn = await asyncio.to_thread(manager.engine.connect)
+    conn.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        logger.info("等待迁移锁...")
+        await asyncio.to_thread(
+            conn.execute,
+            text("SELECT pg_advisory_lock(:key)"),
+            {"key": MIGRATION_LOCK_KEY},
+        )
+        try:
+            # 其他 worker 可能已在我们等锁期间完成了迁移
+            if await asyncio.to_thread(manager.get_schema_version) == version_hash:
+                logger.info("其他 worker 已完成迁移")
+                return None
+
+            await asyncio.to_thread(manager._ensure_migrations_table)
+            plan = await asyncio.to_thread(build_plan, manager, dependencies)
+            report = await execute_plan(manager, plan)
+            if report.success:
+                await asyncio.to_thread(manager.set_schema_version, version_hash)
+            return report
+        finally:
+            await asyncio.to_thread(
+                conn.execute,
+                text("SELECT pg_advisory_unlock(:key)"),
+                {"key": MIGRATION_LOCK_KEY},
+            )
+    finally:
+        await asyncio.to_thread(conn.close)
@@ -3,10 +3,17 @@
 避免循环导入问题
 """
 import uuid
+from datetime import datetime
+from typing import Any, Literal
+
 from pydantic import EmailStr
+from sqlalchemy import JSON, BigInteger, Column, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, Relationship, SQLModel
 from typing import TYPE_CHECKING
 
+from app.modules.soft_delete import SoftDeleteMixin
+
 # 使用 TYPE_CHECKING 避免运行时循环导入
 if TYPE_CHECKING:
     pass
@@ -77,8 +84,9 @@ class TradingViewUpdate(TradingViewBase):
 class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
-    items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
-    tradingviews: list["TradingView"] = Relationship(back_populates="owner", cascade_delete=True)
+    # passive_deletes: 删除用户时交给数据库 ON DELETE CASCADE，不把子记录加载进内存
+    items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True, passive_deletes=True)
+    tradingviews: list["TradingView"] = Relationship(back_populates="owner", cascade_delete=True, passive_deletes=True)
 
 
 class Item(ItemBase, table=True):
@@ -88,13 +96,115 @@ class Item(ItemBase, table=True):
     owner: User = Relationship(back_populates="items")
 
 
-class TradingView(TradingViewBase, table=True):
+class TradingView(TradingViewBase, SoftDeleteMixin, table=True):
     __tablename__ = "tradingview"
     
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     name: str = Field(max_length=255)
     owner_id: uuid.UUID = Field(foreign_key="user.id", nullable=False, ondelete="CASCADE")
     owner: User = Relationship(back_populates="tradingviews")
+    # webhook 密钥，不出现在公共模型中
+    webhook_secret: str | None = Field(default=None, max_length=64)
+
+
+class TradingViewAlert(SQLModel, table=True):
+    """webhook 收到的告警，只追加不修改"""
+    __tablename__ = "tradingview_alert"
+
+    id: int | None = Field(default=None, sa_type=BigInteger(), primary_key=True)
+    tradingview_id: uuid.UUID = Field(foreign_key="tradingview.id", nullable=False, ondelete="CASCADE")
+    received_at: datetime = Field(sa_type=DateTime(timezone=True))
+    payload: dict[str, Any] = Field(sa_column=Column(JSON().with_variant(JSONB, "postgresql"), nullable=False))
+
+
+class TradingViewBar(SQLModel, table=True):
+    """OHLCV K线，物理表由迁移创建并按 ts 分区（按月），只追加"""
+    __tablename__ = "tradingview_bar"
+
+    tradingview_id: uuid.UUID = Field(
+        foreign_key="tradingview.id", primary_key=True, ondelete="CASCADE"
+    )
+    symbol: str = Field(max_length=32, primary_key=True)
+    timeframe: str = Field(max_length=8, primary_key=True)
+    ts: datetime = Field(sa_type=DateTime(timezone=True), primary_key=True)
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0.0
+
+
+class TradingViewIndicatorState(SQLModel, table=True):
+    """在线指标状态快照，每个 (项目, 品种, 周期) 一行，version 每次写入递增"""
+    __tablename__ = "tradingview_indicator_state"
+
+    tradingview_id: uuid.UUID = Field(
+        foreign_key="tradingview.id", primary_key=True, ondelete="CASCADE"
+    )
+    symbol: str = Field(max_length=32, primary_key=True)
+    timeframe: str = Field(max_length=8, primary_key=True)
+    version: int = 0
+    state: dict[str, Any] = Field(sa_column=Column(JSON().with_variant(JSONB, "postgresql"), nullable=False))
+
+
+class TradingViewStrategy(SQLModel, table=True):
+    """项目下保存的回测策略：内置策略类型 + 参数"""
+    __tablename__ = "tradingview_strategy"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    tradingview_id: uuid.UUID = Field(
+        foreign_key="tradingview.id", nullable=False, ondelete="CASCADE"
+    )
+    name: str = Field(max_length=255)
+    kind: str = Field(max_length=32)
+    params: dict[str, Any] = Field(sa_column=Column(JSON().with_variant(JSONB, "postgresql"), nullable=False))
+    created_at: datetime = Field(sa_type=DateTime(timezone=True))
+
+
+class TradingViewBacktest(SQLModel, table=True):
+    """回测任务：状态、进度与结果（指标 + 抽样后的净值曲线）"""
+    __tablename__ = "tradingview_backtest"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    tradingview_id: uuid.UUID = Field(
+        foreign_key="tradingview.id", nullable=False, ondelete="CASCADE"
+    )
+    strategy_id: uuid.UUID = Field(foreign_key="tradingview_strategy.id", nullable=False, ondelete="CASCADE")
+    symbol: str = Field(max_length=32)
+    timeframe: str = Field(max_length=8)
+    start: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    end: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    fee_bps: float = 0.0
+    # pending / running / completed / failed
+    status: str = Field(default="pending", max_length=16)
+    progress: float = 0.0
+    result: dict[str, Any] | None = Field(default=None, sa_column=Column(JSON().with_variant(JSONB, "postgresql")))
+    error: str | None = Field(default=None, max_length=1000)
+    created_at: datetime = Field(sa_type=DateTime(timezone=True))
+    finished_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+class TradingViewAlertRule(SQLModel, table=True):
+    """服务端告警规则，写入K线时按 (品种, 周期) 评估"""
+    __tablename__ = "tradingview_alert_rule"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    tradingview_id: uuid.UUID = Field(foreign_key="tradingview.id", nullable=False, ondelete="CASCADE")
+    name: str = Field(max_length=255)
+    symbol: str = Field(max_length=32)
+    timeframe: str = Field(max_length=8)
+    # threshold / cross / percent_change
+    kind: str = Field(max_length=16)
+    source: str = Field(max_length=64)
+    op: str = Field(max_length=8)
+    value: float = 0.0
+    target: str | None = Field(default=None, max_length=64)
+    lookback: int = 1
+    cooldown_seconds: int = 0
+    enabled: bool = True
+    created_at: datetime = Field(sa_type=DateTime(timezone=True))
+    # 最后一次触发所在K线的时间，冷却期据此判断（多 worker 共享）
+    last_fired_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
 
 
 # ===== 公共API模型 =====
@@ -127,6 +237,154 @@ class TradingViewsPublic(SQLModel):
     count: int
 
 
+class TradingViewBarsIngest(SQLModel):
+    """按列批量写入K线，t 为 UTC 秒级时间戳，各列长度必须一致"""
+    symbol: str = Field(min_length=1, max_length=32)
+    timeframe: str = Field(max_length=8)
+    t: list[int]
+    o: list[float]
+    h: list[float]
+    low: list[float] = Field(alias="l")
+    c: list[float]
+    v: list[float] | None = None
+
+
+class TradingViewBarSeries(SQLModel):
+    """按列返回的K线序列"""
+    symbol: str
+    timeframe: str
+    t: list[int]
+    o: list[float]
+    h: list[float]
+    low: list[float] = Field(alias="l")
+    c: list[float]
+    v: list[float]
+
+
+class TradingViewIndicators(SQLModel):
+    """K线时间轴与各指标序列，预热期的值为 null"""
+    symbol: str
+    timeframe: str
+    t: list[int]
+    indicators: dict[str, dict[str, list[float | None]]]
+
+
+class TradingViewIndicatorsLatest(SQLModel):
+    """最新一根K线上的各指标值，预热期的值为 null"""
+    symbol: str
+    timeframe: str
+    t: int
+    values: dict[str, dict[str, float | None]]
+
+
+class TradingViewStrategyCreate(SQLModel):
+    """kind 为内置策略类型，params 中省略的参数使用默认值"""
+    name: str = Field(min_length=1, max_length=255)
+    kind: str = Field(max_length=32)
+    params: dict[str, Any] = {}
+
+
+class TradingViewStrategyPublic(SQLModel):
+    id: uuid.UUID
+    tradingview_id: uuid.UUID
+    name: str
+    kind: str
+    params: dict[str, Any]
+    created_at: datetime
+
+
+class TradingViewStrategiesPublic(SQLModel):
+    data: list[TradingViewStrategyPublic]
+    count: int
+
+
+class TradingViewBacktestCreate(SQLModel):
+    symbol: str = Field(min_length=1, max_length=32)
+    timeframe: str = Field(max_length=8)
+    start: datetime | None = None
+    end: datetime | None = None
+    fee_bps: float = Field(default=0.0, ge=0, le=1000, description="每次换仓的手续费（基点）")
+
+
+class TradingViewSweepCreate(SQLModel):
+    """在策略参数基础上展开 grid 中每个参数的取值，做全组合回测"""
+    symbol: str = Field(min_length=1, max_length=32)
+    timeframe: str = Field(max_length=8)
+    start: datetime | None = None
+    end: datetime | None = None
+    fee_bps: float = Field(default=0.0, ge=0, le=1000)
+    grid: dict[str, list[Any]]
+    rank_by: Literal["total_return", "annual_return", "sharpe", "max_drawdown", "win_rate"] = "sharpe"
+    top: int = Field(default=10, ge=1, le=100)
+
+
+class TradingViewBacktestPublic(SQLModel):
+    id: uuid.UUID
+    tradingview_id: uuid.UUID
+    strategy_id: uuid.UUID
+    symbol: str
+    timeframe: str
+    start: datetime | None
+    end: datetime | None
+    fee_bps: float
+    status: str
+    progress: float
+    result: dict[str, Any] | None
+    error: str | None
+    created_at: datetime
+    finished_at: datetime | None
+
+
+class TradingViewBacktestsPublic(SQLModel):
+    data: list[TradingViewBacktestPublic]
+    count: int
+
+
+class TradingViewAlertRuleCreate(SQLModel):
+    """
+    source / target 为K线字段（open/high/low/close/volume）或在线指标字段（如 rsi_14.value）
+    - threshold：source 高于 / 低于 value 时触发
+    - cross：source 上穿 / 下穿 target（未指定 target 时为 value）时触发
+    - percent_change：source 相对 lookback 根之前的涨跌幅（%）高于 / 低于 value 时触发
+      （source 为指标字段时 lookback 最大为 10）
+    每根写入的K线评估一次；cooldown_seconds（按K线时间）内同一规则最多触发一次，同一根K线最多触发一次
+    """
+    name: str = Field(min_length=1, max_length=255)
+    symbol: str = Field(min_length=1, max_length=32)
+    timeframe: str = Field(max_length=8)
+    kind: Literal["threshold", "cross", "percent_change"]
+    source: str = Field(default="close", max_length=64)
+    op: Literal["above", "below"]
+    value: float = 0.0
+    target: str | None = Field(default=None, max_length=64)
+    lookback: int = Field(default=1, ge=1, le=1000)
+    cooldown_seconds: int = Field(default=0, ge=0)
+    enabled: bool = True
+
+
+class TradingViewAlertRulePublic(TradingViewAlertRuleCreate):
+    id: uuid.UUID
+    tradingview_id: uuid.UUID
+    created_at: datetime
+
+
+class TradingViewAlertRulesPublic(SQLModel):
+    data: list[TradingViewAlertRulePublic]
+    count: int
+
+
+class TradingViewWebhook(SQLModel):
+    """新生成的 webhook 密钥与地址（仅在生成时返回一次）"""
+    secret: str
+    url: str
+
+
+class TradingViewEventTicket(SQLModel):
+    """实时事件订阅票据，连接 SSE / WebSocket 时以 ?ticket= 传入"""
+    ticket: str
+    expires_in: int
+
+
 # ===== 通用模型 =====
 class Message(SQLModel):
     message: str
@@ -0,0 +1,58 @@
+"""
+软删除支持 - 可选的 deleted_at 墓碑列
+
+模型混入 SoftDeleteMixin 即启用软删除：
+- 所有 ORM 查询/更新/删除自动附加 deleted_at IS NULL 条件
+- 需要包含已删除记录时使用 execution_options(include_deleted=True)
+- 墓碑由 compaction 定时任务在低峰期分批清理
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+from sqlmodel import Field, SQLModel
+
+
+class SoftDeleteMixin(SQLModel):
+    """软删除混入类，对应表需通过模块迁移添加 deleted_at 列"""
+
+    deleted_at: datetime | None = Field(default=None)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def is_soft_delete_model(model_class: type) -> bool:
+    """判断模型是否启用了软删除"""
+    return isinstance(model_class, type) and issubclass(model_class, SoftDeleteMixin)
+
+
+def soft_delete_models() -> list[type[SQLModel]]:
+    """返回所有启用软删除的表模型"""
+    models = []
+    pending = list(SoftDeleteMixin.__subclasses__())
+    while pending:
+        cls = pending.pop()
+        pending.extend(cls.__subclasses__())
+        if hasattr(cls, "__table__"):
+            models.append(cls)
+    return models
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _filter_soft_deleted(execute_state: ORMExecuteState) -> None:
+    """自动过滤已软删除的记录"""
+    if execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get("include_deleted", False):
+        return
+    execute_state.statement = execute_state.statement.options(
+        *(
+            with_loader_criteria(
+                model, model.deleted_at.is_(None), include_aliases=True
+            )
+            for model in soft_delete_models()
+        )
+    )
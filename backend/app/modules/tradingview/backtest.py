@@ -0,0 +1,333 @@
+"""
+向量化回测
+
+- 策略：内置策略类型 + 参数，由指标数组直接算出每根K线收盘时的目标仓位（-1 / 0 / 1），
+  有状态的入场/离场信号用前向填充展开，没有逐根K线的 Python 循环
+- 引擎：第 i 根K线收盘时的目标仓位持有到第 i + 1 根，收益 = 仓位 × 涨跌幅 − 换仓手续费，
+  交易按仓位不变的区间用 reduceat 汇总
+- 任务：在进程池中执行（计算不占用 API worker 的 GIL），子进程自行连接数据库读取K线，
+  分阶段更新任务进度，结果写回 tradingview_backtest
+"""
+
+import logging
+import math
+import multiprocessing
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from sqlmodel import Session
+
+from .bars import BarSeries, load_bars, timeframe_seconds
+from .events import finite_json
+from .indicators import bollinger, ema, rsi, sma
+from .models import TradingViewBacktest, TradingViewStrategy
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_YEAR = 365 * 86400
+# 年化收益的上限：很短的窗口内大涨时按复利外推会溢出为 inf
+MAX_ANNUAL_RETURN = 1e6
+
+
+# ===== 策略 =====
+def _hold(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """入场后持仓直到离场信号（同一根K线同时出现时以入场为准），返回 0 / 1 数组"""
+    state = np.full(len(entries), np.nan)
+    state[exits] = 0.0
+    state[entries] = 1.0
+    # 前向填充：每个位置取最近一次信号
+    last = np.maximum.accumulate(np.where(np.isnan(state), 0, np.arange(len(state))))
+    held = state[last]
+    return np.nan_to_num(held, nan=0.0)
+
+
+def ma_cross(
+    bars: BarSeries, fast: int, slow: int, ma: str, allow_short: bool
+) -> np.ndarray:
+    """快线在慢线之上做多，之下空仓（allow_short 时做空）"""
+    average = ema if ma == "ema" else sma
+    fast_line, slow_line = average(bars.close, fast), average(bars.close, slow)
+    with np.errstate(invalid="ignore"):
+        position = np.where(fast_line > slow_line, 1.0, -1.0 if allow_short else 0.0)
+    position[np.isnan(slow_line) | np.isnan(fast_line)] = 0.0
+    return position
+
+
+def rsi_reversion(
+    bars: BarSeries,
+    period: int,
+    lower: float,
+    upper: float,
+    exit: float,
+    allow_short: bool,
+) -> np.ndarray:
+    """RSI 低于 lower 做多、回到 exit 以上平仓；allow_short 时对称地在 upper 以上做空"""
+    value = rsi(bars.close, period)
+    with np.errstate(invalid="ignore"):
+        position = _hold(value < lower, value > exit)
+        if allow_short:
+            position -= _hold(value > upper, value < exit)
+    return position
+
+
+def bollinger_breakout(bars: BarSeries, period: int, k: float) -> np.ndarray:
+    """收盘突破上轨做多，跌回中轨以下平仓"""
+    bands = bollinger(bars.close, period, k)
+    with np.errstate(invalid="ignore"):
+        return _hold(bars.close > bands["upper"], bars.close < bands["middle"])
+
+
+# 策略类型 -> (信号函数, 默认参数)；参数类型以默认值为准
+STRATEGIES: Dict[str, tuple] = {
+    "ma_cross": (ma_cross, {"fast": 10, "slow": 30, "ma": "ema", "allow_short": False}),
+    "rsi_reversion": (
+        rsi_reversion,
+        {
+            "period": 14,
+            "lower": 30.0,
+            "upper": 70.0,
+            "exit": 50.0,
+            "allow_short": False,
+        },
+    ),
+    "bollinger_breakout": (bollinger_breakout, {"period": 20, "k": 2.0}),
+}
+
+
+def validate_strategy(kind: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """校验并补全策略参数，返回完整参数；不合法时抛出 ValueError"""
+    if kind not in STRATEGIES:
+        raise ValueError(f"不支持的策略 {kind}，可选: {', '.join(STRATEGIES)}")
+    defaults = STRATEGIES[kind][1]
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f"策略 {kind} 不支持参数: {', '.join(sorted(unknown))}")
+    result = dict(defaults)
+    for name, value in params.items():
+        expected = type(defaults[name])
+        if expected is bool:
+            if not isinstance(value, bool):
+                raise ValueError(f"参数 {name} 必须是布尔值")
+        elif expected is str:
+            if value not in ("ema", "sma"):
+                raise ValueError(f"参数 {name} 必须是 ema 或 sma")
+        else:
+            if (
+                isinstance(value, bool)
+                or not isinstance(value, (int, float))
+                or value <= 0
+            ):
+                raise ValueError(f"参数 {name} 必须是正数")
+            if expected is int and value != int(value):
+                raise ValueError(f"参数 {name} 必须是整数")
+            value = expected(value)
+        result[name] = value
+    if kind == "ma_cross" and result["fast"] >= result["slow"]:
+        raise ValueError("fast 必须小于 slow")
+    if (
+        kind == "rsi_reversion"
+        and not result["lower"] < result["exit"] < result["upper"] <= 100
+    ):
+        raise ValueError("需满足 lower < exit < upper <= 100")
+    return result
+
+
+# ===== 引擎 =====
+@dataclass
+class BacktestResult:
+    t: np.ndarray
+    position: np.ndarray
+    equity: np.ndarray
+    metrics: Dict[str, float]
+
+    def to_dict(self, max_points: int = 500) -> Dict[str, Any]:
+        """指标 + 等间隔抽样的净值曲线（始终包含最后一根）"""
+        index = np.unique(
+            np.linspace(0, len(self.t) - 1, min(max_points, len(self.t))).astype(
+                np.int64
+            )
+        )
+        return finite_json(
+            {
+                "metrics": self.metrics,
+                "equity": {
+                    "t": self.t[index].tolist(),
+                    "value": self.equity[index].tolist(),
+                },
+            }
+        )
+
+
+def _annual_return(final_equity: float, years_exponent: float) -> float:
+    """在对数空间按复利年化，结果不超过 MAX_ANNUAL_RETURN"""
+    if final_equity <= 0:
+        return -1.0
+    log_growth = math.log(final_equity) * years_exponent
+    return float(math.expm1(min(log_growth, math.log1p(MAX_ANNUAL_RETURN))))
+
+
+def run_backtest(
+    bars: BarSeries, position: np.ndarray, fee_bps: float = 0.0
+) -> BacktestResult:
+    """按目标仓位序列计算净值与统计指标"""
+    n = len(bars)
+    if n < 2:
+        raise ValueError("K线数量不足，至少需要 2 根")
+    close = bars.close
+    returns = np.diff(close) / close[:-1]
+    held = position[:-1]
+    # 第 i 根收盘换仓的手续费计入持有期 i -> i + 1
+    turnover = np.abs(np.diff(position, prepend=0.0))[:-1]
+    # 单根亏损最多为全部本金（如空头遇到价格翻倍），之后净值保持为 0
+    net = np.maximum(held * returns - turnover * fee_bps / 10_000, -1.0)
+    equity = np.concatenate(([1.0], np.cumprod(1.0 + net)))
+
+    # 仓位不变的区间为一笔交易；含爆仓的区间 log1p 为 -inf，收益为 -100%
+    starts = np.flatnonzero(np.concatenate(([True], held[1:] != held[:-1])))
+    with np.errstate(divide="ignore"):
+        segment_returns = np.expm1(np.add.reduceat(np.log1p(net), starts))
+    trades = segment_returns[held[starts] != 0]
+
+    periods_per_year = SECONDS_PER_YEAR / timeframe_seconds(bars.timeframe)
+    std = net.std()
+    drawdown = 1.0 - equity / np.maximum.accumulate(equity)
+    metrics = {
+        "bars": n,
+        "total_return": float(equity[-1] - 1.0),
+        "annual_return": _annual_return(equity[-1], periods_per_year / (n - 1)),
+        "sharpe": float(net.mean() / std * math.sqrt(periods_per_year))
+        if std > 0
+        else 0.0,
+        "max_drawdown": float(drawdown.max()),
+        "trades": int(len(trades)),
+        "win_rate": float((trades > 0).mean()) if len(trades) else 0.0,
+        "exposure": float((held != 0).mean()),
+    }
+    # NaN / inf 不能写入 JSONB，也不是合法 JSON，统一转为 null
+    return BacktestResult(bars.t, position, equity, finite_json(metrics))
+
+
+def backtest_strategy(
+    bars: BarSeries, kind: str, params: Dict[str, Any], fee_bps: float = 0.0
+) -> BacktestResult:
+    signal, _ = STRATEGIES[kind]
+    return run_backtest(bars, signal(bars, **validate_strategy(kind, params)), fee_bps)
+
+
+# ===== 任务 =====
+def _update_job(session: Session, job: TradingViewBacktest, **fields: Any) -> None:
+    for name, value in fields.items():
+        setattr(job, name, value)
+    session.add(job)
+    session.commit()
+
+
+def run_backtest_job(job_id: uuid.UUID, equity_points: int = 500) -> str:
+    """在子进程中执行一个回测任务，返回最终状态"""
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        job = session.get(TradingViewBacktest, job_id)
+        if job is None or job.status != "pending":
+            return job.status if job else "missing"
+        _update_job(session, job, status="running", progress=0.05)
+        try:
+            strategy = session.get(TradingViewStrategy, job.strategy_id)
+            if strategy is None:
+                raise ValueError("策略不存在")
+            bars = load_bars(
+                session,
+                job.tradingview_id,
+                job.symbol,
+                job.timeframe,
+                job.start,
+                job.end,
+            )
+            _update_job(session, job, progress=0.5)
+            result = backtest_strategy(
+                bars, strategy.kind, strategy.params, job.fee_bps
+            )
+            _update_job(
+                session,
+                job,
+                status="completed",
+                progress=1.0,
+                result=result.to_dict(equity_points),
+                finished_at=datetime.now(timezone.utc),
+            )
+        except Exception as e:
+            session.rollback()
+            if isinstance(e, ValueError):
+                logger.warning(f"回测任务 {job_id} 失败: {e}")
+            else:
+                logger.exception(f"回测任务 {job_id} 失败")
+            _update_job(
+                session,
+                job,
+                status="failed",
+                error=str(e)[:1000],
+                finished_at=datetime.now(timezone.utc),
+            )
+        return job.status
+
+
+def _mark_failed(job_id: uuid.UUID, error: str) -> None:
+    """子进程异常退出等无法在子进程内记录的失败"""
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        job = session.get(TradingViewBacktest, job_id)
+        if job is not None and job.status in ("pending", "running"):
+            _update_job(
+                session,
+                job,
+                status="failed",
+                error=error[:1000],
+                finished_at=datetime.now(timezone.utc),
+            )
+
+
+class BacktestRunner:
+    """回测进程池，首次提交时创建；使用 spawn 启动子进程，不继承父进程的线程与连接"""
+
+    def __init__(self, max_workers: int = 2, equity_points: int = 500):
+        self.max_workers = max_workers
+        self.equity_points = equity_points
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(
+        self, job_id: uuid.UUID, on_done: Optional[Callable[[Future], None]] = None
+    ) -> Future:
+        future = self._pool().submit(run_backtest_job, job_id, self.equity_points)
+
+        def check(done: Future) -> None:
+            error = done.exception()
+            if error is not None:
+                logger.error(f"回测任务 {job_id} 执行异常: {error!r}")
+                _mark_failed(job_id, repr(error))
+                if isinstance(error, BrokenProcessPool):
+                    # 子进程崩溃后进程池不可再用，下次提交时重建
+                    self._executor = None
+            if on_done is not None:
+                on_done(done)
+
+        future.add_done_callback(check)
+        return future
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
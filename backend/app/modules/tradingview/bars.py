@@ -0,0 +1,335 @@
+"""
+OHLCV K线存储
+
+- 写入：按列批量写入。PostgreSQL 上先 COPY 到临时表，再 INSERT ... ON CONFLICT 合并进主表，
+  同一时间戳重复写入时覆盖（最新一根K线通常会被多次推送）
+- 分区：主表按 ts 按月范围分区，写入前在独立短事务中按需创建（带 lock_timeout），进程内缓存已存在的分区
+  单批最多新建 MAX_NEW_PARTITIONS 个分区，K线时间须在 1970 年之后且不超前当前时间太多
+- 读取：按时间范围一次 COPY ... TO STDOUT (FORMAT binary)，定长行直接按结构化 dtype 解析为 NumPy 列数组
+"""
+
+import logging
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, func, select, text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from .models import TradingViewBar, TradingViewBarSeries
+
+logger = logging.getLogger(__name__)
+
+# 支持的K线周期（秒）
+TIMEFRAMES: Dict[str, int] = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "4h": 4 * 3600,
+    "1d": 86400,
+}
+
+PARTITION_LOCK_KEY = zlib.crc32(b"app.tradingview_bar_partitions")
+
+# 创建分区需要主表的锁，拿不到时快速失败而不是让后续读写全部排队
+PARTITION_LOCK_TIMEOUT = "3s"
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+# 接受的K线时间范围：1970-01-01 起，最多比当前时间超前 MAX_FUTURE_SECONDS
+MIN_BAR_TIME = 0
+MAX_FUTURE_SECONDS = 86400
+# 一批写入最多新建的月分区数，更长的历史需要分批导入
+MAX_NEW_PARTITIONS = 24
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    """周期字符串转秒数，不支持的周期抛出 ValueError"""
+    try:
+        return TIMEFRAMES[timeframe]
+    except KeyError:
+        raise ValueError(
+            f"不支持的周期 {timeframe}，可选: {', '.join(TIMEFRAMES)}"
+        ) from None
+
+
+@dataclass
+class BarSeries:
+    """列式K线序列：t 为 UTC 秒级时间戳（int64），其余列为 float64"""
+
+    symbol: str
+    timeframe: str
+    t: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def __getitem__(self, index: slice) -> "BarSeries":
+        """按行切片（各列为视图，不复制）"""
+        return BarSeries(
+            self.symbol,
+            self.timeframe,
+            self.t[index],
+            *(getattr(self, col)[index] for col in COLUMNS),
+        )
+
+    @classmethod
+    def empty(cls, symbol: str, timeframe: str) -> "BarSeries":
+        floats = np.empty(0, dtype=np.float64)
+        return cls(
+            symbol,
+            timeframe,
+            np.empty(0, dtype=np.int64),
+            floats,
+            floats.copy(),
+            floats.copy(),
+            floats.copy(),
+            floats.copy(),
+        )
+
+    @classmethod
+    def from_columns(
+        cls, symbol: str, timeframe: str, t, open, high, low, close, volume=None
+    ) -> "BarSeries":
+        """由各列构造，校验长度一致；按时间排序，同一时间戳保留最后一条"""
+        t = np.asarray(t, dtype=np.int64)
+        columns = [
+            np.asarray(col, dtype=np.float64) for col in (open, high, low, close)
+        ]
+        columns.append(
+            np.zeros(len(t)) if volume is None else np.asarray(volume, dtype=np.float64)
+        )
+        if any(len(col) != len(t) for col in columns):
+            raise ValueError("K线各列长度不一致")
+        order = np.argsort(t, kind="stable")
+        t = t[order]
+        # 稳定排序后相同时间戳按输入顺序排列，取每段的最后一条
+        keep = np.append(t[1:] != t[:-1], True) if len(t) else np.empty(0, dtype=bool)
+        return cls(symbol, timeframe, t[keep], *(col[order][keep] for col in columns))
+
+    def to_dict(self) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "t": self.t.tolist(),
+            "o": self.open.tolist(),
+            "h": self.high.tolist(),
+            "l": self.low.tolist(),
+            "c": self.close.tolist(),
+            "v": self.volume.tolist(),
+        }
+
+    def to_public(self) -> TradingViewBarSeries:
+        return TradingViewBarSeries(**self.to_dict())
+
+
+# ===== 分区管理 =====
+_known_partitions: Set[str] = set()
+
+
+def partition_name(month: np.datetime64) -> str:
+    return f"tradingview_bar_p{str(month).replace('-', '')}"
+
+
+def validate_bar_times(t: np.ndarray, now: Optional[float] = None) -> None:
+    """K线时间超出 [1970-01-01, 当前时间 + MAX_FUTURE_SECONDS] 时抛出 ValueError"""
+    if not len(t):
+        return
+    latest = int((now if now is not None else time.time()) + MAX_FUTURE_SECONDS)
+    if int(t.min()) < MIN_BAR_TIME or int(t.max()) > latest:
+        raise ValueError(
+            f"K线时间戳须在 {MIN_BAR_TIME} 到 {latest} 之间（UTC 秒），"
+            f"收到 {int(t.min())} 到 {int(t.max())}"
+        )
+
+
+def _load_partitions(engine: Engine) -> None:
+    """从系统目录刷新已存在的分区（其他 worker 创建的分区不在本进程缓存中）"""
+    with engine.connect() as conn:
+        names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'tradingview_bar'::regclass"
+            )
+        ).scalars()
+        _known_partitions.update(names)
+
+
+def ensure_partitions(engine: Engine, t: np.ndarray) -> None:
+    """
+    为 t 覆盖的每个月创建分区（已存在则跳过）
+    在独立短事务中执行：创建分区会锁住主表，不能和写入放在同一个长事务里；
+    一批最多新建 MAX_NEW_PARTITIONS 个分区，超出时抛出 ValueError
+    """
+    if not len(t):
+        return
+    months = np.unique(t.astype("datetime64[s]").astype("datetime64[M]"))
+
+    def missing_months() -> list:
+        return [m for m in months if partition_name(m) not in _known_partitions]
+
+    missing = missing_months()
+    if len(missing) > MAX_NEW_PARTITIONS:
+        _load_partitions(engine)
+        missing = missing_months()
+    if len(missing) > MAX_NEW_PARTITIONS:
+        raise ValueError(
+            f"本批K线需要新建 {len(missing)} 个月分区，超过上限 {MAX_NEW_PARTITIONS}，请按时间分批写入"
+        )
+    if not missing:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        # 多个 worker 同时写入新月份时串行创建
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY}
+        )
+        for month in missing:
+            name = partition_name(month)
+            conn.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF tradingview_bar "
+                    f"FOR VALUES FROM ('{month}-01 00:00:00+00') TO ('{month + 1}-01 00:00:00+00')"
+                )
+            )
+    for month in missing:
+        _known_partitions.add(partition_name(month))
+    logger.info(f"已创建K线分区: {', '.join(partition_name(m) for m in missing)}")
+
+
+# ===== 写入 =====
+def _copy_upsert(session: Session, tradingview_id: uuid.UUID, bars: BarSeries) -> None:
+    """COPY 到临时表后一条 INSERT ... ON CONFLICT 合并"""
+    raw = session.connection().connection.driver_connection
+    with raw.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS tradingview_bar_stage (
+                ts BIGINT, open DOUBLE PRECISION, high DOUBLE PRECISION,
+                low DOUBLE PRECISION, close DOUBLE PRECISION, volume DOUBLE PRECISION
+            ) ON COMMIT DELETE ROWS
+        """)
+        with cur.copy(
+            "COPY tradingview_bar_stage (ts, open, high, low, close, volume) FROM STDIN"
+        ) as copy:
+            for row in zip(
+                bars.t.tolist(),
+                *(getattr(bars, col).tolist() for col in COLUMNS),
+                strict=True,
+            ):
+                copy.write_row(row)
+        cur.execute(
+            """
+            INSERT INTO tradingview_bar
+                (tradingview_id, symbol, timeframe, ts, open, high, low, close, volume)
+            SELECT %s, %s, %s, to_timestamp(ts), open, high, low, close, volume
+            FROM tradingview_bar_stage
+            ON CONFLICT (tradingview_id, symbol, timeframe, ts) DO UPDATE SET
+                open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+                close = EXCLUDED.close, volume = EXCLUDED.volume
+        """,
+            (tradingview_id, bars.symbol, bars.timeframe),
+        )
+        cur.execute("TRUNCATE tradingview_bar_stage")
+
+
+def store_bars(session: Session, tradingview_id: uuid.UUID, bars: BarSeries) -> int:
+    """写入K线（由调用方提交事务），返回写入条数；时间超出范围或分区过多时抛出 ValueError"""
+    if not len(bars):
+        return 0
+    timeframe_seconds(bars.timeframe)
+    validate_bar_times(bars.t)
+    engine = session.get_bind()
+    ensure_partitions(engine, bars.t)
+    _copy_upsert(session, tradingview_id, bars)
+    return len(bars)
+
+
+# ===== 读取 =====
+# COPY 二进制格式：文件头为 11 字节签名 + 4 字节标志 + 4 字节扩展区长度（其后为扩展区），
+# 每行为 字段数(int16) + 每个字段的 长度(int32) 与值，均为大端序；以字段数 -1 结尾。
+# 所有列都是 NOT NULL 的定长类型，因此每行长度固定，可以整体按结构化 dtype 解析
+_COPY_HEADER_BYTES = 19
+_COPY_ROW = np.dtype(
+    [("fields", ">i2"), ("t_len", ">i4"), ("t", ">i8")]
+    + [field for col in COLUMNS for field in ((f"{col}_len", ">i4"), (col, ">f8"))]
+)
+
+
+def parse_binary_copy(data: bytes) -> np.ndarray:
+    """解析 COPY (SELECT ts, open, ...) TO STDOUT (FORMAT binary) 的输出为结构化数组"""
+    if data[:11] != b"PGCOPY\n\xff\r\n\x00":
+        raise ValueError("不是 COPY 二进制格式")
+    start = _COPY_HEADER_BYTES + int.from_bytes(data[15:19], "big")
+    # 去掉结尾的 2 字节 -1
+    rows = np.frombuffer(
+        data,
+        dtype=_COPY_ROW,
+        offset=start,
+        count=(len(data) - start - 2) // _COPY_ROW.itemsize,
+    )
+    if len(rows) and (rows["fields"] != 1 + len(COLUMNS)).any():
+        raise ValueError("COPY 输出的字段数不符")
+    return rows
+
+
+def load_bars(
+    session: Session,
+    tradingview_id: uuid.UUID,
+    symbol: str,
+    timeframe: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> BarSeries:
+    """
+    一次查询读取时间范围 [start, end) 内的K线，按时间升序返回
+    未指定 start 且有 limit 时返回最近的 limit 根
+    """
+    table = TradingViewBar.__table__
+    stmt = select(
+        cast(func.extract("epoch", table.c.ts), BigInteger),
+        *(table.c[col] for col in COLUMNS),
+    ).where(
+        table.c.tradingview_id == tradingview_id,
+        table.c.symbol == symbol,
+        table.c.timeframe == timeframe,
+    )
+    if start is not None:
+        stmt = stmt.where(table.c.ts >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.ts < end)
+    latest_first = start is None and limit is not None
+    stmt = stmt.order_by(table.c.ts.desc() if latest_first else table.c.ts)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    compiled = stmt.compile(dialect=session.get_bind().dialect)
+    raw = session.connection().connection.driver_connection
+    with raw.cursor() as cur:
+        with cur.copy(
+            f"COPY ({compiled}) TO STDOUT (FORMAT binary)", compiled.params
+        ) as copy:
+            data = b"".join(copy)
+    rows = parse_binary_copy(data)
+    if not len(rows):
+        return BarSeries.empty(symbol, timeframe)
+    if latest_first:
+        rows = rows[::-1]
+    return BarSeries(
+        symbol,
+        timeframe,
+        rows["t"].astype(np.int64),
+        *(rows[col].astype(np.float64) for col in COLUMNS),
+    )
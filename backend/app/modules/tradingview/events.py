@@ -0,0 +1,427 @@
+"""
+实时事件推送
+
+- 频道：project:{id}（单个项目）与 owner:{user_id}（某用户的全部项目），每个事件同时发往两者
+- 事件：created / updated / deleted（项目本身）、bars（新K线及最新指标）、alert（webhook 与规则告警）
+- 本地分发：EventBroker 在进程内把事件扇出到各订阅者的 asyncio 队列，发布方可以在任意线程
+  （同步处理函数运行在线程池中），不阻塞、不访问数据库
+- 跨 worker：可插拔的后端；PostgresNotifyBackend 通过 LISTEN/NOTIFY 转发，不需要额外服务。
+  本 worker 的事件直接本地投递，监听到自己发出的通知时跳过
+- 慢消费者：队列满时清空并投递一条 overflow 事件后断开，客户端重连后重新拉取一次快照
+- 鉴权：EventSource / 浏览器 WebSocket 无法设置请求头，客户端先用 POST 换取订阅票据，
+  再以 ?ticket= 连接。票据会出现在访问日志中，因此有效期很短，且只能用于订阅事件，
+  不能作为 API 访问令牌使用；访问令牌也不能作为票据
+"""
+
+import asyncio
+import json
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import jwt
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy.engine import URL
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.core import security
+from app.core.config import settings
+from app.core.instrumentation import Counter, register_metric
+
+from .bars import COLUMNS
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PUBLISHED = register_metric(
+    Counter(
+        "tradingview_events_published_total",
+        "Realtime events published by this worker",
+        ("type",),
+    )
+)
+SUBSCRIBERS_DROPPED = register_metric(
+    Counter(
+        "tradingview_event_subscribers_dropped_total",
+        "Realtime subscribers dropped",
+        ("reason",),
+    )
+)
+
+# NOTIFY 负载上限为 8000 字节
+NOTIFY_MAX_BYTES = 7900
+
+Event = Dict[str, Any]
+Deliver = Callable[[Event], None]
+
+
+def project_channel(tradingview_id: uuid.UUID) -> str:
+    return f"project:{tradingview_id}"
+
+
+def owner_channel(owner_id: uuid.UUID) -> str:
+    return f"owner:{owner_id}"
+
+
+# 订阅票据的 audience：带 aud 的 JWT 不能通过 API 鉴权，未带 aud 的访问令牌也不能作为票据
+STREAM_TICKET_AUDIENCE = "tradingview-events"
+
+
+def create_stream_ticket(user_id: uuid.UUID, expires_seconds: int) -> str:
+    """签发订阅票据"""
+    expires = datetime.now(timezone.utc) + timedelta(seconds=expires_seconds)
+    return jwt.encode(
+        {"exp": expires, "sub": str(user_id), "aud": STREAM_TICKET_AUDIENCE},
+        settings.SECRET_KEY,
+        algorithm=security.ALGORITHM,
+    )
+
+
+def verify_stream_ticket(ticket: str) -> Optional[uuid.UUID]:
+    """校验订阅票据，返回用户 ID；无效或已过期返回 None"""
+    try:
+        payload = jwt.decode(
+            ticket,
+            settings.SECRET_KEY,
+            algorithms=[security.ALGORITHM],
+            audience=STREAM_TICKET_AUDIENCE,
+            options={"require": ["exp", "sub", "aud"]},
+        )
+        return uuid.UUID(payload["sub"])
+    except (InvalidTokenError, ValueError):
+        return None
+
+
+def finite_json(value: Any) -> Any:
+    """NaN / inf 不是合法 JSON，转为 null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: finite_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [finite_json(v) for v in value]
+    return value
+
+
+def make_event(
+    type: str, tradingview_id: uuid.UUID, owner_id: uuid.UUID, data: Dict[str, Any]
+) -> Event:
+    return {
+        "id": uuid.uuid4().hex,
+        "type": type,
+        "tradingview_id": str(tradingview_id),
+        "owner_id": str(owner_id),
+        "time": datetime.now(timezone.utc).isoformat(),
+        "data": finite_json(data),
+    }
+
+
+def event_channels(event: Event) -> List[str]:
+    return [f"project:{event['tradingview_id']}", f"owner:{event['owner_id']}"]
+
+
+def dumps(event: Event) -> str:
+    return json.dumps(event, default=str, separators=(",", ":"))
+
+
+def format_sse(event: Event) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {dumps(event)}\n\n"
+
+
+class Subscription:
+    """一个连接的订阅，只能在事件循环中创建和读取"""
+
+    def __init__(self, channels: Iterable[str], queue_size: int):
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def _put(self, event: Event) -> None:
+        """在订阅者的事件循环中执行"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "overflow"})
+            self.closed = True
+            SUBSCRIBERS_DROPPED.inc("overflow")
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """下一个事件；超时返回 None（调用方发送心跳）"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    """进程内发布/订阅，可选地通过 backend 与其他 worker 互通"""
+
+    def __init__(
+        self, queue_size: int = 256, backend: Optional["PostgresNotifyBackend"] = None
+    ):
+        self.queue_size = queue_size
+        self.backend = backend
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels, self.queue_size)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        if self.backend is not None:
+            self.backend.start(self._deliver)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.closed = True
+        with self._lock:
+            for channel in subscription.channels:
+                subs = self._subscribers.get(channel)
+                if subs is not None:
+                    subs.discard(subscription)
+                    if not subs:
+                        del self._subscribers[channel]
+
+    def publish(self, event: Event) -> None:
+        """任意线程调用：立即投递给本地订阅者，并交给后端转发给其他 worker"""
+        EVENTS_PUBLISHED.inc(event["type"])
+        self._deliver(event)
+        if self.backend is not None:
+            self.backend.publish(event)
+
+    def _deliver(self, event: Event) -> None:
+        with self._lock:
+            targets = {
+                sub
+                for channel in event_channels(event)
+                for sub in self._subscribers.get(channel, ())
+            }
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                self.unsubscribe(subscription)
+                SUBSCRIBERS_DROPPED.inc("closed")
+
+    def stop(self) -> None:
+        if self.backend is not None:
+            self.backend.stop()
+
+
+async def sse_stream(
+    broker: EventBroker, channels: List[str], heartbeat_seconds: float
+):
+    """SSE 输出；空闲时发送注释行作为心跳，客户端断开时 Starlette 取消该生成器"""
+    subscription = broker.subscribe(channels)
+    try:
+        yield ": connected\n\n"
+        while True:
+            event = await subscription.get(heartbeat_seconds)
+            if event is None:
+                yield ": ping\n\n"
+            elif event["type"] == "overflow":
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            else:
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def websocket_stream(
+    websocket: WebSocket,
+    broker: EventBroker,
+    channels: List[str],
+    heartbeat_seconds: float,
+) -> None:
+    """WebSocket 输出（连接已 accept）；同时读取客户端消息以便及时发现断开"""
+    subscription = broker.subscribe(channels)
+
+    async def receive_until_disconnect() -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    receiver = asyncio.ensure_future(receive_until_disconnect())
+    try:
+        while not receiver.done():
+            getter = asyncio.ensure_future(subscription.get(heartbeat_seconds))
+            await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            event = getter.result()
+            await websocket.send_text(
+                dumps(event if event is not None else {"type": "ping"})
+            )
+            if event is not None and event["type"] == "overflow":
+                await websocket.close(code=1013)
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        broker.unsubscribe(subscription)
+
+
+def psycopg_connect_factory(url: URL) -> Callable[[], Any]:
+    """
+    由 SQLAlchemy URL 的各部分构造 psycopg 连接工厂
+    密码只保存在 URL 对象中（其 repr 会隐藏密码），不会拼成明文连接串出现在日志里
+    """
+
+    def connect():
+        import psycopg
+
+        params = url.translate_connect_args(username="user", database="dbname")
+        return psycopg.connect(**params, **dict(url.query), autocommit=True)
+
+    return connect
+
+
+class PostgresNotifyBackend:
+    """
+    通过 Postgres LISTEN/NOTIFY 在 worker 之间转发事件
+    发送线程攒批后一次 SELECT pg_notify(...) FROM unnest(...) 发出，请求线程只做入队；
+    监听连接在本 worker 第一次有订阅者时建立，断开后自动重连。
+    超过 NOTIFY 负载上限的事件去掉 data，只转发类型与项目（客户端按需重新拉取）。
+    connect 返回一个 autocommit 的 psycopg 连接（见 psycopg_connect_factory），对象上不保存明文连接串。
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        channel: str = "tradingview_events",
+        queue_size: int = 10_000,
+        batch_size: int = 200,
+    ):
+        self._connect = connect
+        self.channel = channel
+        self.batch_size = batch_size
+        self.origin = uuid.uuid4().hex
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._deliver: Optional[Deliver] = None
+        self._sender: Optional[threading.Thread] = None
+        self._listener: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def encode(self, event: Event) -> str:
+        payload = dumps({**event, "origin": self.origin})
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            payload = dumps(
+                {**event, "data": None, "truncated": True, "origin": self.origin}
+            )
+        return payload
+
+    def publish(self, event: Event) -> None:
+        self._ensure_thread("_sender", self._send_loop, "tradingview-events-notify")
+        try:
+            self._queue.put_nowait(self.encode(event))
+        except queue.Full:
+            logger.warning("事件通知队列已满，丢弃跨 worker 事件")
+
+    def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._ensure_thread("_listener", self._listen_loop, "tradingview-events-listen")
+
+    def _ensure_thread(self, attr: str, target: Callable[[], None], name: str) -> None:
+        if getattr(self, attr) is not None:
+            return
+        with self._start_lock:
+            if getattr(self, attr) is None:
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                setattr(self, attr, thread)
+                thread.start()
+
+    def _send_loop(self) -> None:
+        conn = None
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if conn is None or conn.closed:
+                    conn = self._connect()
+                conn.execute(
+                    "SELECT pg_notify(%s, p) FROM unnest(%s::text[]) AS p",
+                    (self.channel, batch),
+                )
+            except Exception as e:
+                logger.error(f"发送事件通知失败，丢弃 {len(batch)} 条: {e}")
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def _listen_loop(self) -> None:
+        backoff = 0.5
+        while not self._stop.is_set():
+            try:
+                with self._connect() as conn:
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    backoff = 0.5
+                    while not self._stop.is_set():
+                        for notify in conn.notifies(timeout=1.0):
+                            self._dispatch(notify.payload)
+            except Exception as e:
+                logger.warning(f"事件监听连接断开，{backoff:.1f}s 后重连: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.pop("origin", None) == self.origin or self._deliver is None:
+            return
+        self._deliver(event)
+
+    def stop(self) -> None:
+        self._stop.set()
+        for attr in ("_sender", "_listener"):
+            thread = getattr(self, attr)
+            if thread is not None:
+                thread.join(timeout=2.0)
+                setattr(self, attr, None)
+        self._stop.clear()
+
+
+def bars_event_data(written: int, updated: List[Any]) -> Dict[str, Any]:
+    """bars 事件：写入根数 + 每个受影响周期的最新一根K线与在线指标值，updated 为 [(K线, 指标状态)]"""
+    return {
+        "written": written,
+        "series": [
+            {
+                "symbol": series.symbol,
+                "timeframe": series.timeframe,
+                "bar": {
+                    "t": int(series.t[-1]),
+                    **{col: float(getattr(series, col)[-1]) for col in COLUMNS},
+                },
+                "indicators": state.values,
+            }
+            for series, state in updated
+        ],
+    }
@@ -0,0 +1,232 @@
+"""
+向量化技术指标
+
+全部基于 NumPy 数组运算，没有逐根K线的 Python 循环：
+- SMA / 布林带：累加和差分，O(n)
+- EMA / Wilder 平滑（RSI）：分块闭式解，块内用累加和计算，块间只传递一个状态值，
+  循环次数为 n / 块长而不是 n
+指标前 period - 1 个位置（预热期）为 NaN，与 TA-Lib 的约定一致。
+"""
+
+import math
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .bars import BarSeries
+
+# 块内缩放因子 decay^-k 的上限 e^300：远离 float64 溢出（约 e^709），块越长循环次数越少
+_BLOCK_EXPONENT = 300.0
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """简单移动平均"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    out[period - 1 :] = (cumsum[period:] - cumsum[:-period]) / period
+    return out
+
+
+def _ewm(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """
+    y[i] = (1 - alpha) * y[i-1] + alpha * x[i]，y[-1] = initial
+
+    块内展开为 y[i] = d^(i+1) * y0 + alpha * d^i * Σ_{k<=i} x[k] * d^-k，
+    块长保证 d^-k 不超过 e^300
+    """
+    decay = 1.0 - alpha
+    out = np.empty(len(values))
+    if decay <= 0.0:
+        out[:] = values
+        return out
+    block = max(1, int(_BLOCK_EXPONENT / -math.log(decay)))
+    previous = initial
+    for start in range(0, len(values), block):
+        chunk = values[start : start + block]
+        k = np.arange(len(chunk))
+        powers = decay**k
+        weighted = np.cumsum(chunk / powers)
+        result = powers * decay * previous + alpha * powers * weighted
+        out[start : start + len(chunk)] = result
+        previous = result[-1]
+    return out
+
+
+def _seeded_ewm(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """以前 period 个值的均值为初值的指数平滑，之前的位置为 NaN（跳过开头的 NaN）"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if period <= 0 or len(valid) == 0:
+        return out
+    first = valid[0]
+    seed_end = first + period
+    if seed_end > len(values):
+        return out
+    seed = values[first:seed_end].mean()
+    out[seed_end - 1] = seed
+    out[seed_end:] = _ewm(values[seed_end:], alpha, seed)
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """指数移动平均，alpha = 2 / (period + 1)，以前 period 个值的 SMA 为初值"""
+    return _seeded_ewm(values, period, 2.0 / (period + 1))
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """相对强弱指标（Wilder 平滑，alpha = 1 / period）"""
+    if period < 1:
+        raise ValueError(f"RSI 周期必须为正整数: {period}")
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    delta = np.diff(close)
+    avg_gain = _seeded_ewm(np.clip(delta, 0, None), period, 1.0 / period)
+    avg_loss = _seeded_ewm(np.clip(-delta, 0, None), period, 1.0 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # 没有下跌时 RSI 为 100
+    value = np.where(avg_loss == 0, 100.0, value)
+    out[1:] = np.where(np.isnan(avg_gain), np.nan, value)
+    return out
+
+
+def macd(
+    close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9
+) -> Dict[str, np.ndarray]:
+    """MACD：快慢 EMA 之差、其信号线与柱状图"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "signal": signal_line, "hist": line - signal_line}
+
+
+def bollinger(
+    close: np.ndarray, period: int = 20, k: float = 2.0
+) -> Dict[str, np.ndarray]:
+    """布林带：中轨为 SMA，上下轨为中轨 ± k 倍总体标准差"""
+    close = np.asarray(close, dtype=np.float64)
+    middle = sma(close, period)
+    if len(close) < period:
+        return {"middle": middle, "upper": middle.copy(), "lower": middle.copy()}
+    # 先减去整体均值，减轻平方和相减时的精度损失
+    centered = close - close.mean()
+    mean = sma(centered, period)
+    mean_sq = sma(centered * centered, period)
+    std = np.sqrt(np.clip(mean_sq - mean * mean, 0.0, None))
+    return {"middle": middle, "upper": middle + k * std, "lower": middle - k * std}
+
+
+# ===== 多指标计算 =====
+# 名称 -> (参数名, 默认参数)
+INDICATORS: Dict[str, Tuple[str, ...]] = {
+    "sma": ("20",),
+    "ema": ("20",),
+    "rsi": ("14",),
+    "macd": ("12", "26", "9"),
+    "bb": ("20", "2"),
+}
+
+# 各参数的最小周期，None 表示不是周期（只要求为正数，如布林带倍数）
+# 周期为 1 的 EMA / Wilder 平滑没有平滑效果，RSI 的差分序列也无法成立
+PERIOD_MINIMUMS: Dict[str, Tuple[Optional[int], ...]] = {
+    "sma": (1,),
+    "ema": (2,),
+    "rsi": (2,),
+    "macd": (2, 2, 2),
+    "bb": (1, None),
+}
+
+
+def parse_indicator_specs(spec: str) -> List[Tuple[str, Tuple[float, ...]]]:
+    """
+    解析指标列表，如 "sma:20,ema:50,rsi,macd:12:26:9,bb:20:2"，省略的参数使用默认值
+    不支持的指标、参数格式错误或周期不是足够大的整数时抛出 ValueError
+    """
+    result = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, *params = item.lower().split(":")
+        if name not in INDICATORS:
+            raise ValueError(f"不支持的指标 {name}，可选: {', '.join(INDICATORS)}")
+        defaults = INDICATORS[name]
+        if len(params) > len(defaults):
+            raise ValueError(f"指标 {name} 最多 {len(defaults)} 个参数")
+        params = params + list(defaults[len(params) :])
+        try:
+            values = tuple(float(p) for p in params)
+        except ValueError:
+            raise ValueError(f"指标参数必须是数字: {item}") from None
+        for value, minimum in zip(values, PERIOD_MINIMUMS[name], strict=True):
+            if minimum is None:
+                if not math.isfinite(value) or value <= 0:
+                    raise ValueError(f"指标参数必须为正数: {item}")
+            elif not value.is_integer() or value < minimum:
+                raise ValueError(
+                    f"指标 {name} 的周期必须是不小于 {minimum} 的整数: {item}"
+                )
+        result.append((name, values))
+    if not result:
+        raise ValueError("至少指定一个指标")
+    return result
+
+
+def indicator_label(name: str, params: Tuple[float, ...]) -> str:
+    return "_".join([name] + [f"{p:g}" for p in params])
+
+
+class IndicatorEngine:
+    """
+    在同一组K线上一次计算多个指标
+    中间结果按 (函数, 参数) 缓存，例如 ema:12 与 macd:12:26:9 共用同一条 EMA
+    """
+
+    def __init__(self, bars: BarSeries):
+        self.bars = bars
+        self._cache: Dict[Tuple, np.ndarray] = {}
+
+    def _cached(self, key: Tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _ema(self, period: int) -> np.ndarray:
+        return self._cached(("ema", period), lambda: ema(self.bars.close, period))
+
+    def _sma(self, period: int) -> np.ndarray:
+        return self._cached(("sma", period), lambda: sma(self.bars.close, period))
+
+    def compute_one(
+        self, name: str, params: Tuple[float, ...]
+    ) -> Dict[str, np.ndarray]:
+        close = self.bars.close
+        if name == "sma":
+            return {"value": self._sma(int(params[0]))}
+        if name == "ema":
+            return {"value": self._ema(int(params[0]))}
+        if name == "rsi":
+            return {"value": rsi(close, int(params[0]))}
+        if name == "macd":
+            fast, slow, signal = (int(p) for p in params)
+            line = self._ema(fast) - self._ema(slow)
+            signal_line = ema(line, signal)
+            return {"macd": line, "signal": signal_line, "hist": line - signal_line}
+        if name == "bb":
+            return bollinger(close, int(params[0]), params[1])
+        raise ValueError(f"不支持的指标 {name}")
+
+    def compute(
+        self, specs: List[Tuple[str, Tuple[float, ...]]]
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        return {
+            indicator_label(name, params): self.compute_one(name, params)
+            for name, params in specs
+        }
+
+
+def nan_to_none(values: np.ndarray) -> List:
+    """转为 JSON 可序列化的列表，NaN 输出为 null"""
+    return [None if v != v else v for v in values.tolist()]
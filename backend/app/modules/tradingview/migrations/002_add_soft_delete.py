@@ -0,0 +1,45 @@
+"""
+TradingView软删除迁移
+
+模块: tradingview
+创建时间: 2024-11-04T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """升级迁移 - 添加 deleted_at 列，索引改为仅覆盖未删除记录的部分索引"""
+    session.exec(
+        text("""
+        ALTER TABLE tradingview ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;
+
+        DROP INDEX IF EXISTS idx_tradingview_owner;
+        DROP INDEX IF EXISTS idx_tradingview_name;
+        CREATE INDEX IF NOT EXISTS idx_tradingview_owner_active
+            ON tradingview (owner_id) WHERE deleted_at IS NULL;
+        CREATE INDEX IF NOT EXISTS idx_tradingview_name_active
+            ON tradingview (name) WHERE deleted_at IS NULL;
+
+        -- 供 compaction 任务按删除时间扫描墓碑
+        CREATE INDEX IF NOT EXISTS idx_tradingview_deleted_at
+            ON tradingview (deleted_at) WHERE deleted_at IS NOT NULL;
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 清理墓碑并移除 deleted_at 列"""
+    session.exec(
+        text("""
+        DELETE FROM tradingview WHERE deleted_at IS NOT NULL;
+
+        DROP INDEX IF EXISTS idx_tradingview_deleted_at;
+        DROP INDEX IF EXISTS idx_tradingview_name_active;
+        DROP INDEX IF EXISTS idx_tradingview_owner_active;
+        CREATE INDEX IF NOT EXISTS idx_tradingview_owner ON tradingview (owner_id);
+        CREATE INDEX IF NOT EXISTS idx_tradingview_name ON tradingview (name);
+
+        ALTER TABLE tradingview DROP COLUMN IF EXISTS deleted_at;
+    """)
+    )
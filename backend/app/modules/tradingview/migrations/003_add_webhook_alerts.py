@@ -0,0 +1,37 @@
+"""
+TradingView webhook 告警迁移
+
+模块: tradingview
+创建时间: 2024-11-18T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """升级迁移 - 添加项目 webhook 密钥列和只追加的告警表"""
+    session.exec(
+        text("""
+        ALTER TABLE tradingview ADD COLUMN IF NOT EXISTS webhook_secret VARCHAR(64);
+
+        CREATE TABLE IF NOT EXISTS tradingview_alert (
+            id BIGSERIAL PRIMARY KEY,
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            received_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            payload JSONB NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_tradingview_alert_project_time
+            ON tradingview_alert (tradingview_id, received_at);
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除告警表和 webhook 密钥列"""
+    session.exec(
+        text("""
+        DROP TABLE IF EXISTS tradingview_alert;
+        ALTER TABLE tradingview DROP COLUMN IF EXISTS webhook_secret;
+    """)
+    )
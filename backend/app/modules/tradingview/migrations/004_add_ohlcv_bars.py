@@ -0,0 +1,41 @@
+"""
+TradingView OHLCV K线存储迁移
+
+模块: tradingview
+创建时间: 2024-11-25T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """
+    升级迁移 - 创建按 ts 范围分区的K线表
+    分区按月由写入路径按需创建（见 tradingview/bars.py），
+    主键 (项目, 品种, 周期, ts) 同时满足去重写入和按时间范围顺序读取
+    """
+    session.exec(
+        text("""
+        CREATE TABLE IF NOT EXISTS tradingview_bar (
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            symbol VARCHAR(32) NOT NULL,
+            timeframe VARCHAR(8) NOT NULL,
+            ts TIMESTAMP WITH TIME ZONE NOT NULL,
+            open DOUBLE PRECISION NOT NULL,
+            high DOUBLE PRECISION NOT NULL,
+            low DOUBLE PRECISION NOT NULL,
+            close DOUBLE PRECISION NOT NULL,
+            volume DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (tradingview_id, symbol, timeframe, ts)
+        ) PARTITION BY RANGE (ts);
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除K线表及其全部分区"""
+    session.exec(
+        text("""
+        DROP TABLE IF EXISTS tradingview_bar;
+    """)
+    )
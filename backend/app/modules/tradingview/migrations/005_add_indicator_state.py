@@ -0,0 +1,36 @@
+"""
+TradingView 在线指标状态迁移
+
+模块: tradingview
+创建时间: 2024-11-27T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """
+    升级迁移 - 创建在线指标状态表
+    每个 (项目, 品种, 周期) 一行，写入K线时在同一事务中更新（见 tradingview/streaming.py）
+    """
+    session.exec(
+        text("""
+        CREATE TABLE IF NOT EXISTS tradingview_indicator_state (
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            symbol VARCHAR(32) NOT NULL,
+            timeframe VARCHAR(8) NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            state JSONB NOT NULL,
+            PRIMARY KEY (tradingview_id, symbol, timeframe)
+        );
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除在线指标状态表"""
+    session.exec(
+        text("""
+        DROP TABLE IF EXISTS tradingview_indicator_state;
+    """)
+    )
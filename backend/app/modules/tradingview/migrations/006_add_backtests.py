@@ -0,0 +1,66 @@
+"""
+TradingView 回测策略与任务迁移
+
+模块: tradingview
+创建时间: 2024-12-02T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """升级迁移 - 创建策略表与回测任务表"""
+    session.exec(
+        text("""
+        CREATE TABLE IF NOT EXISTS tradingview_strategy (
+            id UUID PRIMARY KEY,
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            name VARCHAR(255) NOT NULL,
+            kind VARCHAR(32) NOT NULL,
+            params JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+    """)
+    )
+    session.exec(
+        text("""
+        CREATE INDEX IF NOT EXISTS idx_tradingview_strategy_tradingview
+        ON tradingview_strategy (tradingview_id);
+    """)
+    )
+    session.exec(
+        text("""
+        CREATE TABLE IF NOT EXISTS tradingview_backtest (
+            id UUID PRIMARY KEY,
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            strategy_id UUID NOT NULL REFERENCES tradingview_strategy(id) ON DELETE CASCADE,
+            symbol VARCHAR(32) NOT NULL,
+            timeframe VARCHAR(8) NOT NULL,
+            start TIMESTAMP WITH TIME ZONE,
+            "end" TIMESTAMP WITH TIME ZONE,
+            fee_bps DOUBLE PRECISION NOT NULL DEFAULT 0,
+            status VARCHAR(16) NOT NULL DEFAULT 'pending',
+            progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+            result JSONB,
+            error VARCHAR(1000),
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            finished_at TIMESTAMP WITH TIME ZONE
+        );
+    """)
+    )
+    session.exec(
+        text("""
+        CREATE INDEX IF NOT EXISTS idx_tradingview_backtest_tradingview
+        ON tradingview_backtest (tradingview_id, created_at DESC);
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除回测任务表与策略表"""
+    session.exec(
+        text("""
+        DROP TABLE IF EXISTS tradingview_backtest;
+        DROP TABLE IF EXISTS tradingview_strategy;
+    """)
+    )
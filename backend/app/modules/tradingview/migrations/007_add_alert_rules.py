@@ -0,0 +1,43 @@
+"""
+TradingView 告警规则迁移
+
+模块: tradingview
+创建时间: 2024-12-09T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+
+def upgrade(session: Session):
+    """升级迁移 - 创建告警规则表（按项目整体加载到内存索引）"""
+    session.exec(
+        text("""
+        CREATE TABLE IF NOT EXISTS tradingview_alert_rule (
+            id UUID PRIMARY KEY,
+            tradingview_id UUID NOT NULL REFERENCES tradingview(id) ON DELETE CASCADE,
+            name VARCHAR(255) NOT NULL,
+            symbol VARCHAR(32) NOT NULL,
+            timeframe VARCHAR(8) NOT NULL,
+            kind VARCHAR(16) NOT NULL,
+            source VARCHAR(64) NOT NULL,
+            op VARCHAR(8) NOT NULL,
+            value DOUBLE PRECISION NOT NULL DEFAULT 0,
+            target VARCHAR(64),
+            lookback INTEGER NOT NULL DEFAULT 1,
+            cooldown_seconds INTEGER NOT NULL DEFAULT 0,
+            enabled BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tradingview_alert_rule_tradingview
+        ON tradingview_alert_rule (tradingview_id);
+    """)
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除告警规则表"""
+    session.exec(
+        text("""
+        DROP TABLE IF EXISTS tradingview_alert_rule;
+    """)
+    )
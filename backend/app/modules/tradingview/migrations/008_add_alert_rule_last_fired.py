@@ -0,0 +1,27 @@
+"""
+TradingView 告警规则最后触发时间迁移
+
+模块: tradingview
+创建时间: 2024-12-16T12:00:00
+"""
+
+from sqlmodel import Session, text
+
+from app.modules.migration_ops import execute_with_lock_timeout
+
+
+def upgrade(session: Session):
+    """升级迁移 - 添加 last_fired_at 列，冷却期改为按数据库中的最后触发时间判断"""
+    execute_with_lock_timeout(
+        session,
+        "ALTER TABLE tradingview_alert_rule ADD COLUMN IF NOT EXISTS last_fired_at TIMESTAMP WITH TIME ZONE",
+    )
+
+
+def downgrade(session: Session):
+    """降级迁移 - 删除 last_fired_at 列"""
+    session.exec(
+        text("""
+        ALTER TABLE tradingview_alert_rule DROP COLUMN IF EXISTS last_fired_at;
+    """)
+    )
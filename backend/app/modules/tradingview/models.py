@@ -11,8 +11,30 @@ from app.modules.models_config import (
     
     # 数据库模型
     TradingView,
+    TradingViewAlert,
+    TradingViewAlertRule,
+    TradingViewBacktest,
+    TradingViewBar,
+    TradingViewIndicatorState,
+    TradingViewStrategy,
     
     # API 模型
     TradingViewPublic,
     TradingViewsPublic,
+    TradingViewBarSeries,
+    TradingViewBarsIngest,
+    TradingViewIndicators,
+    TradingViewIndicatorsLatest,
+    TradingViewBacktestCreate,
+    TradingViewBacktestPublic,
+    TradingViewBacktestsPublic,
+    TradingViewStrategyCreate,
+    TradingViewStrategyPublic,
+    TradingViewStrategiesPublic,
+    TradingViewSweepCreate,
+    TradingViewAlertRuleCreate,
+    TradingViewAlertRulePublic,
+    TradingViewAlertRulesPublic,
+    TradingViewWebhook,
+    TradingViewEventTicket,
 )
\ No newline at end of file
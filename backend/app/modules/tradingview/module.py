@@ -5,8 +5,29 @@ from typing import List, Type
 from fastapi import APIRouter
 from sqlmodel import SQLModel
 
+from app.core.db import engine
+
 from ..base import CRUDModule
-from .models import TradingView, TradingViewCreate, TradingViewUpdate, TradingViewPublic, TradingViewsPublic
+from .models import (
+    TradingView,
+    TradingViewBarSeries,
+    TradingViewBarsIngest,
+    TradingViewCreate,
+    TradingViewEventTicket,
+    TradingViewIndicators,
+    TradingViewIndicatorsLatest,
+    TradingViewPublic,
+    TradingViewsPublic,
+    TradingViewUpdate,
+    TradingViewWebhook,
+)
+from .backtest import BacktestRunner
+from .events import EventBroker, PostgresNotifyBackend, make_event, psycopg_connect_factory
+from .sweep import SweepRunner
+from .resample import validate_rollup_chain
+from .rules import RuleEngine
+from .streaming import IndicatorStateStore
+from .webhooks import AlertWriter, WebhookSecretCache
 
 
 class TradingViewModule(CRUDModule):
@@ -21,8 +42,64 @@ class TradingViewModule(CRUDModule):
         self.config = {
             "max_items_per_user": 100,
             "allow_public_view": False,
-            "enable_analytics": True
+            "enable_analytics": True,
+            # webhook 告警接收
+            "webhook_max_payload_bytes": 64 * 1024,
+            "webhook_secret_ttl_seconds": 60,
+            "webhook_batch_size": 500,
+            "webhook_flush_interval_ms": 100,
+            "webhook_queue_size": 100_000,
+            # K线查询单次最多返回的根数（一年 1 分钟K线约 52.6 万根）
+            "bars_max_points": 1_000_000,
+            # 写入该周期的K线时级联更新的预聚合周期（每一级是上一级的整数倍）
+            "rollup_source_timeframe": "1m",
+            "rollup_timeframes": ["5m", "1h", "1d"],
+            # 写入K线时增量维护的指标，及冷启动时回放的历史根数
+            "streaming_indicators": "sma:20,ema:20,rsi:14,macd:12:26:9,bb:20:2",
+            "streaming_bootstrap_bars": 5000,
+            # 内存中的指标状态超过该时间后读取时与数据库核对版本（多 worker）
+            "streaming_state_ttl_seconds": 1.0,
+            # 回测进程池大小与结果中保存的净值曲线点数
+            "backtest_workers": 2,
+            "backtest_equity_points": 500,
+            "max_strategies_per_project": 50,
+            # 参数扫描：进程池大小（None 为 CPU 核数 / WEB_CONCURRENCY）与单次组合数上限
+            "sweep_workers": None,
+            "sweep_max_combinations": 1000,
+            # 告警规则：每个项目的规则数上限、内存中规则索引的刷新间隔（多 worker）
+            "max_alert_rules_per_project": 200,
+            "alert_rule_ttl_seconds": 30,
+            # 实时事件推送：跨 worker 转发方式（postgres / local）、每个连接的缓冲事件数、心跳间隔
+            "events_backend": "postgres",
+            "events_queue_size": 256,
+            "events_heartbeat_seconds": 15,
+            # 订阅票据有效期：票据只用于建立连接，连接建立后不再校验
+            "events_ticket_seconds": 30,
         }
+        
+        self.webhook_secrets = WebhookSecretCache(engine, self.config["webhook_secret_ttl_seconds"])
+        self.alert_writer = AlertWriter(
+            engine,
+            batch_size=self.config["webhook_batch_size"],
+            flush_interval_ms=self.config["webhook_flush_interval_ms"],
+            queue_size=self.config["webhook_queue_size"],
+        )
+        validate_rollup_chain(self.config["rollup_source_timeframe"], self.config["rollup_timeframes"])
+        self.indicator_states = IndicatorStateStore(
+            self.config["streaming_indicators"],
+            bootstrap_bars=self.config["streaming_bootstrap_bars"],
+            ttl_seconds=self.config["streaming_state_ttl_seconds"],
+        )
+        self.backtest_runner = BacktestRunner(
+            max_workers=self.config["backtest_workers"],
+            equity_points=self.config["backtest_equity_points"],
+        )
+        self.sweep_runner = SweepRunner(max_workers=self.config["sweep_workers"])
+        self.alert_rules = RuleEngine(ttl_seconds=self.config["alert_rule_ttl_seconds"])
+        backend = None
+        if self.config["events_backend"] == "postgres" and engine.dialect.name == "postgresql":
+            backend = PostgresNotifyBackend(psycopg_connect_factory(engine.url))
+        self.events = EventBroker(queue_size=self.config["events_queue_size"], backend=backend)
     
     def get_router(self) -> APIRouter:
         """返回TradingView管理路由"""
@@ -50,6 +127,19 @@ class TradingViewModule(CRUDModule):
         
         # 添加自定义路由
         self._setup_custom_routes()
+        self._setup_webhook_routes()
+        self._setup_bar_routes()
+        self._setup_backtest_routes()
+        self._setup_alert_rule_routes()
+        self._setup_event_routes()
+    
+    def publish_event(self, type: str, tradingview_id, owner_id, data: dict) -> None:
+        """推送实时事件到项目频道与所有者频道"""
+        self.events.publish(make_event(type, tradingview_id, owner_id, data))
+    
+    def on_record_changed(self, action, id, owner_id, record) -> None:
+        """标准CRUD路由的变更推送给订阅者"""
+        self.publish_event(action, id, owner_id, record.model_dump(mode="json") if record is not None else {})
     
     def _setup_custom_routes(self):
         """设置自定义路由"""
@@ -151,8 +241,630 @@ class TradingViewModule(CRUDModule):
             session.commit()
             session.refresh(new_item)
             
-            return new_item
+            result = TradingViewPublic.model_validate(new_item)
+            self.on_record_changed("created", new_item.id, new_item.owner_id, result)
+            return result
+    
+    def _setup_webhook_routes(self):
+        """设置 webhook 告警接收路由"""
+        from app.api.deps import CurrentUser, SessionDep
+        from fastapi import HTTPException, Request
+        from fastapi.responses import JSONResponse
+        from starlette.concurrency import run_in_threadpool
+        from typing import Any
+        import secrets
+        import uuid
+        
+        from .webhooks import parse_alert_payload, secret_matches
+        
+        @self.router.post("/{id}/webhook-secret", response_model=TradingViewWebhook)
+        def rotate_webhook_secret(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            request: Request
+        ) -> TradingViewWebhook:
+            """生成（或轮换）项目的 webhook 密钥，旧密钥立即失效"""
+            tradingview = session.get(TradingView, id)
+            if not tradingview:
+                raise HTTPException(status_code=404, detail="TradingView项目未找到")
+            if not current_user.is_superuser and tradingview.owner_id != current_user.id:
+                raise HTTPException(status_code=403, detail="无权限操作此项目")
+            
+            tradingview.webhook_secret = secrets.token_urlsafe(32)
+            session.add(tradingview)
+            session.commit()
+            self.webhook_secrets.invalidate(id)
+            
+            url = request.url_for("receive_tradingview_alert", id=str(id))
+            return TradingViewWebhook(
+                secret=tradingview.webhook_secret,
+                url=str(url.include_query_params(secret=tradingview.webhook_secret)),
+            )
+        
+        @self.router.post("/{id}/webhook", status_code=202)
+        async def receive_tradingview_alert(id: uuid.UUID, request: Request, secret: str | None = None) -> Any:
+            """
+            接收 TradingView 告警（无需登录，按项目密钥鉴权）
+            密钥通过 ?secret= 或 X-Webhook-Secret 头传入；告警入队后立即返回
+            """
+            provided = secret or request.headers.get("x-webhook-secret")
+            hit, expected = self.webhook_secrets.get_cached(id)
+            if not hit:
+                expected = await run_in_threadpool(self.webhook_secrets.load, id)
+            if not secret_matches(expected, provided):
+                raise HTTPException(status_code=401, detail="Invalid webhook secret")
+            
+            body = await request.body()
+            if len(body) > self.config["webhook_max_payload_bytes"]:
+                raise HTTPException(status_code=413, detail="Payload too large")
+            
+            payload = parse_alert_payload(body)
+            if not self.alert_writer.submit(id, payload):
+                return JSONResponse(
+                    {"detail": "Alert queue is full"}, status_code=503, headers={"Retry-After": "1"}
+                )
+            self.publish_event("alert", id, self.webhook_secrets.owner_of(id), payload)
+            return {"status": "accepted"}
+    
+    @staticmethod
+    def _get_owned_tradingview(session, current_user, id) -> TradingView:
+        """获取当前用户有权访问的项目，不存在返回 404，无权限返回 403"""
+        from fastapi import HTTPException
+        
+        tradingview = session.get(TradingView, id)
+        if not tradingview:
+            raise HTTPException(status_code=404, detail="TradingView项目未找到")
+        if not current_user.is_superuser and tradingview.owner_id != current_user.id:
+            raise HTTPException(status_code=403, detail="无权限操作此项目")
+        return tradingview
+    
+    def _setup_bar_routes(self):
+        """设置K线写入与查询路由"""
+        from app.api.deps import CurrentUser, SessionDep
+        from datetime import datetime
+        from fastapi import HTTPException, Query, Request
+        from fastapi.responses import JSONResponse
+        from typing import Any
+        import uuid
+        
+        from . import wire
+        from .events import bars_event_data
+        from .bars import BarSeries, load_bars, store_bars, timeframe_seconds
+        from .resample import check_resample, resample, update_rollups
+        
+        def bars_response(request: Request, bars: BarSeries) -> Any:
+            """按 Accept 头返回列式二进制或 JSON（大数组直接输出，跳过逐元素的响应模型校验）"""
+            delta = wire.negotiate(request.headers.get("accept"))
+            if delta is not None:
+                meta = {"symbol": bars.symbol, "timeframe": bars.timeframe}
+                return wire.binary_response(meta, wire.bars_columns(bars), delta)
+            return JSONResponse(bars.to_dict(), headers={"Vary": "Accept"})
+        
+        # OpenAPI 中声明二进制响应
+        binary_responses = {200: {"content": {wire.MEDIA_TYPE: {}}}}
+        
+        @self.router.post("/{id}/bars")
+        def ingest_bars(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            bars_in: TradingViewBarsIngest
+        ) -> Any:
+            """
+            按列批量写入K线，同一时间戳的K线会被覆盖
+            同一事务中级联更新预聚合周期，增量更新各周期的在线指标状态，并在本批每根K线上评估告警规则；
+            提交后触发的告警批量交给告警写入线程，新K线与触发的告警推送给实时订阅者
+            """
+            owner_id = self._get_owned_tradingview(session, current_user, id).owner_id
+            try:
+                timeframe_seconds(bars_in.timeframe)
+                bars = BarSeries.from_columns(
+                    bars_in.symbol, bars_in.timeframe,
+                    bars_in.t, bars_in.o, bars_in.h, bars_in.low, bars_in.c, bars_in.v,
+                )
+                written = store_bars(session, id, bars)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            if not written:
+                return {"written": 0}
+            updated = [bars]
+            if bars.timeframe == self.config["rollup_source_timeframe"]:
+                updated += update_rollups(session, id, bars, self.config["rollup_timeframes"])
+            states = [
+                (series, self.indicator_states.apply(
+                    session, id, series,
+                    self.alert_rules.history_size(session, id, series.symbol, series.timeframe),
+                ))
+                for series in updated
+            ]
+            # 在指标状态行的锁内评估规则，冷却期的更新与K线一起提交
+            fired = [
+                alert
+                for series, state in states
+                for alert in self.alert_rules.evaluate(session, id, series, state)
+            ]
+            session.commit()
+
+            for alert in fired:
+                self.alert_writer.submit(id, alert)
+            self.publish_event("bars", id, owner_id, bars_event_data(written, states))
+            for alert in fired:
+                self.publish_event("alert", id, owner_id, alert)
+            return {"written": written, "alerts": len(fired)}
+        
+        @self.router.get("/{id}/bars", response_model=TradingViewBarSeries, responses=binary_responses)
+        def read_bars(
+            request: Request,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            symbol: str,
+            timeframe: str,
+            start: datetime | None = None,
+            end: datetime | None = None,
+            limit: int | None = Query(default=None, ge=1),
+        ) -> Any:
+            """按时间范围读取K线（列式），未指定 start 时返回最近的 limit 根"""
+            self._get_owned_tradingview(session, current_user, id)
+            try:
+                timeframe_seconds(timeframe)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            max_points = self.config["bars_max_points"]
+            bars = load_bars(session, id, symbol, timeframe, start, end, min(limit or max_points, max_points))
+            return bars_response(request, bars)
+        
+        @self.router.get("/{id}/bars/resampled", response_model=TradingViewBarSeries, responses=binary_responses)
+        def read_resampled_bars(
+            request: Request,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            symbol: str,
+            timeframe: str = Query(description="目标周期，如 5m、2h、1d"),
+            source: str = "1m",
+            start: datetime | None = None,
+            end: datetime | None = None,
+            limit: int | None = Query(default=None, ge=1),
+        ) -> Any:
+            """
+            把 source 周期的K线聚合到任意更粗的周期
+            目标周期是预聚合周期时直接读取 rollup，否则读取 source K线后向量化聚合
+            """
+            self._get_owned_tradingview(session, current_user, id)
+            try:
+                timeframe_seconds(source)
+                ratio = check_resample(source, timeframe) // timeframe_seconds(source)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            max_points = self.config["bars_max_points"]
+            if (source == self.config["rollup_source_timeframe"]
+                    and timeframe in self.config["rollup_timeframes"]):
+                bars = load_bars(session, id, symbol, timeframe, start, end, min(limit or max_points, max_points))
+                return bars_response(request, bars)
+            # 多读一个桶的 source K线，截取 limit 根后丢掉被截断的边界桶
+            source_limit = min(((limit or max_points) + 1) * ratio, max_points)
+            bars = resample(load_bars(session, id, symbol, source, start, end, source_limit), timeframe)
+            if limit is not None and len(bars) > limit:
+                bars = bars[-limit:] if start is None else bars[:limit]
+            return bars_response(request, bars)
+        
+        @self.router.get("/{id}/indicators/latest", response_model=TradingViewIndicatorsLatest)
+        def read_latest_indicators(
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            symbol: str,
+            timeframe: str,
+        ) -> Any:
+            """最新一根K线上的在线指标值（由内存中的增量状态直接返回）"""
+            self._get_owned_tradingview(session, current_user, id)
+            latest = self.indicator_states.latest(session, id, symbol, timeframe)
+            if latest is None or latest["t"] is None:
+                raise HTTPException(status_code=404, detail="该品种周期暂无K线")
+            return {"symbol": symbol, "timeframe": timeframe, **latest}
+        
+        @self.router.get("/{id}/indicators", response_model=TradingViewIndicators, responses=binary_responses)
+        def read_indicators(
+            request: Request,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            symbol: str,
+            timeframe: str,
+            indicators: str = Query(description="如 sma:20,ema:50,rsi:14,macd:12:26:9,bb:20:2"),
+            start: datetime | None = None,
+            end: datetime | None = None,
+            limit: int | None = Query(default=None, ge=1),
+        ) -> Any:
+            """在已存储的K线上一次计算多个技术指标（NumPy 向量化）"""
+            from .indicators import IndicatorEngine, nan_to_none, parse_indicator_specs
+            
+            self._get_owned_tradingview(session, current_user, id)
+            try:
+                timeframe_seconds(timeframe)
+                specs = parse_indicator_specs(indicators)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            max_points = self.config["bars_max_points"]
+            bars = load_bars(session, id, symbol, timeframe, start, end, min(limit or max_points, max_points))
+            try:
+                results = IndicatorEngine(bars).compute(specs)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            delta = wire.negotiate(request.headers.get("accept"))
+            if delta is not None:
+                # 二进制格式中指标列名为 "<指标>.<字段>"，预热期为 NaN
+                columns = {"t": bars.t}
+                for label, outputs in results.items():
+                    columns.update({f"{label}.{field}": values for field, values in outputs.items()})
+                return wire.binary_response({"symbol": symbol, "timeframe": timeframe}, columns, delta)
+            return JSONResponse({
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "t": bars.t.tolist(),
+                "indicators": {
+                    label: {field: nan_to_none(values) for field, values in outputs.items()}
+                    for label, outputs in results.items()
+                },
+            }, headers={"Vary": "Accept"})
+    
+    def _setup_backtest_routes(self):
+        """设置策略与回测任务路由"""
+        from app.api.deps import CurrentUser, SessionDep
+        from datetime import datetime, timezone
+        from fastapi import HTTPException
+        from sqlmodel import col, func, select
+        from typing import Any
+        import uuid
+        
+        from fastapi.responses import StreamingResponse
+        import json
+        
+        from app.models import Message
+        from .backtest import validate_strategy
+        from .bars import load_bars, timeframe_seconds
+        from .sweep import expand_grid, stream_sweep
+        from .models import (
+            TradingViewBacktest,
+            TradingViewBacktestCreate,
+            TradingViewBacktestPublic,
+            TradingViewBacktestsPublic,
+            TradingViewStrategy,
+            TradingViewStrategyCreate,
+            TradingViewStrategyPublic,
+            TradingViewStrategiesPublic,
+            TradingViewSweepCreate,
+        )
+        
+        def get_strategy(session, id: uuid.UUID, strategy_id: uuid.UUID) -> TradingViewStrategy:
+            strategy = session.get(TradingViewStrategy, strategy_id)
+            if not strategy or strategy.tradingview_id != id:
+                raise HTTPException(status_code=404, detail="策略未找到")
+            return strategy
+        
+        @self.router.post("/{id}/strategies", response_model=TradingViewStrategyPublic)
+        def create_strategy(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            strategy_in: TradingViewStrategyCreate
+        ) -> Any:
+            """保存策略，参数按策略类型校验并补全默认值"""
+            self._get_owned_tradingview(session, current_user, id)
+            try:
+                params = validate_strategy(strategy_in.kind, strategy_in.params)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            count = session.exec(
+                select(func.count()).select_from(TradingViewStrategy)
+                .where(TradingViewStrategy.tradingview_id == id)
+            ).one()
+            if count >= self.config["max_strategies_per_project"]:
+                raise HTTPException(status_code=400, detail="策略数量已达上限")
+            strategy = TradingViewStrategy(
+                tradingview_id=id, name=strategy_in.name, kind=strategy_in.kind, params=params,
+                created_at=datetime.now(timezone.utc),
+            )
+            session.add(strategy)
+            session.commit()
+            session.refresh(strategy)
+            return strategy
+        
+        @self.router.get("/{id}/strategies", response_model=TradingViewStrategiesPublic)
+        def read_strategies(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+            """项目下的全部策略"""
+            self._get_owned_tradingview(session, current_user, id)
+            strategies = session.exec(
+                select(TradingViewStrategy).where(TradingViewStrategy.tradingview_id == id)
+                .order_by(col(TradingViewStrategy.created_at))
+            ).all()
+            return TradingViewStrategiesPublic(data=strategies, count=len(strategies))
+        
+        @self.router.delete("/{id}/strategies/{strategy_id}")
+        def delete_strategy(
+            session: SessionDep, current_user: CurrentUser, id: uuid.UUID, strategy_id: uuid.UUID
+        ) -> Message:
+            """删除策略及其回测记录"""
+            self._get_owned_tradingview(session, current_user, id)
+            session.delete(get_strategy(session, id, strategy_id))
+            session.commit()
+            return Message(message="策略已删除")
+        
+        @self.router.post(
+            "/{id}/strategies/{strategy_id}/backtests",
+            response_model=TradingViewBacktestPublic,
+            status_code=202,
+        )
+        def create_backtest(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            strategy_id: uuid.UUID,
+            backtest_in: TradingViewBacktestCreate
+        ) -> Any:
+            """创建回测任务并提交到进程池，通过 GET /{id}/backtests/{backtest_id} 查询进度与结果"""
+            self._get_owned_tradingview(session, current_user, id)
+            get_strategy(session, id, strategy_id)
+            try:
+                timeframe_seconds(backtest_in.timeframe)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            job = TradingViewBacktest.model_validate(
+                backtest_in,
+                update={"tradingview_id": id, "strategy_id": strategy_id,
+                        "created_at": datetime.now(timezone.utc)},
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            self.backtest_runner.submit(job.id)
+            return job
+        
+        @self.router.post(
+            "/{id}/strategies/{strategy_id}/sweep",
+            responses={200: {"content": {"application/x-ndjson": {}}}},
+        )
+        def sweep_strategy(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            strategy_id: uuid.UUID,
+            sweep_in: TradingViewSweepCreate
+        ) -> Any:
+            """
+            参数扫描：在进程池中并行回测全部参数组合，以 NDJSON 流式返回
+            每完成一个组合输出一行 {index, params, metrics}，最后一行为 {done, total, failed, skipped, best}
+            """
+            self._get_owned_tradingview(session, current_user, id)
+            strategy = get_strategy(session, id, strategy_id)
+            try:
+                timeframe_seconds(sweep_in.timeframe)
+                combinations, skipped = expand_grid(
+                    strategy.kind, strategy.params, sweep_in.grid, self.config["sweep_max_combinations"]
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            bars = load_bars(session, id, sweep_in.symbol, sweep_in.timeframe, sweep_in.start, sweep_in.end)
+            if len(bars) < 2:
+                raise HTTPException(status_code=404, detail="该品种周期K线数量不足")
+            results = stream_sweep(
+                self.sweep_runner, bars, strategy.kind, combinations, skipped,
+                sweep_in.fee_bps, sweep_in.rank_by, sweep_in.top,
+            )
+            return StreamingResponse(
+                (json.dumps(result, ensure_ascii=False) + "\n" for result in results),
+                media_type="application/x-ndjson",
+            )
+        
+        @self.router.get("/{id}/backtests", response_model=TradingViewBacktestsPublic)
+        def read_backtests(
+            session: SessionDep, current_user: CurrentUser, id: uuid.UUID, skip: int = 0, limit: int = 20
+        ) -> Any:
+            """项目下的回测任务，按创建时间倒序"""
+            self._get_owned_tradingview(session, current_user, id)
+            where = TradingViewBacktest.tradingview_id == id
+            count = session.exec(select(func.count()).select_from(TradingViewBacktest).where(where)).one()
+            jobs = session.exec(
+                select(TradingViewBacktest).where(where)
+                .order_by(col(TradingViewBacktest.created_at).desc()).offset(skip).limit(limit)
+            ).all()
+            return TradingViewBacktestsPublic(data=jobs, count=count)
+        
+        @self.router.get("/{id}/backtests/{backtest_id}", response_model=TradingViewBacktestPublic)
+        def read_backtest(
+            session: SessionDep, current_user: CurrentUser, id: uuid.UUID, backtest_id: uuid.UUID
+        ) -> Any:
+            """回测任务的状态、进度与结果"""
+            self._get_owned_tradingview(session, current_user, id)
+            job = session.get(TradingViewBacktest, backtest_id)
+            if not job or job.tradingview_id != id:
+                raise HTTPException(status_code=404, detail="回测任务未找到")
+            return job
     
+    def _setup_alert_rule_routes(self):
+        """设置告警规则路由"""
+        from app.api.deps import CurrentUser, SessionDep
+        from datetime import datetime, timezone
+        from fastapi import HTTPException
+        from sqlmodel import col, func, select
+        from typing import Any
+        import uuid
+        
+        from app.models import Message
+        from .bars import timeframe_seconds
+        from .models import (
+            TradingViewAlertRule,
+            TradingViewAlertRuleCreate,
+            TradingViewAlertRulePublic,
+            TradingViewAlertRulesPublic,
+        )
+        from .rules import validate_rule
+        
+        @self.router.post("/{id}/alert-rules", response_model=TradingViewAlertRulePublic)
+        def create_alert_rule(
+            *,
+            session: SessionDep,
+            current_user: CurrentUser,
+            id: uuid.UUID,
+            rule_in: TradingViewAlertRuleCreate
+        ) -> Any:
+            """创建告警规则，写入该品种周期的K线时评估"""
+            self._get_owned_tradingview(session, current_user, id)
+            try:
+                timeframe_seconds(rule_in.timeframe)
+                validate_rule(
+                    rule_in.kind, rule_in.source, rule_in.target, self.config["streaming_indicators"],
+                    rule_in.lookback,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            count = session.exec(
+                select(func.count()).select_from(TradingViewAlertRule)
+                .where(TradingViewAlertRule.tradingview_id == id)
+            ).one()
+            if count >= self.config["max_alert_rules_per_project"]:
+                raise HTTPException(status_code=400, detail="告警规则数量已达上限")
+            rule = TradingViewAlertRule.model_validate(
+                rule_in, update={"tradingview_id": id, "created_at": datetime.now(timezone.utc)}
+            )
+            session.add(rule)
+            session.commit()
+            session.refresh(rule)
+            self.alert_rules.invalidate(id)
+            return rule
+        
+        @self.router.get("/{id}/alert-rules", response_model=TradingViewAlertRulesPublic)
+        def read_alert_rules(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+            """项目下的全部告警规则"""
+            self._get_owned_tradingview(session, current_user, id)
+            rules = session.exec(
+                select(TradingViewAlertRule).where(TradingViewAlertRule.tradingview_id == id)
+                .order_by(col(TradingViewAlertRule.created_at))
+            ).all()
+            return TradingViewAlertRulesPublic(data=rules, count=len(rules))
+        
+        @self.router.delete("/{id}/alert-rules/{rule_id}")
+        def delete_alert_rule(
+            session: SessionDep, current_user: CurrentUser, id: uuid.UUID, rule_id: uuid.UUID
+        ) -> Message:
+            """删除告警规则"""
+            self._get_owned_tradingview(session, current_user, id)
+            rule = session.get(TradingViewAlertRule, rule_id)
+            if not rule or rule.tradingview_id != id:
+                raise HTTPException(status_code=404, detail="告警规则未找到")
+            session.delete(rule)
+            session.commit()
+            self.alert_rules.invalidate(id)
+            return Message(message="告警规则已删除")
+    
+    def _setup_event_routes(self):
+        """设置实时事件推送路由（SSE 与 WebSocket），替代轮询列表与统计接口"""
+        from app.api.deps import CurrentUser, get_current_user
+        from app.modules.core.models import User
+        from fastapi import HTTPException, Request, WebSocket
+        from fastapi.responses import StreamingResponse
+        from sqlmodel import Session
+        from starlette.concurrency import run_in_threadpool
+        from starlette.requests import HTTPConnection
+        from typing import Any, Optional
+        import uuid
+
+        from .events import (
+            create_stream_ticket,
+            owner_channel,
+            project_channel,
+            sse_stream,
+            verify_stream_ticket,
+            websocket_stream,
+        )
+
+        def bearer_token(connection: HTTPConnection) -> Optional[str]:
+            scheme, _, credentials = connection.headers.get("authorization", "").partition(" ")
+            if scheme.lower() == "bearer" and credentials:
+                return credentials
+            return None
+
+        def authenticate(session: Session, token: Optional[str], ticket: Optional[str]) -> User:
+            """优先使用 Authorization 头；EventSource / 浏览器 WebSocket 无法设置请求头时使用订阅票据"""
+            if token:
+                try:
+                    return get_current_user(session, token)
+                except HTTPException as e:
+                    # 令牌无效、用户不存在或已停用都按未认证处理
+                    raise HTTPException(status_code=401, detail=e.detail) from e
+            user_id = verify_stream_ticket(ticket) if ticket else None
+            if user_id is None:
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            user = session.get(User, user_id)
+            if not user or not user.is_active:
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            return user
+
+        def resolve_channel(token: Optional[str], ticket: Optional[str], id: Optional[uuid.UUID]) -> str:
+            """鉴权并返回订阅频道；数据库会话只在鉴权期间持有，不随长连接占用"""
+            with Session(engine) as session:
+                user = authenticate(session, token, ticket)
+                if id is None:
+                    return owner_channel(user.id)
+                self._get_owned_tradingview(session, user, id)
+                return project_channel(id)
+
+        def sse_response(channel: str) -> StreamingResponse:
+            return StreamingResponse(
+                sse_stream(self.events, [channel], self.config["events_heartbeat_seconds"]),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        async def serve_websocket(websocket: WebSocket, ticket: Optional[str], id: Optional[uuid.UUID]) -> None:
+            try:
+                channel = await run_in_threadpool(resolve_channel, bearer_token(websocket), ticket, id)
+            except HTTPException as e:
+                await websocket.close(code=1008, reason=str(e.detail))
+                return
+            await websocket.accept()
+            await websocket_stream(websocket, self.events, [channel], self.config["events_heartbeat_seconds"])
+
+        @self.router.post("/events/ticket", response_model=TradingViewEventTicket)
+        def create_event_ticket(current_user: CurrentUser) -> Any:
+            """
+            签发实时事件订阅票据，用于 ?ticket= 连接 SSE / WebSocket
+            票据会出现在访问日志中：有效期很短、只能订阅事件，不能代替访问令牌调用其他接口
+            """
+            expires_in = self.config["events_ticket_seconds"]
+            return TradingViewEventTicket(
+                ticket=create_stream_ticket(current_user.id, expires_in), expires_in=expires_in
+            )
+
+        sse_responses = {200: {"content": {"text/event-stream": {}}}}
+
+        @self.router.get("/events/stream", response_class=StreamingResponse, responses=sse_responses)
+        async def stream_owner_events(request: Request, ticket: Optional[str] = None) -> Any:
+            """当前用户全部项目的实时事件（SSE）：created / updated / deleted / bars / alert"""
+            return sse_response(await run_in_threadpool(resolve_channel, bearer_token(request), ticket, None))
+
+        @self.router.get("/{id}/events", response_class=StreamingResponse, responses=sse_responses)
+        async def stream_project_events(request: Request, id: uuid.UUID, ticket: Optional[str] = None) -> Any:
+            """单个项目的实时事件（SSE）"""
+            return sse_response(await run_in_threadpool(resolve_channel, bearer_token(request), ticket, id))
+
+        @self.router.websocket("/events/ws")
+        async def owner_events_ws(websocket: WebSocket, ticket: Optional[str] = None) -> None:
+            """当前用户全部项目的实时事件（WebSocket，每条消息一个 JSON 事件）"""
+            await serve_websocket(websocket, ticket, None)
+
+        @self.router.websocket("/{id}/events/ws")
+        async def project_events_ws(websocket: WebSocket, id: uuid.UUID, ticket: Optional[str] = None) -> None:
+            """单个项目的实时事件（WebSocket）"""
+            await serve_websocket(websocket, ticket, id)
+
     @property
     def migration_path(self) -> str:
         """TradingView模块迁移路径"""
@@ -167,10 +879,16 @@ class TradingViewModule(CRUDModule):
         
         # 为User模型添加tradingviews字段
         if not hasattr(User, 'tradingviews'):
-            User.tradingviews = Relationship(back_populates="owner", cascade_delete=True)
+            User.tradingviews = Relationship(
+                back_populates="owner", cascade_delete=True, passive_deletes=True
+            )
             User.model_rebuild()
     
     def on_disable(self):
         """模块禁用时的回调"""
         super().on_disable()
-        # 可以在这里清理资源或记录日志
+        # 写完队列中剩余的告警
+        self.alert_writer.stop()
+        self.backtest_runner.shutdown()
+        self.sweep_runner.shutdown()
+        self.events.stop()
@@ -0,0 +1,104 @@
+"""
+K线周期重采样
+
+- resample：向量化 group-by，把K线聚合到更粗的周期（开=首根开盘，高=最高，低=最低，
+  收=末根收盘，量=求和），桶按 UTC 纪元对齐
+- 预聚合：常用周期（默认 5m / 1h / 1d）作为 rollup 与原始K线存在同一张表中，
+  写入底层K线时级联增量更新：每一级只重读被影响的桶内的下一级K线
+  （1m → 5m 最多 5 根/桶，5m → 1h 12 根/桶，1h → 1d 24 根/桶），而不是整段历史
+"""
+
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import List, Sequence
+
+import numpy as np
+from sqlmodel import Session
+
+from .bars import TIMEFRAMES, BarSeries, load_bars, store_bars
+
+_TIMEFRAME_PATTERN = re.compile(r"^(\d+)([mhd])$")
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_timeframe(timeframe: str) -> int:
+    """任意 "<n>m" / "<n>h" / "<n>d" 周期转秒数，格式错误抛出 ValueError"""
+    if timeframe in TIMEFRAMES:
+        return TIMEFRAMES[timeframe]
+    match = _TIMEFRAME_PATTERN.match(timeframe)
+    if not match or int(match.group(1)) <= 0:
+        raise ValueError(f"无法识别的周期 {timeframe}，格式如 5m、2h、1d")
+    return int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+def check_resample(source: str, target: str) -> int:
+    """校验 target 是 source 的整数倍且更粗，返回 target 秒数"""
+    source_seconds, target_seconds = parse_timeframe(source), parse_timeframe(target)
+    if target_seconds <= source_seconds or target_seconds % source_seconds:
+        raise ValueError(f"周期 {target} 不是 {source} 的更粗整数倍")
+    return target_seconds
+
+
+def bucket_start(t: np.ndarray, seconds: int) -> np.ndarray:
+    return t - t % seconds
+
+
+def resample(bars: BarSeries, timeframe: str) -> BarSeries:
+    """把按时间升序的K线聚合到更粗的周期，没有K线的桶不输出"""
+    seconds = check_resample(bars.timeframe, timeframe)
+    if not len(bars):
+        return BarSeries.empty(bars.symbol, timeframe)
+    buckets = bucket_start(bars.t, seconds)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(bars)) - 1
+    return BarSeries(
+        bars.symbol,
+        timeframe,
+        buckets[starts],
+        bars.open[starts],
+        np.maximum.reduceat(bars.high, starts),
+        np.minimum.reduceat(bars.low, starts),
+        bars.close[ends],
+        np.add.reduceat(bars.volume, starts),
+    )
+
+
+def validate_rollup_chain(source: str, chain: Sequence[str]) -> None:
+    """rollup 链中每一级必须是上一级的整数倍，且是标准周期（写入同一张K线表）"""
+    previous = source
+    for timeframe in chain:
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"rollup 周期必须是标准周期: {timeframe}")
+        check_resample(previous, timeframe)
+        previous = timeframe
+
+
+def update_rollups(
+    session: Session, tradingview_id: uuid.UUID, bars: BarSeries, chain: Sequence[str]
+) -> List[BarSeries]:
+    """
+    底层K线写入后（同一事务内）级联更新各级 rollup，返回每一级被更新的K线
+    chain 的第一级由 bars 的周期聚合，之后每一级由上一级聚合
+    """
+    updated = []
+    current = bars
+    for timeframe in chain:
+        if not len(current):
+            break
+        seconds = parse_timeframe(timeframe)
+        start = int(bucket_start(current.t[:1], seconds)[0])
+        end = int(bucket_start(current.t[-1:], seconds)[0]) + seconds
+        # 重读被影响的桶内的下一级K线（含本次刚写入的），保证部分桶的聚合完整
+        lower = load_bars(
+            session,
+            tradingview_id,
+            current.symbol,
+            current.timeframe,
+            datetime.fromtimestamp(start, timezone.utc),
+            datetime.fromtimestamp(end, timezone.utc),
+        )
+        current = resample(lower, timeframe)
+        store_bars(session, tradingview_id, current)
+        updated.append(current)
+    return updated
@@ -0,0 +1,360 @@
+"""
+服务端告警规则
+
+- 编译：规则按项目整体加载一次，编译为 {(品种, 周期): [规则]} 的索引，取值函数在编译时确定，
+  写入一批K线时只评估该品种周期下的规则
+- 评估：在写入K线的事务中、指标状态行的锁内进行，本批新增或覆盖的每根K线各评估一次
+  （回放历史初始化指标状态时只评估最后一根，不会批量触发旧告警）；
+  上一根与 lookback 根之前的 OHLCV 从 tradingview_bar 读取，指标值取自持久化的指标状态 history，
+  同一根K线被重复推送时仍以上一根K线为基准
+- 规则本身不保存运行时状态，多 worker 下结果一致；冷却期以 tradingview_alert_rule.last_fired_at
+  （K线时间）判断，并在同一事务中更新，同一条件在多个 worker 之间只触发一次
+- 分发：触发的告警由调用方在提交后一次性批量交给告警写入线程（与 webhook 告警写入同一张表）
+- 指标：每次评估的耗时与触发次数输出到 /metrics
+"""
+
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlmodel import Session
+
+from app.core.instrumentation import Counter, Histogram, register_metric
+
+from .bars import COLUMNS, BarSeries, load_bars
+from .models import TradingViewAlertRule, TradingViewAlertRulePublic
+from .streaming import IndicatorSet, indicator_fields
+
+EVALUATION_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+
+RULE_EVALUATION_LATENCY = register_metric(
+    Histogram(
+        "tradingview_rule_evaluation_seconds",
+        "Alert rule evaluation latency per bar write",
+        EVALUATION_BUCKETS,
+        ("timeframe",),
+    )
+)
+RULES_EVALUATED = register_metric(
+    Counter(
+        "tradingview_rules_evaluated_total",
+        "Alert rules evaluated",
+        ("timeframe",),
+    )
+)
+RULES_FIRED = register_metric(
+    Counter(
+        "tradingview_rules_fired_total",
+        "Alert rules fired",
+        ("kind",),
+    )
+)
+
+# 指标取值的 percent_change 规则最多回看的K线根数：指标值 history 随每次写入整体持久化，
+# 保留的根数直接决定写入开销
+MAX_INDICATOR_LOOKBACK = 10
+
+Getter = Callable[[Dict[str, float], Dict[str, Dict[str, float]]], float]
+IndicatorValues = Dict[str, Dict[str, float]]
+
+
+def available_sources(spec: str) -> List[str]:
+    """规则可引用的取值：K线字段 + 在线指标字段"""
+    return list(COLUMNS) + indicator_fields(spec)
+
+
+def validate_rule(
+    kind: str, source: str, target: Optional[str], spec: str, lookback: int = 1
+) -> None:
+    sources = available_sources(spec)
+    for name in filter(None, (source, target)):
+        if name not in sources:
+            raise ValueError(f"未知的取值 {name}，可选: {', '.join(sources)}")
+    if target is not None and kind != "cross":
+        raise ValueError("只有 cross 规则可以指定 target")
+    if (
+        kind == "percent_change"
+        and source not in COLUMNS
+        and lookback > MAX_INDICATOR_LOOKBACK
+    ):
+        raise ValueError(
+            f"取指标值的 percent_change 规则 lookback 最大为 {MAX_INDICATOR_LOOKBACK}"
+        )
+
+
+def _getter(source: str) -> Getter:
+    if source in COLUMNS:
+        return lambda bar, indicators: bar[source]
+    label, field = source.split(".", 1)
+    return lambda bar, indicators: indicators.get(label, {}).get(field, math.nan)
+
+
+class RuleFrame:
+    """评估窗口：按时间升序的最近若干根K线及其指标值，规则按下标取当前、上一根与 lookback 根之前的值"""
+
+    def __init__(self, bars: BarSeries, indicators: Dict[int, IndicatorValues]):
+        self.t: List[int] = bars.t.tolist()
+        self._columns = {col: getattr(bars, col).tolist() for col in COLUMNS}
+        self._indicators = indicators
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def inputs(self, i: int) -> Tuple[Dict[str, float], IndicatorValues]:
+        """第 i 根K线的 OHLCV 与指标值（指标值缺失时为空，取值为 NaN）"""
+        return {
+            col: values[i] for col, values in self._columns.items()
+        }, self._indicators.get(self.t[i], {})
+
+
+class CompiledRule:
+    """编译后的规则（不含运行时状态）"""
+
+    def __init__(self, rule: TradingViewAlertRule):
+        # 复制为普通对象，不引用会话中的 ORM 实例
+        self.rule = rule = TradingViewAlertRulePublic.model_validate(rule)
+        self.above = rule.op == "above"
+        self.source = _getter(rule.source)
+        self.target = _getter(rule.target) if rule.target else None
+
+    @property
+    def window(self) -> int:
+        """评估需要的之前K线根数"""
+        kind = self.rule.kind
+        return (
+            self.rule.lookback
+            if kind == "percent_change"
+            else 1
+            if kind == "cross"
+            else 0
+        )
+
+    @property
+    def indicator_window(self) -> int:
+        """需要保留指标值的K线根数（含当前K线），最多 MAX_INDICATOR_LOOKBACK + 1"""
+        uses_indicator = any(
+            "." in name for name in filter(None, (self.rule.source, self.rule.target))
+        )
+        return min(self.window, MAX_INDICATOR_LOOKBACK) + 1 if uses_indicator else 0
+
+    def _values(self, frame: RuleFrame, i: int) -> Tuple[float, float]:
+        bar, indicators = frame.inputs(i)
+        level = self.target(bar, indicators) if self.target else self.rule.value
+        return self.source(bar, indicators), level
+
+    def evaluate(self, frame: RuleFrame, i: int) -> Optional[float]:
+        """第 i 根K线满足条件时返回触发值（不考虑冷却期）"""
+        x, level = self._values(frame, i)
+        if x != x or level != level:
+            return None
+        kind = self.rule.kind
+        if kind == "threshold":
+            return x if (x > level if self.above else x < level) else None
+        if kind == "cross":
+            if i < 1:
+                return None
+            prev_x, prev_level = self._values(frame, i - 1)
+            crossed = (
+                (prev_x <= prev_level and x > level)
+                if self.above
+                else (prev_x >= prev_level and x < level)
+            )
+            return x if crossed else None
+        # percent_change
+        if i < self.rule.lookback:
+            return None
+        reference = self._values(frame, i - self.rule.lookback)[0]
+        if not reference or reference != reference:
+            return None
+        change = (x / reference - 1.0) * 100.0
+        return change if (change >= level if self.above else change <= level) else None
+
+    def alert(self, ts: int, value: float) -> Dict[str, Any]:
+        rule = self.rule
+        return {
+            "source": "rule",
+            "rule_id": str(rule.id),
+            "rule": rule.name,
+            "kind": rule.kind,
+            "symbol": rule.symbol,
+            "timeframe": rule.timeframe,
+            "t": ts,
+            "value": value,
+            "message": f"{rule.name}: {rule.source} {rule.kind} {rule.op} {rule.target or f'{rule.value:g}'}",
+        }
+
+
+Candidate = Tuple[CompiledRule, int, float]
+
+
+def find_candidates(
+    rules: List[CompiledRule], frame: RuleFrame, indices: List[int]
+) -> List[Candidate]:
+    """在窗口的指定K线上评估规则，返回满足条件的 (规则, K线时间, 触发值)，按K线时间排序"""
+    candidates = []
+    for i in indices:
+        for compiled in rules:
+            value = compiled.evaluate(frame, i)
+            if value is not None:
+                candidates.append((compiled, frame.t[i], value))
+    return candidates
+
+
+def apply_cooldown(
+    candidates: List[Candidate], last_fired: Dict[uuid.UUID, Optional[int]]
+) -> List[Candidate]:
+    """
+    按时间顺序筛选满足冷却期的候选，last_fired 为各规则最后触发的K线时间，原地更新
+    同一根或更早的K线不再触发
+    """
+    fired = []
+    for candidate in candidates:
+        compiled, ts, _ = candidate
+        last = last_fired.get(compiled.rule.id)
+        if last is not None and (
+            ts <= last or ts - last < compiled.rule.cooldown_seconds
+        ):
+            continue
+        last_fired[compiled.rule.id] = ts
+        fired.append(candidate)
+    return fired
+
+
+RuleIndex = Dict[Tuple[str, str], List[CompiledRule]]
+
+
+class RuleEngine:
+    """按项目缓存编译后的规则索引，TTL 到期后重新加载"""
+
+    def __init__(self, ttl_seconds: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self._projects: Dict[uuid.UUID, Tuple[float, RuleIndex]] = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, session: Session, tradingview_id: uuid.UUID) -> RuleIndex:
+        rules = (
+            session.execute(
+                select(TradingViewAlertRule).where(
+                    TradingViewAlertRule.tradingview_id == tradingview_id,
+                    TradingViewAlertRule.enabled,
+                )
+            )
+            .scalars()
+            .all()
+        )
+        index: RuleIndex = {}
+        for rule in rules:
+            index.setdefault((rule.symbol, rule.timeframe), []).append(
+                CompiledRule(rule)
+            )
+        return index
+
+    def rules_for(
+        self, session: Session, tradingview_id: uuid.UUID, symbol: str, timeframe: str
+    ) -> List[CompiledRule]:
+        entry = self._projects.get(tradingview_id)
+        if entry is None or entry[0] < time.monotonic():
+            index = self._compile(session, tradingview_id)
+            with self._lock:
+                self._projects[tradingview_id] = (
+                    time.monotonic() + self.ttl_seconds,
+                    index,
+                )
+        else:
+            index = entry[1]
+        return index.get((symbol, timeframe), [])
+
+    def invalidate(self, tradingview_id: uuid.UUID) -> None:
+        """规则变更后本 worker 立即重新加载"""
+        entry = self._projects.get(tradingview_id)
+        if entry is not None:
+            with self._lock:
+                self._projects[tradingview_id] = (0.0, entry[1])
+
+    def history_size(
+        self, session: Session, tradingview_id: uuid.UUID, symbol: str, timeframe: str
+    ) -> int:
+        """该品种周期的规则需要在指标状态中保留指标值的K线根数"""
+        rules = self.rules_for(session, tradingview_id, symbol, timeframe)
+        return max((compiled.indicator_window for compiled in rules), default=0)
+
+    def _claim(self, session: Session, candidates: List[Candidate]) -> List[Candidate]:
+        """按数据库中的 last_fired_at 判断冷却期，并在当前事务中更新"""
+        table = TradingViewAlertRule.__table__
+        ids = {compiled.rule.id for compiled, _, _ in candidates}
+        rows = session.execute(
+            select(table.c.id, table.c.last_fired_at)
+            .where(table.c.id.in_(ids))
+            .with_for_update()
+        ).all()
+        last_fired = {
+            rule_id: int(fired_at.timestamp()) if fired_at is not None else None
+            for rule_id, fired_at in rows
+        }
+        # 规则已被删除
+        candidates = [
+            candidate for candidate in candidates if candidate[0].rule.id in last_fired
+        ]
+        fired = apply_cooldown(candidates, last_fired)
+        fired_ids = {compiled.rule.id for compiled, _, _ in fired}
+        if fired_ids:
+            session.execute(
+                update(table)
+                .where(table.c.id == bindparam("rule_id"))
+                .values(last_fired_at=bindparam("fired_at")),
+                [
+                    {
+                        "rule_id": rule_id,
+                        "fired_at": datetime.fromtimestamp(
+                            last_fired[rule_id], timezone.utc
+                        ),
+                    }
+                    for rule_id in fired_ids
+                ],
+            )
+        return fired
+
+    def evaluate(
+        self,
+        session: Session,
+        tradingview_id: uuid.UUID,
+        bars: BarSeries,
+        indicator_set: IndicatorSet,
+    ) -> List[Dict[str, Any]]:
+        """
+        在写入K线的事务中评估该品种周期的全部规则，返回触发的告警（按K线时间排序）
+        评估本批新增或覆盖的每根K线；指标状态由历史回放初始化时只评估最后一根
+        """
+        rules = self.rules_for(session, tradingview_id, bars.symbol, bars.timeframe)
+        if not rules or not len(bars):
+            return []
+        started = time.perf_counter()
+        last_ts = int(bars.t[-1])
+        targets = (
+            bars.t[bars.t >= indicator_set.applied_from]
+            if indicator_set.applied_from is not None
+            else bars.t[-1:]
+        )
+        window = load_bars(
+            session,
+            tradingview_id,
+            bars.symbol,
+            bars.timeframe,
+            end=datetime.fromtimestamp(last_ts + 1, timezone.utc),
+            limit=len(targets) + max(compiled.window for compiled in rules),
+        )
+        frame = RuleFrame(window, dict(indicator_set.history))
+        candidates = find_candidates(
+            rules, frame, np.flatnonzero(np.isin(window.t, targets)).tolist()
+        )
+        fired = self._claim(session, candidates) if candidates else []
+        for compiled, _, _ in fired:
+            RULES_FIRED.inc(compiled.rule.kind)
+        RULE_EVALUATION_LATENCY.observe(time.perf_counter() - started, bars.timeframe)
+        RULES_EVALUATED.inc(bars.timeframe, amount=len(rules) * len(targets))
+        return [compiled.alert(ts, value) for compiled, ts, value in fired]
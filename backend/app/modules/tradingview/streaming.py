@@ -0,0 +1,476 @@
+"""
+增量（在线）指标状态
+
+新K线到来时每个指标 O(1) 更新，不再对整段历史重算：
+- EMA / Wilder 平滑：只保存当前值和预热期累加和
+- SMA / 布林带：定长环形缓冲区维护窗口和与平方和，缓冲区每写满一圈精确重算一次以消除累计误差
+- RSI：上一根收盘价 + 两条 Wilder 平滑
+
+与批量计算（indicators.py）使用相同的预热与初值约定，结果一致。
+同一时间戳重复推送（未走完的K线）时，先回滚到该K线之前的快照再更新。
+
+状态按 (项目, 品种, 周期) 保存在内存中，并随每次K线写入持久化到 tradingview_indicator_state；
+写入时对状态行加锁并比较版本号，多 worker 下内存状态过期会自动从数据库重新加载。
+状态中同时保存最近几根K线的指标值（history），供告警规则取上一根或 lookback 根之前的值。
+"""
+
+import logging
+import math
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlmodel import Session
+
+from .bars import BarSeries, load_bars
+from .indicators import indicator_label, parse_indicator_specs
+from .models import TradingViewIndicatorState
+
+logger = logging.getLogger(__name__)
+
+NAN = float("nan")
+
+
+def _dump(value: float) -> Optional[float]:
+    # JSONB 不接受 NaN
+    return None if value != value else value
+
+
+def _load(value: Optional[float]) -> float:
+    return NAN if value is None else value
+
+
+class OnlineEMA:
+    """以前 period 个值的均值为初值的指数平滑，跳过 NaN 输入"""
+
+    def __init__(self, period: int, alpha: Optional[float] = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if x != x:
+            return self.value
+        self.count += 1
+        if self.count < self.period:
+            self.seed_sum += x
+        elif self.count == self.period:
+            self.value = (self.seed_sum + x) / self.period
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    def snapshot(self) -> List:
+        return [self.count, self.seed_sum, _dump(self.value)]
+
+    def restore(self, snapshot: Sequence) -> None:
+        self.count, self.seed_sum, value = snapshot
+        self.value = _load(value)
+
+
+class RingWindow:
+    """定长滑动窗口：环形缓冲区 + 窗口和 / 平方和（以首个值为基准平移，减轻精度损失）"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer = np.zeros(size)
+        self.pos = 0
+        self.count = 0
+        self.shift: Optional[float] = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.size
+
+    def push(self, x: float) -> None:
+        if self.shift is None:
+            self.shift = x
+        x -= self.shift
+        old = self.buffer[self.pos] if self.full else 0.0
+        self.buffer[self.pos] = x
+        self.total += x - old
+        self.total_sq += x * x - old * old
+        self.pos = (self.pos + 1) % self.size
+        self.count += 1
+        if self.pos == 0:
+            # 每写满一圈精确重算一次，摊还 O(1)
+            self.total = float(self.buffer.sum())
+            self.total_sq = float(np.dot(self.buffer, self.buffer))
+
+    def mean_and_variance(self) -> Tuple[float, float]:
+        mean = self.total / self.size
+        variance = max(self.total_sq / self.size - mean * mean, 0.0)
+        return mean + self.shift, variance
+
+    def snapshot(self) -> List:
+        return [
+            self.pos,
+            self.count,
+            self.shift,
+            self.total,
+            self.total_sq,
+            float(self.buffer[self.pos]),
+        ]
+
+    def restore(self, snapshot: Sequence) -> None:
+        self.pos, self.count, self.shift, self.total, self.total_sq, slot = snapshot
+        self.buffer[self.pos] = slot
+
+
+class OnlineSMA:
+    def __init__(self, period: int):
+        self.window = RingWindow(period)
+
+    def update(self, x: float) -> Dict[str, float]:
+        self.window.push(x)
+        return {
+            "value": self.window.mean_and_variance()[0] if self.window.full else NAN
+        }
+
+
+class OnlineBollinger:
+    def __init__(self, period: int, k: float):
+        self.window = RingWindow(period)
+        self.k = k
+
+    def update(self, x: float) -> Dict[str, float]:
+        self.window.push(x)
+        if not self.window.full:
+            return {"middle": NAN, "upper": NAN, "lower": NAN}
+        mean, variance = self.window.mean_and_variance()
+        band = self.k * math.sqrt(variance)
+        return {"middle": mean, "upper": mean + band, "lower": mean - band}
+
+
+class OnlineRSI:
+    def __init__(self, period: int):
+        self.prev_close = NAN
+        self.gain = OnlineEMA(period, alpha=1.0 / period)
+        self.loss = OnlineEMA(period, alpha=1.0 / period)
+
+    def update(self, close: float) -> Dict[str, float]:
+        prev, self.prev_close = self.prev_close, close
+        if prev != prev:
+            return {"value": NAN}
+        delta = close - prev
+        avg_gain = self.gain.update(max(delta, 0.0))
+        avg_loss = self.loss.update(max(-delta, 0.0))
+        if avg_gain != avg_gain:
+            return {"value": NAN}
+        if avg_loss == 0:
+            return {"value": 100.0}
+        return {"value": 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)}
+
+    def snapshot(self) -> List:
+        return [_dump(self.prev_close), self.gain.snapshot(), self.loss.snapshot()]
+
+    def restore(self, snapshot: Sequence) -> None:
+        prev_close, gain, loss = snapshot
+        self.prev_close = _load(prev_close)
+        self.gain.restore(gain)
+        self.loss.restore(loss)
+
+
+class OnlineMACD:
+    def __init__(self, fast: int, slow: int, signal: int):
+        self.fast = OnlineEMA(fast)
+        self.slow = OnlineEMA(slow)
+        self.signal = OnlineEMA(signal)
+
+    def update(self, x: float) -> Dict[str, float]:
+        line = self.fast.update(x) - self.slow.update(x)
+        signal = self.signal.update(line)
+        return {"macd": line, "signal": signal, "hist": line - signal}
+
+    def snapshot(self) -> List:
+        return [self.fast.snapshot(), self.slow.snapshot(), self.signal.snapshot()]
+
+    def restore(self, snapshot: Sequence) -> None:
+        for ema, state in zip(
+            (self.fast, self.slow, self.signal), snapshot, strict=True
+        ):
+            ema.restore(state)
+
+
+class _OnlineEMAIndicator(OnlineEMA):
+    def update(self, x: float) -> Dict[str, float]:  # type: ignore[override]
+        return {"value": super().update(x)}
+
+
+# 各指标输出的字段
+OUTPUT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "sma": ("value",),
+    "ema": ("value",),
+    "rsi": ("value",),
+    "macd": ("macd", "signal", "hist"),
+    "bb": ("middle", "upper", "lower"),
+}
+
+
+def indicator_fields(spec: str) -> List[str]:
+    """在线指标输出的全部字段，形如 "rsi_14.value" """
+    return [
+        f"{indicator_label(name, params)}.{field}"
+        for name, params in parse_indicator_specs(spec)
+        for field in OUTPUT_FIELDS[name]
+    ]
+
+
+def build_online_indicator(name: str, params: Tuple[float, ...]):
+    if name == "sma":
+        return OnlineSMA(int(params[0]))
+    if name == "ema":
+        return _OnlineEMAIndicator(int(params[0]))
+    if name == "rsi":
+        return OnlineRSI(int(params[0]))
+    if name == "macd":
+        return OnlineMACD(*(int(p) for p in params))
+    if name == "bb":
+        return OnlineBollinger(int(params[0]), params[1])
+    raise ValueError(f"不支持的指标 {name}")
+
+
+class IndicatorSet:
+    """一组在线指标及最后一根K线，支持覆盖更新最后一根K线"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        self.indicators = {
+            indicator_label(name, params): build_online_indicator(name, params)
+            for name, params in parse_indicator_specs(spec)
+        }
+        self.last_ts: Optional[int] = None
+        self.values: Dict[str, Dict[str, float]] = {}
+        self._before_last: Optional[Dict[str, List]] = None
+        # 各K线的 (时间, 指标值)，按时间升序：本批之前的 history_size 根 + 本批的全部，持久化时只保留 history_size 根
+        self.history: List[Tuple[int, Dict[str, Dict[str, float]]]] = []
+        self.history_size = 2
+        # 本次写入中新增或覆盖的第一根K线（回放历史初始化时为 None）
+        self.applied_from: Optional[int] = None
+        self.version = 0
+        self.loaded_at = time.monotonic()
+
+    def _snapshot(self) -> Dict[str, List]:
+        return {
+            label: (
+                indicator.window.snapshot()
+                if hasattr(indicator, "window")
+                else indicator.snapshot()
+            )
+            for label, indicator in self.indicators.items()
+        }
+
+    def _restore(self, snapshot: Dict[str, List]) -> None:
+        for label, state in snapshot.items():
+            indicator = self.indicators[label]
+            (indicator.window if hasattr(indicator, "window") else indicator).restore(
+                state
+            )
+
+    def update(self, ts: int, close: float) -> bool:
+        """推入一根K线，早于最后一根的K线被忽略（返回 False）"""
+        if self.last_ts is not None and ts < self.last_ts:
+            return False
+        if ts == self.last_ts and self._before_last is not None:
+            self._restore(self._before_last)
+        else:
+            self._before_last = self._snapshot()
+        self.last_ts = ts
+        self.values = {
+            label: indicator.update(close)
+            for label, indicator in self.indicators.items()
+        }
+        if self.history and self.history[-1][0] == ts:
+            self.history.pop()
+        self.history.append((ts, self.values))
+        return True
+
+    def apply(self, bars: BarSeries) -> int:
+        """按时间顺序推入一批K线，返回实际应用的根数"""
+        del self.history[: -self.history_size]
+        return sum(
+            self.update(ts, close)
+            for ts, close in zip(bars.t.tolist(), bars.close.tolist(), strict=True)
+        )
+
+    @staticmethod
+    def _dump_values(
+        values: Dict[str, Dict[str, float]],
+    ) -> Dict[str, Dict[str, Optional[float]]]:
+        return {
+            label: {field: _dump(value) for field, value in outputs.items()}
+            for label, outputs in values.items()
+        }
+
+    @staticmethod
+    def _load_values(
+        values: Dict[str, Dict[str, Optional[float]]],
+    ) -> Dict[str, Dict[str, float]]:
+        return {
+            label: {field: _load(value) for field, value in outputs.items()}
+            for label, outputs in values.items()
+        }
+
+    def latest(self) -> Dict[str, Any]:
+        return {"t": self.last_ts, "values": self._dump_values(self.values)}
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "spec": self.spec,
+            "last_ts": self.last_ts,
+            "before_last": self._before_last,
+            "current": self._snapshot(),
+            "buffers": {
+                label: indicator.window.buffer.tolist()
+                for label, indicator in self.indicators.items()
+                if hasattr(indicator, "window")
+            },
+            "values": self.latest()["values"],
+            "history": [
+                [ts, self._dump_values(values)]
+                for ts, values in self.history[-self.history_size :]
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], version: int) -> "IndicatorSet":
+        indicator_set = cls(state["spec"])
+        for label, buffer in state["buffers"].items():
+            indicator_set.indicators[label].window.buffer = np.asarray(
+                buffer, dtype=np.float64
+            )
+        indicator_set._restore(state["current"])
+        indicator_set.last_ts = state["last_ts"]
+        indicator_set._before_last = state["before_last"]
+        indicator_set.values = cls._load_values(state["values"])
+        indicator_set.history = [
+            (ts, cls._load_values(values)) for ts, values in state.get("history", [])
+        ]
+        indicator_set.history_size = max(2, len(indicator_set.history))
+        indicator_set.version = version
+        return indicator_set
+
+
+StreamKey = Tuple[uuid.UUID, str, str]
+
+
+class IndicatorStateStore:
+    """按 (项目, 品种, 周期) 缓存在线指标状态"""
+
+    def __init__(self, spec: str, bootstrap_bars: int = 5000, ttl_seconds: float = 1.0):
+        self.spec = spec
+        self.bootstrap_bars = bootstrap_bars
+        self.ttl_seconds = ttl_seconds
+        self._streams: Dict[StreamKey, IndicatorSet] = {}
+        self._lock = threading.Lock()
+
+    def _bootstrap(
+        self, session: Session, key: StreamKey, history_size: int
+    ) -> IndicatorSet:
+        """没有持久化状态时，用最近的历史K线回放初始化（只在冷启动时执行一次）"""
+        indicator_set = IndicatorSet(self.spec)
+        indicator_set.history_size = history_size
+        history = load_bars(session, key[0], key[1], key[2], limit=self.bootstrap_bars)
+        indicator_set.apply(history)
+        del indicator_set.history[:-history_size]
+        return indicator_set
+
+    def _load_row(self, session: Session, key: StreamKey, for_update: bool = False):
+        stmt = select(TradingViewIndicatorState).where(
+            TradingViewIndicatorState.tradingview_id == key[0],
+            TradingViewIndicatorState.symbol == key[1],
+            TradingViewIndicatorState.timeframe == key[2],
+        )
+        if for_update:
+            stmt = stmt.with_for_update()
+        return session.execute(stmt).scalar_one_or_none()
+
+    def apply(
+        self,
+        session: Session,
+        tradingview_id: uuid.UUID,
+        bars: BarSeries,
+        history_size: int = 2,
+    ) -> IndicatorSet:
+        """
+        在写入K线的同一事务中更新并持久化指标状态
+        状态行加锁，保证同一序列的并发写入按顺序应用（告警规则也在该锁内评估）；
+        history_size 为需要保留指标值的最近K线根数
+        """
+        history_size = max(2, history_size)
+        key = (tradingview_id, bars.symbol, bars.timeframe)
+        row = self._load_row(session, key, for_update=True)
+        cached = self._streams.get(key)
+        applied_from = None
+        if row is None:
+            # 新序列：本批K线已写入，回放历史即包含本批
+            indicator_set = self._bootstrap(session, key, history_size)
+            row = TradingViewIndicatorState(
+                tradingview_id=tradingview_id,
+                symbol=bars.symbol,
+                timeframe=bars.timeframe,
+                version=0,
+                state={},
+            )
+        else:
+            if (
+                cached is not None
+                and cached.version == row.version
+                and cached.spec == self.spec
+            ):
+                indicator_set = cached
+            elif row.state.get("spec") == self.spec:
+                indicator_set = IndicatorSet.from_state(row.state, row.version)
+            else:
+                indicator_set = self._bootstrap(session, key, history_size)
+            if (
+                indicator_set.last_ts is not None
+                and len(bars)
+                and bars.t[0] < indicator_set.last_ts
+            ):
+                # 回补了更早的历史，增量状态失效，重新回放
+                indicator_set = self._bootstrap(session, key, history_size)
+            else:
+                indicator_set.history_size = history_size
+                indicator_set.apply(bars)
+                applied_from = int(bars.t[0]) if len(bars) else None
+
+        row.version += 1
+        row.state = indicator_set.to_state()
+        session.add(row)
+        indicator_set.applied_from = applied_from
+        indicator_set.version = row.version
+        indicator_set.loaded_at = time.monotonic()
+        with self._lock:
+            self._streams[key] = indicator_set
+        return indicator_set
+
+    def latest(
+        self, session: Session, tradingview_id: uuid.UUID, symbol: str, timeframe: str
+    ) -> Optional[Dict[str, Any]]:
+        """读取最新指标值：内存中的状态在 TTL 内直接返回，否则从状态行刷新"""
+        key = (tradingview_id, symbol, timeframe)
+        cached = self._streams.get(key)
+        if (
+            cached is not None
+            and time.monotonic() - cached.loaded_at < self.ttl_seconds
+        ):
+            return cached.latest()
+        row = self._load_row(session, key)
+        if row is None:
+            return None
+        if cached is None or cached.version != row.version:
+            if row.state.get("spec") != self.spec:
+                return None
+            cached = IndicatorSet.from_state(row.state, row.version)
+        cached.loaded_at = time.monotonic()
+        with self._lock:
+            self._streams[key] = cached
+        return cached.latest()
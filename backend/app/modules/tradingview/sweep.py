@@ -0,0 +1,255 @@
+"""
+回测参数扫描
+
+- 参数网格展开为组合，不合法的组合（如 fast >= slow）跳过并计数
+- K线只写一次到内存映射文件（优先放在 /dev/shm），子进程用 np.load(mmap_mode="r") 直接映射，
+  不再为每个任务 pickle 整段K线；同一进程内对同一份文件只映射一次
+- 组合按块分发到进程池，每块完成后立即产出结果，由接口以 NDJSON 流式返回；
+  某块失败（如子进程崩溃）时该块的每个组合产出一条 error，最后总会产出汇总
+- 默认进程数为 CPU 核数 / WEB_CONCURRENCY：每个 uvicorn worker 各有一个进程池，合计不超过核数
+"""
+
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .backtest import STRATEGIES, backtest_strategy, validate_strategy
+from .bars import COLUMNS, BarSeries
+
+logger = logging.getLogger(__name__)
+
+
+def expand_grid(
+    kind: str, base: Dict[str, Any], grid: Dict[str, List[Any]], max_combinations: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    以 base 为基础展开参数网格，返回 (合法组合, 跳过的组合数)
+    网格为空、参数不存在或组合数超过上限时抛出 ValueError
+    """
+    if kind not in STRATEGIES:
+        raise ValueError(f"不支持的策略 {kind}")
+    unknown = set(grid) - set(STRATEGIES[kind][1])
+    if unknown:
+        raise ValueError(f"策略 {kind} 不支持参数: {', '.join(sorted(unknown))}")
+    if not grid or any(
+        not isinstance(values, list) or not values for values in grid.values()
+    ):
+        raise ValueError("参数网格中每个参数都需要至少一个取值")
+    names = sorted(grid)
+    total = math.prod(len(grid[name]) for name in names)
+    if total > max_combinations:
+        raise ValueError(f"参数组合数 {total} 超过上限 {max_combinations}")
+
+    combinations, skipped = [], 0
+    for values in itertools.product(*(grid[name] for name in names)):
+        try:
+            combinations.append(
+                validate_strategy(
+                    kind, {**base, **dict(zip(names, values, strict=True))}
+                )
+            )
+        except ValueError:
+            skipped += 1
+    return combinations, skipped
+
+
+# ===== K线共享 =====
+@dataclass(frozen=True)
+class SharedBars:
+    """内存映射K线文件的句柄，可廉价地传给子进程"""
+
+    path: str
+    symbol: str
+    timeframe: str
+
+    @classmethod
+    def create(cls, bars: BarSeries) -> "SharedBars":
+        directory = tempfile.mkdtemp(
+            prefix="tv-sweep-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+        )
+        np.save(os.path.join(directory, "t.npy"), bars.t)
+        np.save(
+            os.path.join(directory, "ohlcv.npy"),
+            np.stack([getattr(bars, col) for col in COLUMNS]),
+        )
+        return cls(directory, bars.symbol, bars.timeframe)
+
+    def remove(self) -> None:
+        # 已映射的子进程在关闭映射前仍可读取（文件删除后映射依然有效）
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+# 子进程内已映射的K线，只保留最近几份
+_attached: "OrderedDict[str, BarSeries]" = OrderedDict()
+_ATTACHED_MAX = 4
+
+
+def attach(shared: SharedBars) -> BarSeries:
+    bars = _attached.get(shared.path)
+    if bars is None:
+        t = np.load(os.path.join(shared.path, "t.npy"), mmap_mode="r")
+        ohlcv = np.load(os.path.join(shared.path, "ohlcv.npy"), mmap_mode="r")
+        bars = BarSeries(shared.symbol, shared.timeframe, t, *ohlcv)
+        _attached[shared.path] = bars
+        while len(_attached) > _ATTACHED_MAX:
+            _attached.popitem(last=False)
+    else:
+        _attached.move_to_end(shared.path)
+    return bars
+
+
+def run_chunk(
+    shared: SharedBars,
+    kind: str,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    fee_bps: float,
+) -> List[Dict[str, Any]]:
+    """子进程：在共享K线上依次回测一块参数组合"""
+    bars = attach(shared)
+    results = []
+    for index, params in chunk:
+        try:
+            metrics = backtest_strategy(bars, kind, params, fee_bps).metrics
+            results.append({"index": index, "params": params, "metrics": metrics})
+        except ValueError as e:
+            results.append({"index": index, "params": params, "error": str(e)})
+    return results
+
+
+def default_workers() -> int:
+    """CPU 核数按 uvicorn worker 数（WEB_CONCURRENCY）平分，至少 1"""
+    web_workers = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+class SweepRunner:
+    """参数扫描进程池，首次使用时以 spawn 方式创建并常驻复用"""
+
+    def __init__(self, max_workers: Optional[int] = None, chunks_per_worker: int = 4):
+        self.max_workers = max_workers or default_workers()
+        self.chunks_per_worker = chunks_per_worker
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def run(
+        self,
+        bars: BarSeries,
+        kind: str,
+        combinations: List[Dict[str, Any]],
+        fee_bps: float = 0.0,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        逐个产出每个组合的结果（按完成顺序），生成器提前关闭时取消未开始的任务
+        每块约为 组合数 / (进程数 × chunks_per_worker)，兼顾负载均衡与调度开销
+        """
+        shared = SharedBars.create(bars)
+        indexed = list(enumerate(combinations))
+        size = max(
+            1, math.ceil(len(indexed) / (self.max_workers * self.chunks_per_worker))
+        )
+        pool = self._pool()
+        chunks: Dict[Future, List[Tuple[int, Dict[str, Any]]]] = {}
+        for i in range(0, len(indexed), size):
+            chunk = indexed[i : i + size]
+            chunks[pool.submit(run_chunk, shared, kind, chunk, fee_bps)] = chunk
+        pending = set(chunks)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._chunk_results(future, chunks[future])
+        finally:
+            for future in pending:
+                future.cancel()
+            shared.remove()
+
+    def _chunk_results(
+        self, future: Future, chunk: List[Tuple[int, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """一块的结果；子进程异常或崩溃时该块每个组合记为失败"""
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"参数扫描任务失败（{len(chunk)} 个组合）: {e!r}")
+            if isinstance(e, BrokenProcessPool):
+                # 进程池已不可用，下次扫描重新创建
+                self.shutdown()
+            return [
+                {"index": index, "params": params, "error": f"执行失败: {e!r}"}
+                for index, params in chunk
+            ]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _rank_value(result: Dict[str, Any], rank_by: str, missing: float) -> float:
+    value = result["metrics"][rank_by]
+    return missing if value is None else value
+
+
+def summarize(
+    results: List[Dict[str, Any]], rank_by: str, top: int
+) -> List[Dict[str, Any]]:
+    """按指标从高到低取前 top 个结果（max_drawdown 越低越好），指标为 null 的排在最后"""
+    ok = [r for r in results if "metrics" in r]
+    if rank_by == "max_drawdown":
+        return sorted(ok, key=lambda r: _rank_value(r, rank_by, math.inf))[:top]
+    return sorted(ok, key=lambda r: _rank_value(r, rank_by, -math.inf), reverse=True)[
+        :top
+    ]
+
+
+def stream_sweep(
+    runner: SweepRunner,
+    bars: BarSeries,
+    kind: str,
+    combinations: List[Dict[str, Any]],
+    skipped: int,
+    fee_bps: float,
+    rank_by: str,
+    top: int,
+) -> Iterator[Dict[str, Any]]:
+    """扫描结果流：每个组合一条，最后一条为汇总（扫描中途出错时汇总带 error）"""
+    started = time.perf_counter()
+    results = []
+    error = None
+    try:
+        for result in runner.run(bars, kind, combinations, fee_bps):
+            results.append(result)
+            yield result
+    except Exception as e:
+        logger.exception("参数扫描中断")
+        error = str(e)
+    summary = {
+        "done": True,
+        "total": len(combinations),
+        "failed": sum("error" in r for r in results),
+        "skipped": skipped,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "best": summarize(results, rank_by, top),
+    }
+    if error is not None:
+        summary["error"] = error
+    yield summary
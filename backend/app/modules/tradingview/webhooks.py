@@ -0,0 +1,243 @@
+"""
+TradingView 告警 webhook 接收
+
+- 按项目的 webhook 密钥鉴权，密钥缓存在有上限的 LRU 中，热路径不访问数据库；
+  不存在的项目只短暂缓存，随机 UUID 探测不会让内存无限增长
+- 告警入队后立即返回 202，由后台写入线程攒批后批量插入 tradingview_alert
+- 队列满时返回 503，由 TradingView 侧重试，避免无限占用内存
+"""
+
+import atexit
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from .models import TradingView, TradingViewAlert
+
+logger = logging.getLogger(__name__)
+
+
+def parse_alert_payload(body: bytes) -> Dict[str, Any]:
+    """TradingView 可发送 JSON 或纯文本消息，统一转为 JSON 对象"""
+    text = body.decode("utf-8", errors="replace")
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return {"message": text}
+    return payload if isinstance(payload, dict) else {"value": payload}
+
+
+def secret_matches(expected: Optional[str], provided: Optional[str]) -> bool:
+    if not expected or not provided:
+        return False
+    return hmac.compare_digest(expected.encode(), provided.encode())
+
+
+class WebhookSecretCache:
+    """
+    项目 webhook 密钥的 LRU 缓存，最多 max_entries 项
+    不存在的项目只缓存 negative_ttl_seconds，挡住短时间内的重复探测
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        ttl_seconds: float = 60.0,
+        negative_ttl_seconds: float = 5.0,
+        max_entries: int = 10_000,
+    ):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        # 项目 -> (密钥, 所有者, 过期时间)，按最近使用排序
+        self._entries: "OrderedDict[uuid.UUID, Tuple[Optional[str], Optional[uuid.UUID], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(
+        self, tradingview_id: uuid.UUID
+    ) -> Optional[Tuple[Optional[str], Optional[uuid.UUID], float]]:
+        with self._lock:
+            entry = self._entries.get(tradingview_id)
+            if entry is not None:
+                self._entries.move_to_end(tradingview_id)
+            return entry
+
+    def get_cached(self, tradingview_id: uuid.UUID) -> Tuple[bool, Optional[str]]:
+        """返回 (是否命中, 密钥)"""
+        entry = self._get(tradingview_id)
+        if entry is None or entry[2] < time.monotonic():
+            return False, None
+        return True, entry[0]
+
+    def owner_of(self, tradingview_id: uuid.UUID) -> Optional[uuid.UUID]:
+        """鉴权时一并缓存的项目所有者（用于推送实时事件），未缓存时返回 None"""
+        entry = self._get(tradingview_id)
+        return entry[1] if entry is not None else None
+
+    def load(self, tradingview_id: uuid.UUID) -> Optional[str]:
+        """查库并写入缓存（软删除的项目视为不存在）"""
+        with Session(self.engine) as session:
+            row = session.execute(
+                select(TradingView.webhook_secret, TradingView.owner_id).where(
+                    TradingView.id == tradingview_id
+                )
+            ).first()
+        secret, owner_id = row if row is not None else (None, None)
+        ttl = self.ttl_seconds if row is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[tradingview_id] = (secret, owner_id, time.monotonic() + ttl)
+            self._entries.move_to_end(tradingview_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return secret
+
+    def invalidate(self, tradingview_id: uuid.UUID) -> None:
+        """本 worker 立即失效，其他 worker 在 TTL 到期后生效"""
+        with self._lock:
+            self._entries.pop(tradingview_id, None)
+
+
+class AlertWriter:
+    """
+    后台批量写入线程
+    请求线程只做入队；写入线程攒够 batch_size 条或等待 flush_interval 后一次性插入，
+    每批一个事务。违反约束（如入队后项目已被删除）时改为逐条插入，只丢弃出错的行；
+    其他写入失败会重试，仍失败则丢弃该批并记录日志。
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        batch_size: int = 500,
+        flush_interval_ms: float = 100,
+        queue_size: int = 100_000,
+        retries: int = 3,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.retries = retries
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def submit(
+        self,
+        tradingview_id: uuid.UUID,
+        payload: Dict[str, Any],
+        received_at: Optional[datetime] = None,
+    ) -> bool:
+        """入队一条告警，队列已满时返回 False"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(
+                {
+                    "tradingview_id": tradingview_id,
+                    "received_at": received_at or datetime.now(timezone.utc),
+                    "payload": payload,
+                }
+            )
+        except queue.Full:
+            return False
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="tradingview-alert-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(
+                    self._queue.get(timeout=remaining)
+                    if remaining > 0
+                    else self._queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write_rows(self, batch: List[Dict[str, Any]]) -> None:
+        """逐条插入，跳过违反约束的行"""
+        failed = 0
+        for row in batch:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(TradingViewAlert.__table__), [row])
+            except IntegrityError:
+                failed += 1
+        self.written += len(batch) - failed
+        if failed:
+            self.dropped += failed
+            logger.warning(f"{failed} 条告警违反约束（项目可能已被删除），已丢弃")
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(TradingViewAlert.__table__), batch)
+                self.written += len(batch)
+                break
+            except IntegrityError:
+                self._write_rows(batch)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self.dropped += len(batch)
+                    logger.error(f"告警批量写入失败，丢弃 {len(batch)} 条: {e}")
+                    break
+                time.sleep(0.1 * (2**attempt))
+        for _ in batch:
+            self._queue.task_done()
+
+    def flush(self) -> None:
+        """阻塞直到已入队的告警全部写入（或被丢弃）"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        """写完队列中剩余的告警后停止"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
@@ -0,0 +1,142 @@
+"""
+序列接口的列式二进制格式
+
+请求头 Accept: application/vnd.tradingview.series 时返回二进制，否则返回 JSON。
+Accept 参数 delta=1（如 "application/vnd.tradingview.series; delta=1"）时对整数列做差分编码。
+
+布局（小端序）：
+    0       4 字节   魔数 b"TVS1"
+    4       4 字节   uint32，头部 JSON 长度 H（含补齐到 8 字节的空格）
+    8       H 字节   头部 JSON（UTF-8）
+    8 + H   各列数据依次排列，每列起始位置按 8 字节对齐
+
+头部 JSON：
+    {"rows": n, "meta": {...}, "columns": [{"name": "t", "dtype": "int64", "encoding": "plain"}, ...]}
+    dtype 为 int64 / int32 / float64；encoding 为 plain 或 delta。
+    delta 列：value[0] = base + d[0]，value[i] = value[i-1] + d[i]（base 在列描述中给出），
+    差值可放进 int32 时以 int32 传输（时间戳列体积减半）。
+    float64 列中的 NaN 表示缺失值（如指标预热期）。
+
+前端可直接用 Float64Array / BigInt64Array / Int32Array 在响应 ArrayBuffer 上建视图，无需解析；
+服务端按列从 NumPy 缓冲区拼接输出，不逐元素转换。
+"""
+
+import json
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi.responses import Response
+
+from .bars import BarSeries
+
+MEDIA_TYPE = "application/vnd.tradingview.series"
+MAGIC = b"TVS1"
+
+_DTYPES = {"int64": "<i8", "int32": "<i4", "float64": "<f8"}
+_INT32 = np.iinfo(np.int32)
+
+
+def negotiate(accept: Optional[str]) -> Optional[bool]:
+    """
+    解析 Accept 头：客户端接受二进制格式时返回是否启用差分编码，否则返回 None（使用 JSON）
+    q=0 视为不接受
+    """
+    for part in (accept or "").split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        if media_type.lower() != MEDIA_TYPE:
+            continue
+        options = dict(p.split("=", 1) for p in params if "=" in p)
+        if options.get("q", "1").strip() in ("0", "0.0", "0.00", "0.000"):
+            return None
+        return options.get("delta", "0").strip().lower() in ("1", "true")
+    return None
+
+
+def _encode_column(
+    name: str, values: np.ndarray, delta: bool
+) -> Tuple[Dict, np.ndarray]:
+    if values.dtype.kind == "f":
+        return {"name": name, "dtype": "float64", "encoding": "plain"}, values.astype(
+            "<f8", copy=False
+        )
+    values = values.astype("<i8", copy=False)
+    if not delta or not len(values):
+        return {"name": name, "dtype": "int64", "encoding": "plain"}, values
+    base = int(values[0])
+    diffs = np.diff(values, prepend=base)
+    column = {"name": name, "encoding": "delta", "base": base}
+    if diffs.min() >= _INT32.min and diffs.max() <= _INT32.max:
+        return {**column, "dtype": "int32"}, diffs.astype("<i4")
+    return {**column, "dtype": "int64"}, diffs
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+def encode_series(
+    meta: Dict, columns: Dict[str, np.ndarray], delta: bool = False
+) -> bytes:
+    """把若干等长列编码为二进制；除差分列外直接引用 NumPy 缓冲区，只在最终拼接时复制一次"""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    descriptors: List[Dict] = []
+    chunks: List = []
+    for name, values in columns.items():
+        if len(values) != rows:
+            raise ValueError(f"列 {name} 长度与其他列不一致")
+        descriptor, encoded = _encode_column(name, np.asarray(values), delta)
+        descriptors.append(descriptor)
+        buffer = memoryview(np.ascontiguousarray(encoded)).cast("B")
+        chunks.append(buffer)
+        chunks.append(_pad(buffer.nbytes))
+
+    header = json.dumps(
+        {"rows": rows, "meta": meta, "columns": descriptors},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+    header += b" " * (-len(header) % 8)
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header, *chunks])
+
+
+def decode_series(body: bytes) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """解码二进制序列，返回 (meta, 列)；plain 列是 body 上的只读视图，delta 列还原为 int64"""
+    if body[:4] != MAGIC:
+        raise ValueError("不是序列二进制格式")
+    (header_size,) = struct.unpack_from("<I", body, 4)
+    header = json.loads(body[8 : 8 + header_size])
+    rows = header["rows"]
+    offset = 8 + header_size
+    columns: Dict[str, np.ndarray] = {}
+    for descriptor in header["columns"]:
+        dtype = np.dtype(_DTYPES[descriptor["dtype"]])
+        values = np.frombuffer(body, dtype=dtype, count=rows, offset=offset)
+        offset += rows * dtype.itemsize
+        offset += -offset % 8
+        if descriptor["encoding"] == "delta":
+            values = descriptor["base"] + np.cumsum(values, dtype=np.int64)
+        columns[descriptor["name"]] = values
+    return header["meta"], columns
+
+
+def bars_columns(bars: BarSeries) -> Dict[str, np.ndarray]:
+    """K线的列名与 JSON 格式一致"""
+    return {
+        "t": bars.t,
+        "o": bars.open,
+        "h": bars.high,
+        "l": bars.low,
+        "c": bars.close,
+        "v": bars.volume,
+    }
+
+
+def binary_response(
+    meta: Dict, columns: Dict[str, np.ndarray], delta: bool
+) -> Response:
+    return Response(
+        encode_series(meta, columns, delta),
+        media_type=MEDIA_TYPE,
+        headers={"Vary": "Accept"},
+    )
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+API 压测脚本
+
+按固定并发依次压测登录、列表、搜索、统计以及 CRUD 接口，输出每个场景的
+p50/p95/p99 延迟与 RPS，并可与基线文件对比检测性能回退。
+
+使用方法:
+    python -m benchmarks.http_load                       # 进程内（ASGI transport）压测
+    python -m benchmarks.http_load --url http://localhost:8000   # 压测运行中的服务
+    python -m benchmarks.http_load --users 50 --items 200 --tradingviews 200
+    python -m benchmarks.http_load --save-baseline       # 将本次结果写为基线
+    python -m benchmarks.http_load --tolerance 0.2       # 与基线对比，超出 20% 视为回退
+
+数据集直接写入 settings 指向的数据库（bench-user-N@example.com），重复运行时复用；
+--reseed 会先删除已有的压测用户（级联删除其数据）。
+
+基线：默认读写 benchmarks/baseline.json（可用 HTTP_LOAD_BASELINE 环境变量或 --baseline 指定）。
+延迟与 RPS 取决于机器与数据库配置，基线不入库，由固定的压测环境（与 CI 使用同一台压测机）
+首次运行时以 --save-baseline 生成并保存在该环境中；没有基线时只输出结果、不做对比。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import delete, func, insert, select
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+from app.core.security import get_password_hash
+from app.models import Item, TradingView, User
+
+BASELINE_FILE = Path(
+    os.environ.get(
+        "HTTP_LOAD_BASELINE", Path(__file__).resolve().parent / "baseline.json"
+    )
+)
+BENCH_EMAIL = "bench-user-{}@example.com"
+BENCH_PASSWORD = "bench-password"
+API = settings.API_V1_STR
+
+logger = logging.getLogger(__name__)
+
+
+# ===== 数据集 =====
+def seed_dataset(
+    users: int, items: int, tradingviews: int, reseed: bool = False
+) -> None:
+    """为每个压测用户批量写入 items / tradingviews 条记录，已存在时跳过"""
+    pattern = BENCH_EMAIL.format("%")
+    with Session(engine) as session:
+        if reseed:
+            session.execute(delete(User).where(User.email.like(pattern)))
+            session.commit()
+        existing = session.execute(
+            select(func.count()).select_from(User).where(User.email.like(pattern))
+        ).scalar_one()
+        if existing >= users:
+            logger.info(f"复用已有数据集: {existing} 个压测用户")
+            return
+
+        hashed_password = get_password_hash(BENCH_PASSWORD)
+        user_rows = [
+            {
+                "id": uuid.uuid4(),
+                "email": BENCH_EMAIL.format(i),
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "is_superuser": False,
+                "full_name": f"Bench {i}",
+            }
+            for i in range(existing, users)
+        ]
+        session.execute(insert(User), user_rows)
+        for user in user_rows:
+            if items:
+                session.execute(
+                    insert(Item),
+                    [
+                        {
+                            "id": uuid.uuid4(),
+                            "title": f"bench item {n}",
+                            "description": "seeded",
+                            "owner_id": user["id"],
+                        }
+                        for n in range(items)
+                    ],
+                )
+            if tradingviews:
+                session.execute(
+                    insert(TradingView),
+                    [
+                        {
+                            "id": uuid.uuid4(),
+                            "name": f"bench strategy {n}",
+                            "description": "seeded strategy",
+                            "owner_id": user["id"],
+                        }
+                        for n in range(tradingviews)
+                    ],
+                )
+        session.commit()
+        logger.info(
+            f"已写入 {len(user_rows)} 个用户，每人 {items} 个 item、{tradingviews} 个 tradingview"
+        )
+
+
+# ===== 统计 =====
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩百分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+    @classmethod
+    def from_latencies(
+        cls, name: str, latencies: List[float], errors: int, wall_seconds: float
+    ) -> "ScenarioResult":
+        values = sorted(latencies)
+        return cls(
+            name=name,
+            requests=len(values),
+            errors=errors,
+            rps=round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+            p50_ms=round(percentile(values, 50) * 1000, 2),
+            p95_ms=round(percentile(values, 95) * 1000, 2),
+            p99_ms=round(percentile(values, 99) * 1000, 2),
+        )
+
+
+def find_regressions(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """p95 变慢或 RPS 下降超过 tolerance 的场景"""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms"
+            )
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: RPS {base['rps']} -> {current['rps']}")
+    return regressions
+
+
+# ===== 压测场景 =====
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+@dataclass
+class BenchContext:
+    headers: Dict[str, str] = field(default_factory=dict)
+    tradingview_ids: List[str] = field(default_factory=list)
+    created_ids: List[str] = field(default_factory=list)
+
+
+def build_scenarios(ctx: BenchContext) -> List[tuple]:
+    login_data = {"username": BENCH_EMAIL.format(0), "password": BENCH_PASSWORD}
+
+    def pick(n: int) -> str:
+        return ctx.tradingview_ids[n % len(ctx.tradingview_ids)]
+
+    async def create(client: httpx.AsyncClient, n: int) -> httpx.Response:
+        response = await client.post(
+            f"{API}/tradingview/",
+            headers=ctx.headers,
+            json={"name": f"bench created {n}", "description": "load test"},
+        )
+        if response.status_code == 200:
+            ctx.created_ids.append(response.json()["id"])
+        return response
+
+    async def remove(client: httpx.AsyncClient, n: int) -> httpx.Response:
+        return await client.delete(
+            f"{API}/tradingview/{ctx.created_ids[n]}", headers=ctx.headers
+        )
+
+    # (场景名, 请求函数, 请求数上限；None 表示使用 --requests)
+    return [
+        (
+            "login",
+            lambda c, n: c.post(f"{API}/login/access-token", data=login_data),
+            None,
+        ),
+        ("list_items", lambda c, n: c.get(f"{API}/items/", headers=ctx.headers), None),
+        (
+            "list_tradingviews",
+            lambda c, n: c.get(f"{API}/tradingview/", headers=ctx.headers),
+            None,
+        ),
+        (
+            "search_tradingviews",
+            lambda c, n: c.get(
+                f"{API}/tradingview/search",
+                params={"q": "strategy 1"},
+                headers=ctx.headers,
+            ),
+            None,
+        ),
+        (
+            "tradingview_stats",
+            lambda c, n: c.get(f"{API}/tradingview/stats", headers=ctx.headers),
+            None,
+        ),
+        (
+            "read_tradingview",
+            lambda c, n: c.get(f"{API}/tradingview/{pick(n)}", headers=ctx.headers),
+            None,
+        ),
+        (
+            "update_tradingview",
+            lambda c, n: c.put(
+                f"{API}/tradingview/{pick(n)}",
+                headers=ctx.headers,
+                json={"description": f"updated {n}"},
+            ),
+            None,
+        ),
+        ("create_tradingview", create, None),
+        # 只删除本次创建的记录
+        ("delete_tradingview", remove, lambda: len(ctx.created_ids)),
+    ]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    request: RequestFn,
+    total: int,
+    concurrency: int,
+) -> ScenarioResult:
+    """固定并发执行 total 个请求"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index, errors
+        while next_index < total:
+            n = next_index
+            next_index += 1
+            start = time.perf_counter()
+            try:
+                response = await request(client, n)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return ScenarioResult.from_latencies(
+        name, latencies, errors, time.perf_counter() - wall_start
+    )
+
+
+async def run_benchmarks(
+    url: Optional[str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    only: Optional[List[str]],
+) -> List[ScenarioResult]:
+    async with AsyncExitStack() as stack:
+        if url:
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(base_url=url, timeout=30)
+            )
+        else:
+            from app.main import app
+
+            # ASGITransport 不触发 lifespan，这里手动执行以注册模块路由
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),
+                    base_url="http://bench",
+                    timeout=30,
+                )
+            )
+
+        ctx = BenchContext()
+        response = await client.post(
+            f"{API}/login/access-token",
+            data={"username": BENCH_EMAIL.format(0), "password": BENCH_PASSWORD},
+        )
+        response.raise_for_status()
+        ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await client.get(
+            f"{API}/tradingview/", headers=ctx.headers, params={"limit": 100}
+        )
+        response.raise_for_status()
+        ctx.tradingview_ids = [row["id"] for row in response.json()["data"]]
+        if not ctx.tradingview_ids:
+            raise RuntimeError(
+                "压测用户没有 tradingview 数据，请使用 --tradingviews 生成数据集"
+            )
+
+        results = []
+        for name, request, limit in build_scenarios(ctx):
+            if only and name not in only:
+                continue
+            total = limit() if limit else requests
+            if warmup and not limit and name != "create_tradingview":
+                await run_scenario(client, name, request, warmup, concurrency)
+            result = await run_scenario(client, name, request, total, concurrency)
+            results.append(result)
+            logger.info(
+                f"  {name:<22} {result.requests:>6} 请求  {result.rps:>8.1f} RPS  "
+                f"p50 {result.p50_ms:>8.2f}ms  p95 {result.p95_ms:>8.2f}ms  "
+                f"p99 {result.p99_ms:>8.2f}ms  错误 {result.errors}"
+            )
+        return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="API 压测")
+    parser.add_argument(
+        "--url", help="压测运行中的服务，如 http://localhost:8000；默认进程内压测"
+    )
+    parser.add_argument("--users", type=int, default=10, help="压测用户数")
+    parser.add_argument("--items", type=int, default=100, help="每个用户的 item 数")
+    parser.add_argument(
+        "--tradingviews", type=int, default=100, help="每个用户的 tradingview 数"
+    )
+    parser.add_argument("--reseed", action="store_true", help="删除并重新生成数据集")
+    parser.add_argument(
+        "--no-seed", action="store_true", help="不访问数据库，使用已有数据集"
+    )
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发数")
+    parser.add_argument(
+        "--warmup", type=int, default=20, help="每个只读场景的预热请求数"
+    )
+    parser.add_argument("--scenario", action="append", help="只运行指定场景（可重复）")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="基线文件")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="将本次结果写入基线文件"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的回退比例")
+    parser.add_argument("--output", type=Path, help="将结果写入 JSON 文件")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if not args.no_seed:
+        seed_dataset(args.users, args.items, args.tradingviews, args.reseed)
+
+    logger.info(
+        f"\n压测 {'进程内 ASGI' if not args.url else args.url}，并发 {args.concurrency}"
+    )
+    results = asyncio.run(
+        run_benchmarks(
+            args.url,
+            args.requests,
+            args.concurrency,
+            args.warmup,
+            args.scenario,
+        )
+    )
+    summary = {result.name: asdict(result) for result in results}
+
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+        logger.info(f"\n基线已写入 {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        logger.info("\n没有基线文件，使用 --save-baseline 生成")
+        return 0
+
+    regressions = find_regressions(
+        summary, json.loads(args.baseline.read_text()), args.tolerance
+    )
+    if regressions:
+        logger.error(f"\n❌ 发现性能回退（容差 {args.tolerance:.0%}）:")
+        for line in regressions:
+            logger.error(f"  {line}")
+        return 1
+    logger.info(f"\n✅ 与基线相比无回退（容差 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+热点函数微基准
+
+覆盖每个请求都会经过的辅助函数：签发/解析 JWT、校验密码、渲染邮件模板、
+列表响应的序列化，100 万根K线上的技术指标计算、周期重采样、回测与响应编码，以及单根K线的增量指标更新。
+无需数据库和网络，可离线运行；结果可保存并与历史结果对比。
+
+使用方法:
+    python -m benchmarks.micro                      # 运行全部基准
+    python -m benchmarks.micro -k jwt               # 只运行名称包含 jwt 的基准
+    python -m benchmarks.micro --save               # 将结果写入 benchmarks/micro_results.json
+    python -m benchmarks.micro --tolerance 0.15     # 与已保存结果对比，中位数变慢超过 15% 视为回退
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RESULTS_FILE = Path(__file__).resolve().parent / "micro_results.json"
+
+logger = logging.getLogger(__name__)
+
+# 基准名 -> 准备函数；准备函数在计时之外执行，返回被计时的无参函数
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    """注册一个基准"""
+
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    rounds: int
+    iterations: int
+    min_us: float
+    median_us: float
+    mean_us: float
+    stddev_us: float
+
+    @property
+    def ops_per_second(self) -> float:
+        return 1_000_000 / self.median_us if self.median_us else 0.0
+
+
+def run_benchmark(
+    name: str, fn: Callable[[], object], min_time: float = 0.1, rounds: int = 5
+) -> BenchmarkResult:
+    """
+    先校准每轮迭代次数使单轮耗时不少于 min_time，再执行 rounds 轮，
+    统计单次调用耗时（与 pytest-benchmark 的做法一致）
+    """
+    fn()  # 预热
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1_000_000:
+            break
+        iterations *= 10 if elapsed < min_time / 10 else 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations * 1_000_000)
+
+    return BenchmarkResult(
+        name=name,
+        rounds=rounds,
+        iterations=iterations,
+        min_us=round(min(samples), 3),
+        median_us=round(statistics.median(samples), 3),
+        mean_us=round(statistics.mean(samples), 3),
+        stddev_us=round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+    )
+
+
+def find_regressions(
+    results: Dict[str, dict], saved: Dict[str, dict], tolerance: float
+) -> List[str]:
+    """中位数变慢超过 tolerance 的基准"""
+    return [
+        f"{name}: {saved[name]['median_us']}us -> {result['median_us']}us"
+        for name, result in results.items()
+        if name in saved
+        and result["median_us"] > saved[name]["median_us"] * (1 + tolerance)
+    ]
+
+
+# ===== 基准定义 =====
+@benchmark("security.create_access_token")
+def bench_create_access_token():
+    from app.core import security
+
+    subject = str(uuid.uuid4())
+    expires = timedelta(minutes=30)
+    return lambda: security.create_access_token(subject, expires)
+
+
+@benchmark("deps.jwt_decode")
+def bench_jwt_decode():
+    """get_current_user 中查库之前的部分：解码 JWT 并校验载荷"""
+    import jwt
+
+    from app.core import security
+    from app.core.config import settings
+    from app.models import TokenPayload
+
+    token = security.create_access_token(str(uuid.uuid4()), timedelta(minutes=30))
+
+    def decode():
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+        return TokenPayload(**payload)
+
+    return decode
+
+
+@benchmark("security.verify_password")
+def bench_verify_password():
+    from app.core import security
+
+    hashed = security.get_password_hash("benchmark-password")
+    return lambda: security.verify_password("benchmark-password", hashed)
+
+
+@benchmark("utils.render_email_template")
+def bench_render_email_template():
+    from app.utils import render_email_template
+
+    context = {
+        "project_name": "Benchmark",
+        "username": "bench@example.com",
+        "email": "bench@example.com",
+        "valid_hours": 48,
+        "link": "http://localhost/reset-password?token=abc",
+    }
+    return lambda: render_email_template(
+        template_name="reset_password.html", context=context
+    )
+
+
+def _serialize(list_model, rows):
+    # 与 FastAPI 处理 response_model 的方式一致：先校验再输出 JSON
+    return lambda: list_model(data=rows, count=len(rows)).model_dump_json()
+
+
+@benchmark("ItemsPublic.serialize_100")
+def bench_items_public():
+    from app.models import Item, ItemsPublic
+
+    owner_id = uuid.uuid4()
+    rows = [
+        Item(
+            id=uuid.uuid4(),
+            title=f"item {i}",
+            description="benchmark item",
+            owner_id=owner_id,
+        )
+        for i in range(100)
+    ]
+    return _serialize(ItemsPublic, rows)
+
+
+@benchmark("TradingViewsPublic.serialize_100")
+def bench_tradingviews_public():
+    from app.models import TradingView, TradingViewsPublic
+
+    owner_id = uuid.uuid4()
+    rows = [
+        TradingView(
+            id=uuid.uuid4(),
+            name=f"strategy {i}",
+            description="benchmark strategy",
+            owner_id=owner_id,
+        )
+        for i in range(100)
+    ]
+    return _serialize(TradingViewsPublic, rows)
+
+
+# ===== 指标（100 万根K线） =====
+INDICATOR_BARS = 1_000_000
+
+
+def _random_close(n: Optional[int] = None):
+    """几何随机游走，价格始终为正（算术游走在 100 万步内会跌破 0）"""
+    import numpy as np
+
+    steps = np.random.default_rng(0).normal(scale=0.001, size=n or INDICATOR_BARS)
+    return 100 * np.exp(np.cumsum(steps))
+
+
+def _indicator_benchmark(name: str, compute):
+    @benchmark(f"indicators.{name}_1m_bars")
+    def setup():
+        close = _random_close()
+        return lambda: compute(close)
+
+    return setup
+
+
+def _register_indicator_benchmarks() -> None:
+    from app.modules.tradingview import indicators
+
+    _indicator_benchmark("sma20", lambda close: indicators.sma(close, 20))
+    _indicator_benchmark("ema20", lambda close: indicators.ema(close, 20))
+    _indicator_benchmark("rsi14", lambda close: indicators.rsi(close, 14))
+    _indicator_benchmark("macd", indicators.macd)
+    _indicator_benchmark("bollinger20", indicators.bollinger)
+
+
+_register_indicator_benchmarks()
+
+
+@benchmark("indicators.engine_all_1m_bars")
+def bench_indicator_engine():
+    """一次请求中计算全部五类指标（共享 EMA 中间结果）"""
+    import numpy as np
+
+    from app.modules.tradingview.bars import BarSeries
+    from app.modules.tradingview.indicators import (
+        IndicatorEngine,
+        parse_indicator_specs,
+    )
+
+    close = _random_close()
+    bars = BarSeries.from_columns(
+        "BENCH", "1m", np.arange(len(close)) * 60, close, close, close, close
+    )
+    specs = parse_indicator_specs("sma:20,ema:12,ema:26,rsi:14,macd:12:26:9,bb:20:2")
+    return lambda: IndicatorEngine(bars).compute(specs)
+
+
+def _million_bars():
+    import numpy as np
+
+    from app.modules.tradingview.bars import BarSeries
+
+    close = _random_close()
+    return BarSeries.from_columns(
+        "BENCH",
+        "1m",
+        np.arange(len(close)) * 60,
+        close,
+        close + 1,
+        close - 1,
+        close,
+        np.ones(len(close)),
+    )
+
+
+@benchmark("resample.1m_to_1h_1m_bars")
+def bench_resample():
+    """100 万根 1 分钟K线聚合为 1 小时K线"""
+    from app.modules.tradingview.resample import resample
+
+    bars = _million_bars()
+    return lambda: resample(bars, "1h")
+
+
+@benchmark("backtest.ma_cross_1m_bars")
+def bench_backtest():
+    """100 万根K线上的均线交叉回测（信号 + 仓位 + 收益 + 统计）"""
+    from app.modules.tradingview.backtest import backtest_strategy
+
+    bars = _million_bars()
+    return lambda: backtest_strategy(
+        bars, "ma_cross", {"fast": 12, "slow": 26, "allow_short": True}, 1.0
+    )
+
+
+@benchmark("wire.bars_json_1m_bars")
+def bench_bars_json():
+    """K线接口的 JSON 响应（与 JSONResponse 的渲染方式一致）"""
+    from fastapi.responses import JSONResponse
+
+    bars = _million_bars()
+    return lambda: JSONResponse(bars.to_dict())
+
+
+@benchmark("wire.bars_binary_1m_bars")
+def bench_bars_binary():
+    """K线接口的列式二进制响应"""
+    from app.modules.tradingview import wire
+
+    bars = _million_bars()
+    return lambda: wire.binary_response(
+        {"symbol": "BENCH"}, wire.bars_columns(bars), delta=True
+    )
+
+
+@benchmark("rules.evaluate_1000_rules")
+def bench_rule_evaluation():
+    """写入一根K线时评估同一品种周期下的 1000 条告警规则（不含读取窗口与更新冷却期的查询）"""
+    from datetime import datetime, timezone
+
+    import numpy as np
+
+    from app.modules.tradingview.bars import BarSeries
+    from app.modules.tradingview.models import TradingViewAlertRule
+    from app.modules.tradingview.rules import CompiledRule, RuleFrame, find_candidates
+
+    tradingview_id = uuid.uuid4()
+    kinds = [
+        ("threshold", "close", None),
+        ("cross", "close", "sma_20.value"),
+        ("percent_change", "close", None),
+    ]
+    rules = [
+        CompiledRule(
+            TradingViewAlertRule(
+                id=uuid.uuid4(),
+                tradingview_id=tradingview_id,
+                name=f"rule {i}",
+                symbol="BENCH",
+                timeframe="1m",
+                kind=kinds[i % 3][0],
+                source=kinds[i % 3][1],
+                target=kinds[i % 3][2],
+                op="above",
+                value=float(i % 50),
+                lookback=5,
+                created_at=datetime.now(timezone.utc),
+            )
+        )
+        for i in range(1000)
+    ]
+    # 当前K线 + lookback 根之前的窗口
+    t = np.arange(6) * 60
+    close = 100.0 + t // 60 % 7
+    window = BarSeries.from_columns("BENCH", "1m", t, close, close, close, close)
+    frame = RuleFrame(window, {int(ts): {"sma_20": {"value": 100.0}} for ts in t})
+    return lambda: find_candidates(rules, frame, [len(t) - 1])
+
+
+@benchmark("indicators.streaming_update")
+def bench_streaming_update():
+    """推入一根新K线时增量更新全部在线指标的单次耗时"""
+    from app.modules.tradingview.streaming import IndicatorSet
+
+    close = _random_close(10_000).tolist()
+    indicator_set = IndicatorSet("sma:20,ema:20,rsi:14,macd:12:26:9,bb:20:2")
+    state = {"t": 0}
+
+    def update():
+        state["t"] += 60
+        return indicator_set.update(state["t"], close[state["t"] // 60 % len(close)])
+
+    return update
+
+
+def run_all(
+    keyword: Optional[str] = None, min_time: float = 0.1, rounds: int = 5
+) -> List[BenchmarkResult]:
+    results = []
+    for name, setup in BENCHMARKS.items():
+        if keyword and keyword not in name:
+            continue
+        results.append(run_benchmark(name, setup(), min_time=min_time, rounds=rounds))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="热点函数微基准")
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该关键字的基准")
+    parser.add_argument(
+        "--min-time", type=float, default=0.1, help="单轮最短耗时（秒）"
+    )
+    parser.add_argument("--rounds", type=int, default=5, help="轮数")
+    parser.add_argument("--results", type=Path, default=RESULTS_FILE, help="结果文件")
+    parser.add_argument("--save", action="store_true", help="将本次结果写入结果文件")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的回退比例")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = run_all(args.keyword, args.min_time, args.rounds)
+    logger.info(
+        f"{'基准':<36} {'中位数(us)':>12} {'最小(us)':>12} {'标准差':>10} {'ops/s':>12}"
+    )
+    for result in results:
+        logger.info(
+            f"{result.name:<36} {result.median_us:>12.3f} {result.min_us:>12.3f} "
+            f"{result.stddev_us:>10.3f} {result.ops_per_second:>12.0f}"
+        )
+
+    summary = {result.name: asdict(result) for result in results}
+    saved = json.loads(args.results.read_text()) if args.results.exists() else {}
+    if args.save:
+        args.results.write_text(
+            json.dumps({**saved, **summary}, indent=2, ensure_ascii=False)
+        )
+        logger.info(f"\n结果已写入 {args.results}")
+        return 0
+
+    regressions = find_regressions(summary, saved, args.tolerance)
+    if regressions:
+        logger.error(f"\n❌ 发现性能回退（容差 {args.tolerance:.0%}）:")
+        for line in regressions:
+            logger.error(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
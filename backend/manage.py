@@ -11,10 +11,7 @@ import click
 # 添加项目路径
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.modules import registry
-from app.modules.core import CoreModule
-from app.modules.items import ItemsModule
-from app.modules.tradingview import TradingViewModule
+from app.modules import BUILTIN_MODULES, registry
 from app.modules.migration_manager import migration_manager
 
 logging.basicConfig(level=logging.INFO)
@@ -31,9 +28,8 @@ def cli():
 def list_modules():
     """列出所有模块"""
     # 临时注册模块以获取信息
-    registry.register_module("core", CoreModule())
-    registry.register_module("items", ItemsModule())
-    registry.register_module("tradingview", TradingViewModule())
+    for name in BUILTIN_MODULES:
+        registry.load_module(name)
     
     modules = registry.list_modules()
     
@@ -50,9 +46,8 @@ def list_modules():
 def enable_module(module_name):
     """启用模块"""
     # 注册所有模块
-    registry.register_module("core", CoreModule())
-    registry.register_module("items", ItemsModule())
-    registry.register_module("tradingview", TradingViewModule())
+    for name in BUILTIN_MODULES:
+        registry.load_module(name)
     
     if registry.enable_module(module_name):
         click.echo(f"✅ 模块 {module_name} 已启用")
@@ -65,9 +60,8 @@ def enable_module(module_name):
 def disable_module(module_name):
     """禁用模块"""
     # 注册所有模块
-    registry.register_module("core", CoreModule())
-    registry.register_module("items", ItemsModule())
-    registry.register_module("tradingview", TradingViewModule())
+    for name in BUILTIN_MODULES:
+        registry.load_module(name)
     
     if registry.disable_module(module_name):
         click.echo(f"✅ 模块 {module_name} 已禁用")
@@ -91,10 +85,39 @@ def migration_status():
         click.echo()
 
 
+def _echo_dry_run(module_name):
+    """演练模块迁移并输出逐条语句的耗时、影响行数和锁"""
+    from app.modules.migration_dry_run import dry_run_module
+    
+    reports = dry_run_module(migration_manager, module_name)
+    if not reports:
+        click.echo(f"模块 {module_name} 没有待应用的迁移")
+        return True
+    
+    for report in reports:
+        click.echo(f"迁移: {module_name}.{report.migration_name}  总耗时 {report.total_ms}ms")
+        for statement in report.statements:
+            rows = statement.rowcount if statement.rowcount >= 0 else "-"
+            click.echo(f"  {statement.duration_ms:>10.2f}ms | 行数 {rows:>8} | {statement.sql}")
+            for lock in statement.locks:
+                click.echo(f"  {'':>12} 锁 {lock}")
+        for deferred in report.deferred:
+            click.echo(f"  事务外执行: {deferred}")
+        if report.error:
+            click.echo(f"  ❌ 失败: {report.error}")
+            return False
+    click.echo("（演练事务已回滚）")
+    return True
+
+
 @click.command()
 @click.argument('module_name')
-def migrate(module_name):
+@click.option('--dry-run', is_flag=True, help='在回滚的事务中演练迁移并输出耗时报告')
+def migrate(module_name, dry_run):
     """运行模块迁移"""
+    if dry_run:
+        _echo_dry_run(module_name)
+        return
     if migration_manager.migrate_module(module_name):
         click.echo(f"✅ 模块 {module_name} 迁移完成")
     else:
@@ -102,9 +125,15 @@ def migrate(module_name):
 
 
 @click.command()
-def migrate_all():
+@click.option('--dry-run', is_flag=True, help='在回滚的事务中演练迁移并输出耗时报告')
+def migrate_all(dry_run):
     """运行所有模块迁移"""
     modules = ["core", "items", "tradingview"]
+    if dry_run:
+        for module_name in modules:
+            if not _echo_dry_run(module_name):
+                break
+        return
     results = migration_manager.migrate_all_modules(modules)
     
     for module_name, success in results.items():
@@ -121,29 +150,40 @@ def create_migration(module_name, migration_name):
     click.echo(f"✅ 迁移文件已创建: {file_path}")
 
 
+@click.command()
+@click.option('--batch-size', type=int, default=None, help='每批删除的行数')
+@click.option('--max-batches', type=int, default=None, help='最多执行的批次数')
+def compact(batch_size, max_batches):
+    """立即清理软删除墓碑"""
+    from app.modules.compaction import compact_all
+    
+    results = compact_all(batch_size=batch_size, max_batches=max_batches)
+    for table_name, deleted in results.items():
+        click.echo(f"{table_name}: 清理 {deleted} 行")
+
+
 @click.command()
 @click.argument('module_name')
 def test_module(module_name):
     """测试模块功能"""
     # 注册模块
-    if module_name == "core":
-        module = CoreModule()
-    elif module_name == "items":
-        module = ItemsModule()
-    elif module_name == "tradingview":
-        module = TradingViewModule()
-    else:
-        click.echo(f"❌ 未知模块: {module_name}")
+    try:
+        loaded = registry.load_module(module_name)
+    except ValueError as e:
+        click.echo(f"❌ {e}")
+        return
+    if not loaded:
+        click.echo(f"❌ 模块 {module_name} 注册失败")
         return
-    
-    registry.register_module(module_name, module)
     
     info = registry.get_module_info(module_name)
     if info:
+        timings = registry.startup_timings.get(module_name, {})
         click.echo(f"✅ 模块 {module_name} 测试通过")
         click.echo(f"  路由数量: {len(info['router'].routes)}")
         click.echo(f"  模型数量: {len(info['models'])}")
         click.echo(f"  迁移路径: {info['migration_path']}")
+        click.echo(f"  导入耗时: {timings.get('import_ms', 0)}ms, 初始化耗时: {timings.get('setup_ms', 0)}ms")
     else:
         click.echo(f"❌ 模块 {module_name} 测试失败")
 
@@ -156,6 +196,7 @@ cli.add_command(migration_status)
 cli.add_command(migrate)
 cli.add_command(migrate_all)
 cli.add_command(create_migration)
+cli.add_command(compact)
 cli.add_command(test_module)
 
 
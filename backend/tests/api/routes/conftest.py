@@ -0,0 +1,9 @@
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def enforce_query_budgets(monkeypatch: pytest.MonkeyPatch) -> None:
+    """路由测试中超出 ROUTE_QUERY_BUDGETS 的请求直接失败"""
+    monkeypatch.setattr(settings, "QUERY_BUDGET_MODE", "raise")
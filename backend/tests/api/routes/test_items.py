@@ -66,14 +66,19 @@ def test_read_item_not_enough_permissions(
 
 
 def test_read_items(
-    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    db: Session,
+    query_budget,
 ) -> None:
-    create_random_item(db)
-    create_random_item(db)
-    response = client.get(
-        f"{settings.API_V1_STR}/items/",
-        headers=superuser_token_headers,
-    )
+    for _ in range(5):
+        create_random_item(db)
+    # 认证 + 计数 + 列表，与行数无关
+    with query_budget(3):
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+        )
     assert response.status_code == 200
     content = response.json()
     assert len(content["data"]) >= 2
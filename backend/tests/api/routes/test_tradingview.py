@@ -3,8 +3,10 @@ TradingView API路由测试
 """
 import uuid
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session
+from starlette.websockets import WebSocketDisconnect
 
 from app.core.config import settings
 from tests.utils.tradingview import create_random_tradingview, create_random_tradingview_data
@@ -73,15 +75,17 @@ def test_read_tradingview_not_enough_permissions(
 
 
 def test_read_tradingviews(
-    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session,
+    query_budget,
 ) -> None:
-    """测试读取TradingView列表"""
-    create_random_tradingview(db)
-    create_random_tradingview(db)
-    response = client.get(
-        f"{settings.API_V1_STR}/tradingview/",
-        headers=superuser_token_headers,
-    )
+    """测试读取TradingView列表（查询次数不随行数增长）"""
+    for _ in range(5):
+        create_random_tradingview(db)
+    with query_budget(3):
+        response = client.get(
+            f"{settings.API_V1_STR}/tradingview/",
+            headers=superuser_token_headers,
+        )
     assert response.status_code == 200
     content = response.json()
     assert "data" in content
@@ -230,3 +234,482 @@ def test_tradingview_stats(
     assert isinstance(content["total_items"], int)
     assert isinstance(content["active_users"], int)
     assert content["total_items"] >= 2
+
+
+def test_deleted_tradingview_is_hidden(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试软删除后的TradingView不再可见，且不能重复删除"""
+    tradingview = create_random_tradingview(db)
+    url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    response = client.delete(url, headers=superuser_token_headers)
+    assert response.status_code == 200
+
+    response = client.get(url, headers=superuser_token_headers)
+    assert response.status_code == 404
+    response = client.delete(url, headers=superuser_token_headers)
+    assert response.status_code == 404
+
+
+def test_tradingview_webhook(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试生成webhook密钥后接收告警，告警由后台批量写入"""
+    from sqlmodel import func, select
+
+    from app.models import TradingViewAlert
+    from app.modules import registry
+
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    response = client.post(f"{base_url}/webhook-secret", headers=superuser_token_headers)
+    assert response.status_code == 200
+    secret = response.json()["secret"]
+    assert f"secret={secret}" in response.json()["url"]
+
+    response = client.post(f"{base_url}/webhook", params={"secret": "wrong"}, content=b"BUY")
+    assert response.status_code == 401
+
+    for i in range(3):
+        response = client.post(
+            f"{base_url}/webhook", params={"secret": secret}, json={"ticker": "BTCUSD", "close": i}
+        )
+        assert response.status_code == 202
+    response = client.post(
+        f"{base_url}/webhook", headers={"X-Webhook-Secret": secret}, content=b"plain text alert"
+    )
+    assert response.status_code == 202
+
+    registry.modules["tradingview"]["instance"].alert_writer.flush()
+    count = db.exec(
+        select(func.count()).select_from(TradingViewAlert)
+        .where(TradingViewAlert.tradingview_id == tradingview.id)
+    ).one()
+    assert count == 4
+
+
+def test_tradingview_bars(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试按列写入K线并按时间范围读取"""
+    tradingview = create_random_tradingview(db)
+    url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}/bars"
+    start = 1_704_067_200  # 2024-01-01，跨月写入会创建两个分区
+    t = [start - 120 + 60 * i for i in range(5)]
+    closes = [100.0, 101.0, 102.0, 103.0, 104.0]
+    data = {"symbol": "BTCUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes, "c": closes}
+    response = client.post(url, headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+    assert response.json()["written"] == 5
+
+    # 重复写入最后一根K线会覆盖
+    data.update(t=[t[-1]], o=[105.0], h=[105.0], l=[105.0], c=[105.0])
+    response = client.post(url, headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+
+    response = client.get(url, headers=superuser_token_headers, params={"symbol": "BTCUSD", "timeframe": "1m"})
+    assert response.status_code == 200
+    content = response.json()
+    assert content["t"] == t
+    assert content["c"] == closes[:-1] + [105.0]
+
+    response = client.get(
+        url, headers=superuser_token_headers,
+        params={"symbol": "BTCUSD", "timeframe": "1m", "limit": 2},
+    )
+    assert response.json()["t"] == t[-2:]
+
+
+def test_tradingview_bars_reject_out_of_range_times(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试时间戳超出范围或一批需要新建过多分区时返回 422"""
+    tradingview = create_random_tradingview(db)
+    url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}/bars"
+    # 负数/远古时间戳、远未来时间戳、覆盖 2000-2024 每个月（需要新建数百个分区）
+    for t in (
+        [-60_000_000_000, 1_704_067_200],
+        [1_704_067_200, 4_102_444_800],
+        list(range(946_684_800, 1_704_067_200, 15 * 86400)),
+    ):
+        ones = [1.0] * len(t)
+        data = {"symbol": "BTCUSD", "timeframe": "1d", "t": t, "o": ones, "h": ones, "l": ones, "c": ones}
+        response = client.post(url, headers=superuser_token_headers, json=data)
+        assert response.status_code == 422, t[:2]
+
+
+def test_tradingview_indicators(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试在已存储的K线上计算指标"""
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    closes = [100.0 + i for i in range(30)]
+    t = [1_704_067_200 + 60 * i for i in range(30)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes, "c": closes}
+    response = client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data)
+    assert response.status_code == 200
+
+    response = client.get(
+        f"{base_url}/indicators", headers=superuser_token_headers,
+        params={"symbol": "ETHUSD", "timeframe": "1m", "indicators": "sma:5,rsi:14"},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["t"] == t
+    assert content["indicators"]["sma_5"]["value"][:4] == [None] * 4
+    assert content["indicators"]["sma_5"]["value"][4] == 102.0
+    assert content["indicators"]["rsi_14"]["value"][-1] == 100.0
+
+    response = client.get(
+        f"{base_url}/indicators", headers=superuser_token_headers,
+        params={"symbol": "ETHUSD", "timeframe": "1m", "indicators": "unknown"},
+    )
+    assert response.status_code == 422
+
+    for spec in ("rsi:0.5", "sma:0.5", "macd:0.5:0.5:0.5", "ema:1"):
+        response = client.get(
+            f"{base_url}/indicators", headers=superuser_token_headers,
+            params={"symbol": "ETHUSD", "timeframe": "1m", "indicators": spec},
+        )
+        assert response.status_code == 422, spec
+
+
+def test_tradingview_indicators_compute_error_is_422(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """计算阶段的 ValueError 返回 422 而不是 500"""
+    from app.modules.tradingview import indicators
+
+    def fail(self, name, params):
+        raise ValueError("bad period")
+
+    monkeypatch.setattr(indicators.IndicatorEngine, "compute_one", fail)
+    tradingview = create_random_tradingview(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/tradingview/{tradingview.id}/indicators", headers=superuser_token_headers,
+        params={"symbol": "ETHUSD", "timeframe": "1m", "indicators": "sma:5"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "bad period"
+
+
+def test_tradingview_latest_indicators(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试写入K线时增量更新的最新指标值"""
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    params = {"symbol": "ETHUSD", "timeframe": "1m"}
+    response = client.get(f"{base_url}/indicators/latest", headers=superuser_token_headers, params=params)
+    assert response.status_code == 404
+
+    closes = [100.0 + i for i in range(30)]
+    t = [1_704_067_200 + 60 * i for i in range(30)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t[:25], "o": closes[:25], "h": closes[:25],
+            "l": closes[:25], "c": closes[:25]}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+    # 追加新K线，并重复推送最后一根
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t[24:], "o": closes[24:], "h": closes[24:],
+            "l": closes[24:], "c": closes[24:]}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+
+    response = client.get(f"{base_url}/indicators/latest", headers=superuser_token_headers, params=params)
+    assert response.status_code == 200
+    content = response.json()
+    assert content["t"] == t[-1]
+    assert content["values"]["sma_20"]["value"] == pytest.approx(sum(closes[-20:]) / 20)
+    assert content["values"]["rsi_14"]["value"] == 100.0
+
+
+def test_tradingview_resampled_bars(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试写入 1 分钟K线后的预聚合与任意周期重采样"""
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    closes = [100.0 + i for i in range(30)]
+    t = [1_704_067_200 + 60 * i for i in range(30)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes,
+            "c": closes, "v": [1.0] * 30}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+
+    # 预聚合周期直接按标准K线读取
+    response = client.get(
+        f"{base_url}/bars", headers=superuser_token_headers, params={"symbol": "ETHUSD", "timeframe": "5m"}
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["t"] == t[::5]
+    assert content["o"] == closes[::5]
+    assert content["c"] == closes[4::5]
+    assert content["v"] == [5.0] * 6
+
+    response = client.get(
+        f"{base_url}/bars/resampled", headers=superuser_token_headers,
+        params={"symbol": "ETHUSD", "timeframe": "15m", "limit": 1},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["t"] == [t[15]]
+    assert content["h"] == [closes[-1]]
+    assert content["v"] == [15.0]
+
+    response = client.get(
+        f"{base_url}/bars/resampled", headers=superuser_token_headers,
+        params={"symbol": "ETHUSD", "timeframe": "7m"},
+    )
+    assert response.status_code == 422
+
+
+def test_tradingview_bars_binary(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试序列接口按 Accept 头返回列式二进制"""
+    from app.modules.tradingview.wire import MEDIA_TYPE, decode_series
+
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    closes = [100.0 + i for i in range(30)]
+    t = [1_704_067_200 + 60 * i for i in range(30)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes, "c": closes}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+
+    params = {"symbol": "ETHUSD", "timeframe": "1m"}
+    headers = {**superuser_token_headers, "Accept": f"{MEDIA_TYPE}; delta=1"}
+    response = client.get(f"{base_url}/bars", headers=headers, params=params)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MEDIA_TYPE
+    meta, columns = decode_series(response.content)
+    assert meta == params
+    assert columns["t"].tolist() == t
+    assert columns["c"].tolist() == closes
+
+    response = client.get(f"{base_url}/indicators", headers=headers, params={**params, "indicators": "sma:5"})
+    assert response.status_code == 200
+    _, columns = decode_series(response.content)
+    assert columns["sma_5.value"][4] == 102.0
+
+    response = client.get(f"{base_url}/bars", headers=superuser_token_headers, params=params)
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_tradingview_backtest(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试保存策略并在进程池中执行回测任务"""
+    import time
+
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    closes = [100.0 + 10 * ((i // 20) % 2) + i * 0.1 for i in range(200)]
+    t = [1_704_067_200 + 60 * i for i in range(200)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes, "c": closes}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+
+    response = client.post(
+        f"{base_url}/strategies", headers=superuser_token_headers,
+        json={"name": "cross", "kind": "ma_cross", "params": {"fast": 5, "slow": 20}},
+    )
+    assert response.status_code == 200
+    strategy = response.json()
+    assert strategy["params"] == {"fast": 5, "slow": 20, "ma": "ema", "allow_short": False}
+
+    response = client.post(
+        f"{base_url}/strategies", headers=superuser_token_headers,
+        json={"name": "bad", "kind": "ma_cross", "params": {"fast": 50, "slow": 20}},
+    )
+    assert response.status_code == 422
+
+    response = client.post(
+        f"{base_url}/strategies/{strategy['id']}/backtests", headers=superuser_token_headers,
+        json={"symbol": "ETHUSD", "timeframe": "1m", "fee_bps": 1},
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "pending"
+
+    deadline = time.monotonic() + 60
+    while job["status"] in ("pending", "running") and time.monotonic() < deadline:
+        time.sleep(0.2)
+        job = client.get(f"{base_url}/backtests/{job['id']}", headers=superuser_token_headers).json()
+    assert job["status"] == "completed", job["error"]
+    assert job["progress"] == 1.0
+    assert job["result"]["metrics"]["bars"] == 200
+    assert job["result"]["equity"]["t"][-1] == t[-1]
+
+    response = client.get(f"{base_url}/backtests", headers=superuser_token_headers)
+    assert response.json()["count"] == 1
+
+
+def test_tradingview_sweep(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试参数扫描的 NDJSON 流式结果"""
+    import json
+
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    closes = [100.0 + 10 * ((i // 20) % 2) + i * 0.1 for i in range(200)]
+    t = [1_704_067_200 + 60 * i for i in range(200)]
+    data = {"symbol": "ETHUSD", "timeframe": "1m", "t": t, "o": closes, "h": closes, "l": closes, "c": closes}
+    assert client.post(f"{base_url}/bars", headers=superuser_token_headers, json=data).status_code == 200
+    strategy = client.post(
+        f"{base_url}/strategies", headers=superuser_token_headers,
+        json={"name": "cross", "kind": "ma_cross", "params": {}},
+    ).json()
+
+    sweep = {"symbol": "ETHUSD", "timeframe": "1m", "grid": {"fast": [3, 5, 30], "slow": [20, 40]}, "top": 2}
+    response = client.post(
+        f"{base_url}/strategies/{strategy['id']}/sweep", headers=superuser_token_headers, json=sweep
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    summary = lines.pop()
+    assert summary["done"] is True
+    assert summary["total"] == 5
+    assert summary["skipped"] == 1
+    assert len(lines) == 5
+    assert len(summary["best"]) == 2
+
+    sweep["grid"] = {"unknown": [1]}
+    response = client.post(
+        f"{base_url}/strategies/{strategy['id']}/sweep", headers=superuser_token_headers, json=sweep
+    )
+    assert response.status_code == 422
+
+
+def test_tradingview_alert_rules(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试告警规则在写入K线时评估并批量写入告警"""
+    from sqlmodel import select
+
+    from app.models import TradingViewAlert
+    from app.modules import registry
+
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    rule = {"name": "breakout", "symbol": "ETHUSD", "timeframe": "1m", "kind": "cross",
+            "source": "close", "op": "above", "value": 120}
+    response = client.post(f"{base_url}/alert-rules", headers=superuser_token_headers, json=rule)
+    assert response.status_code == 200
+    rule_id = response.json()["id"]
+    response = client.post(
+        f"{base_url}/alert-rules", headers=superuser_token_headers,
+        json={**rule, "source": "rsi_99.value"},
+    )
+    assert response.status_code == 422
+    response = client.post(
+        f"{base_url}/alert-rules", headers=superuser_token_headers,
+        json={**rule, "kind": "percent_change", "source": "rsi_14.value", "lookback": 500},
+    )
+    assert response.status_code == 422
+
+    closes = [100.0 + i for i in range(30)]
+    t = [1_704_067_200 + 60 * i for i in range(30)]
+    responses = [
+        client.post(
+            f"{base_url}/bars", headers=superuser_token_headers,
+            json={"symbol": "ETHUSD", "timeframe": "1m", "t": [t[i]], "o": [closes[i]], "h": [closes[i]],
+                  "l": [closes[i]], "c": [closes[i]]},
+        ).json()
+        for i in range(30)
+    ]
+    # 只在收盘价从 120 上穿到 121 的那根K线触发一次
+    assert [r["alerts"] for r in responses].count(1) == 1
+    assert responses[21]["alerts"] == 1
+
+    registry.modules["tradingview"]["instance"].alert_writer.flush()
+    alerts = db.exec(select(TradingViewAlert).where(TradingViewAlert.tradingview_id == tradingview.id)).all()
+    assert [alert.payload["rule_id"] for alert in alerts] == [rule_id]
+    assert alerts[0].payload["t"] == t[21]
+
+    response = client.delete(f"{base_url}/alert-rules/{rule_id}", headers=superuser_token_headers)
+    assert response.status_code == 200
+    response = client.get(f"{base_url}/alert-rules", headers=superuser_token_headers)
+    assert response.json()["count"] == 0
+
+
+def test_tradingview_events_websocket(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    """测试项目频道推送更新、新K线与规则告警"""
+    tradingview = create_random_tradingview(db)
+    base_url = f"{settings.API_V1_STR}/tradingview/{tradingview.id}"
+    response = client.post(
+        f"{settings.API_V1_STR}/tradingview/events/ticket", headers=superuser_token_headers
+    )
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+    rule = {"name": "high", "symbol": "SOLUSD", "timeframe": "1m", "kind": "threshold",
+            "source": "close", "op": "above", "value": 100}
+    client.post(f"{base_url}/alert-rules", headers=superuser_token_headers, json=rule)
+
+    with client.websocket_connect(f"{base_url}/events/ws?ticket={ticket}") as websocket:
+        response = client.put(base_url, headers=superuser_token_headers, json={"name": "renamed"})
+        assert response.status_code == 200
+        event = websocket.receive_json()
+        assert event["type"] == "updated"
+        assert event["data"]["name"] == "renamed"
+
+        response = client.post(
+            f"{base_url}/bars", headers=superuser_token_headers,
+            json={"symbol": "SOLUSD", "timeframe": "1m", "t": [1_704_067_200], "o": [101.0],
+                  "h": [101.0], "l": [101.0], "c": [101.0]},
+        )
+        assert response.json()["alerts"] == 1
+        event = websocket.receive_json()
+        assert event["type"] == "bars"
+        assert event["data"]["series"][0]["bar"]["close"] == 101.0
+        event = websocket.receive_json()
+        assert event["type"] == "alert"
+        assert event["data"]["rule"] == "high"
+
+
+def test_tradingview_events_require_token(client: TestClient) -> None:
+    """测试未登录时不能订阅实时事件"""
+    response = client.get(f"{settings.API_V1_STR}/tradingview/events/stream")
+    assert response.status_code == 401
+
+
+def test_tradingview_events_reject_bad_ticket(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    """测试无效票据时 SSE 返回 401、WebSocket 以 1008 关闭；访问令牌不能作为票据"""
+    base_url = f"{settings.API_V1_STR}/tradingview"
+    token = superuser_token_headers["Authorization"].split(" ", 1)[1]
+    response = client.get(f"{base_url}/events/stream?ticket=not-a-ticket")
+    assert response.status_code == 401
+    response = client.get(f"{base_url}/{uuid.uuid4()}/events?ticket=not-a-ticket")
+    assert response.status_code == 401
+    response = client.get(f"{base_url}/events/stream?ticket={token}")
+    assert response.status_code == 401
+    # 旧的 ?token= 不再被接受
+    response = client.get(f"{base_url}/events/stream?token={token}")
+    assert response.status_code == 401
+
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect(f"{base_url}/events/ws?ticket=not-a-ticket"):
+            pass
+    assert exc_info.value.code == 1008
+
+
+def test_tradingview_event_ticket_is_not_an_access_token(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    """测试订阅票据不能用于调用其他接口"""
+    response = client.post(
+        f"{settings.API_V1_STR}/tradingview/events/ticket", headers=superuser_token_headers
+    )
+    ticket = response.json()["ticket"]
+    assert response.json()["expires_in"] > 0
+    response = client.get(
+        f"{settings.API_V1_STR}/tradingview/", headers={"Authorization": f"Bearer {ticket}"}
+    )
+    assert response.status_code == 403
+
+    response = client.post(f"{settings.API_V1_STR}/tradingview/events/ticket")
+    assert response.status_code == 401
@@ -1,4 +1,6 @@
-from collections.abc import Generator
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager
+from functools import partial
 
 import pytest
 from fastapi.testclient import TestClient
@@ -6,6 +8,7 @@ from sqlmodel import Session, delete
 
 from app.core.config import settings
 from app.core.db import engine, init_db
+from app.core.query_guard import QueryCounter, assert_query_budget
 from app.main import app
 from app.models import Item, User, TradingView
 from tests.utils.user import authentication_token_from_email
@@ -52,3 +55,9 @@ def normal_user_token_headers(client: TestClient, db: Session) -> dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture
+def query_budget() -> Callable[[int], AbstractContextManager[QueryCounter]]:
+    """用法: with query_budget(3): client.get(...)，超出预算或出现 N+1 时测试失败"""
+    return partial(assert_query_budget, engine)
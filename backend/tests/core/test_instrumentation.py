@@ -0,0 +1,68 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core import instrumentation
+from app.core.instrumentation import (
+    Histogram,
+    InstrumentationMiddleware,
+    instrument_engine,
+    render_metrics,
+)
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = Histogram("test_latency", "test", (0.1, 1.0), ("route",))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5.0, "/a")
+    lines = histogram.render()
+    assert 'test_latency_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_latency_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_latency_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_latency_count{route="/a"} 3' in lines
+
+
+def test_middleware_counts_queries_per_route() -> None:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(InstrumentationMiddleware)
+
+    @app.get("/things/{thing_id}")
+    def read_thing(thing_id: int) -> dict:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": thing_id}
+
+    with TestClient(app) as client:
+        response = client.get("/things/42")
+
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers["server-timing"]
+    metrics = render_metrics()
+    assert 'route="/things/{thing_id}"' in metrics
+    assert "/things/42" not in metrics
+
+
+def test_slow_query_is_logged_with_route(monkeypatch, caplog) -> None:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    monkeypatch.setattr(instrumentation.settings, "SLOW_QUERY_MS", 0)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert any("慢查询" in record.message for record in caplog.records)
+
+
+def test_failed_query_does_not_leak_start_time() -> None:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        assert conn.info["query_start"] == []
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_start"] == []
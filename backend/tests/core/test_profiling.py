@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import profiling
+from app.core.profiling import ProfilingMiddleware, SamplingProfiler
+
+
+def _busy(seconds: float) -> int:
+    total = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_sampling_profiler_collects_folded_stacks() -> None:
+    profiler = SamplingProfiler(interval_ms=1)
+    profiler.start()
+    _busy(0.1)
+    profiler.stop()
+    assert profiler.samples > 0
+    assert "_busy" in profiler.folded()
+    assert not profiler.running
+
+
+@pytest.fixture
+def profiled_app(monkeypatch: pytest.MonkeyPatch) -> FastAPI:
+    def authorize(token: str) -> None:
+        if token != "admin":
+            raise profiling.HTTPException(status_code=403, detail="forbidden")
+
+    monkeypatch.setattr(profiling, "_authorize_superuser", authorize)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/work")
+    def work() -> dict:
+        return {"total": _busy(0.05)}
+
+    return app
+
+
+def test_profile_header_returns_profile(profiled_app: FastAPI) -> None:
+    with TestClient(profiled_app) as client:
+        response = client.get(
+            "/work", headers={"X-Profile": "1", "Authorization": "Bearer admin"}
+        )
+        assert response.status_code == 200
+        assert response.headers["x-profile-status"] == "200"
+        assert "_busy" in response.text
+
+        assert "total" in client.get("/work").json()
+        response = client.get(
+            "/work", headers={"X-Profile": "1", "Authorization": "Bearer user"}
+        )
+        assert response.status_code == 403
+
+
+def test_sampling_interval_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        SamplingProfiler(interval_ms=0)
+
+
+def test_event_stream_is_passed_through(profiled_app: FastAPI) -> None:
+    from fastapi.responses import StreamingResponse
+
+    async def events():
+        for i in range(3):
+            yield f"data: {i}\n\n"
+
+    @profiled_app.get("/events")
+    def stream() -> StreamingResponse:
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    with TestClient(profiled_app) as client:
+        response = client.get(
+            "/events", headers={"X-Profile": "1", "Authorization": "Bearer admin"}
+        )
+    assert response.headers["x-profile-status"] == "skipped"
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
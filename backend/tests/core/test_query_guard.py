@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.core.instrumentation import InstrumentationMiddleware, instrument_engine
+from app.core.query_guard import (
+    ROUTE_QUERY_BUDGETS,
+    QueryBudgetExceeded,
+    QueryBudgetMiddleware,
+    assert_query_budget,
+    route_budget,
+)
+
+
+def test_assert_query_budget_detects_repeated_statement() -> None:
+    engine = create_engine("sqlite://")
+    with pytest.raises(QueryBudgetExceeded, match="N\\+1"):
+        with assert_query_budget(engine, 100) as counter, engine.connect() as conn:
+            for i in range(5):
+                conn.execute(text("SELECT :i"), {"i": i})
+    assert counter.count == 5
+
+
+def test_assert_query_budget_within_budget() -> None:
+    engine = create_engine("sqlite://")
+    with assert_query_budget(engine, 2) as counter, engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert counter.count == 2
+
+
+def test_middleware_raises_over_budget() -> None:
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, mode="raise")
+    app.add_middleware(InstrumentationMiddleware)
+
+    @app.get("/rows")
+    def read_rows() -> list:
+        with engine.connect() as conn:
+            return [
+                conn.execute(text("SELECT :i"), {"i": i}).scalar() for i in range(20)
+            ]
+
+    with TestClient(app) as client, pytest.raises(QueryBudgetExceeded, match="/rows"):
+        client.get("/rows")
+
+
+def test_route_budgets_follow_api_prefix() -> None:
+    assert all(
+        key.split(" ", 1)[1].startswith(f"{settings.API_V1_STR}/")
+        for key in ROUTE_QUERY_BUDGETS
+    )
+    assert route_budget("GET", f"{settings.API_V1_STR}/users/me") == 1
+    assert route_budget("GET", "/unknown") == settings.QUERY_BUDGET_DEFAULT
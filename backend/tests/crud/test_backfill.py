@@ -0,0 +1,33 @@
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.db import engine
+from app.models import Item, ItemCreate
+from app.modules.migration_ops import run_backfill
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+
+def test_backfill_uuid_keyed_table(db: Session) -> None:
+    user = create_random_user(db)
+    for _ in range(5):
+        crud.create_item(
+            session=db,
+            item_in=ItemCreate(title=random_lower_string()),
+            owner_id=user.id,
+        )
+
+    updated = run_backfill(
+        engine,
+        "item",
+        "description = 'backfilled'",
+        where="owner_id = :owner_id",
+        params={"owner_id": user.id},
+        batch_size=2,
+        pause_seconds=0,
+    )
+    assert updated == 5
+
+    db.expire_all()
+    items = db.exec(select(Item).where(Item.owner_id == user.id)).all()
+    assert {item.description for item in items} == {"backfilled"}
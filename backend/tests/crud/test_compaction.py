@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlmodel import Session
+
+from app.models import TradingView, TradingViewBar
+from app.modules.compaction import compact_model
+from app.modules.crud_ops import delete_owned
+from app.modules.soft_delete import utcnow
+from app.modules.tradingview.bars import BarSeries, store_bars
+from tests.utils.tradingview import create_random_tradingview
+
+
+def _expire(db: Session, tradingview: TradingView) -> None:
+    assert delete_owned(db, TradingView, tradingview.id)
+    db.execute(
+        update(TradingView.__table__)
+        .where(TradingView.__table__.c.id == tradingview.id)
+        .values(deleted_at=utcnow() - timedelta(days=365)),
+        execution_options={"include_deleted": True},
+    )
+    db.commit()
+
+
+def test_compaction_purges_expired_tombstones(db: Session) -> None:
+    expired = create_random_tradingview(db)
+    recent = create_random_tradingview(db)
+    _expire(db, expired)
+    assert delete_owned(db, TradingView, recent.id)
+
+    assert compact_model(TradingView, batch_size=100) >= 1
+
+    db.expire_all()
+    options = {"include_deleted": True}
+    assert db.get(TradingView, expired.id, execution_options=options) is None
+    assert db.get(TradingView, recent.id, execution_options=options) is not None
+
+
+def test_compaction_deletes_children_in_batches(db: Session) -> None:
+    tradingview = create_random_tradingview(db)
+    closes = np.linspace(100, 110, 50)
+    t = 1_704_067_200 + np.arange(50) * 60
+    store_bars(
+        db,
+        tradingview.id,
+        BarSeries.from_columns("BTCUSD", "1m", t, closes, closes, closes, closes),
+    )
+    db.commit()
+    _expire(db, tradingview)
+
+    def bar_count() -> int:
+        return db.execute(
+            select(func.count())
+            .select_from(TradingViewBar)
+            .where(TradingViewBar.tradingview_id == tradingview.id)
+        ).scalar_one()
+
+    # 每批最多 20 行：第一批只删掉 20 根K线，墓碑本身仍在
+    assert compact_model(TradingView, batch_size=20, max_batches=1) == 20
+    assert bar_count() == 30
+    assert compact_model(TradingView, batch_size=20) >= 31
+    assert bar_count() == 0
+    options = {"include_deleted": True}
+    db.expire_all()
+    assert db.get(TradingView, tradingview.id, execution_options=options) is None
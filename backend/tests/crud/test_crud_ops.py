@@ -0,0 +1,51 @@
+import uuid
+
+from sqlmodel import Session
+
+from app.models import Item
+from app.modules.crud_ops import delete_owned, record_exists, update_owned
+from tests.utils.item import create_random_item
+from tests.utils.user import create_random_user
+
+
+def test_update_owned_by_owner(db: Session) -> None:
+    item = create_random_item(db)
+    updated = update_owned(
+        db, Item, item.id, {"title": "new title"}, owner_id=item.owner_id
+    )
+    db.commit()
+    assert updated is not None
+    assert updated.title == "new title"
+
+
+def test_update_owned_other_user(db: Session) -> None:
+    item = create_random_item(db)
+    other = create_random_user(db)
+    updated = update_owned(db, Item, item.id, {"title": "new title"}, owner_id=other.id)
+    db.rollback()
+    assert updated is None
+    assert record_exists(db, Item, item.id)
+
+
+def test_update_owned_not_found(db: Session) -> None:
+    missing_id = uuid.uuid4()
+    assert update_owned(db, Item, missing_id, {"title": "new title"}) is None
+    db.rollback()
+    assert not record_exists(db, Item, missing_id)
+
+
+def test_delete_owned(db: Session) -> None:
+    item = create_random_item(db)
+    other = create_random_user(db)
+    assert delete_owned(db, Item, item.id, owner_id=other.id) is None
+    assert delete_owned(db, Item, item.id, owner_id=item.owner_id) is not None
+    db.commit()
+    assert not record_exists(db, Item, item.id)
+
+
+def test_delete_owned_returns_owner_for_superuser(db: Session) -> None:
+    item = create_random_item(db)
+    # 不限定所有者时，所有者由同一条 DELETE ... RETURNING 返回
+    deleted = delete_owned(db, Item, item.id)
+    assert deleted is not None and deleted.owner_id == item.owner_id
+    db.commit()
@@ -0,0 +1,55 @@
+import numpy as np
+from sqlmodel import Session, func, select
+
+from app import crud
+from app.models import Item, ItemCreate, TradingViewBar, User
+from app.modules.core import purge
+from app.modules.tradingview.bars import BarSeries, store_bars
+from tests.utils.tradingview import create_random_tradingview
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_lower_string
+
+
+def test_purge_user_in_batches(db: Session) -> None:
+    user = create_random_user(db)
+    for _ in range(5):
+        crud.create_item(
+            session=db,
+            item_in=ItemCreate(title=random_lower_string()),
+            owner_id=user.id,
+        )
+    assert purge.count_owned_records(db, user.id, limit=3) > 3
+
+    deleted = purge.purge_user(user.id, batch_size=2)
+    assert deleted == 5
+
+    db.expire_all()
+    assert db.get(User, user.id) is None
+    count = db.exec(
+        select(func.count()).select_from(Item).where(Item.owner_id == user.id)
+    ).one()
+    assert count == 0
+
+
+def test_indirect_records_count_and_are_purged_first(db: Session) -> None:
+    tradingview = create_random_tradingview(db)
+    closes = np.linspace(100, 110, 50)
+    t = 1_704_067_200 + np.arange(50) * 60
+    store_bars(
+        db,
+        tradingview.id,
+        BarSeries.from_columns("BTCUSD", "1m", t, closes, closes, closes, closes),
+    )
+    db.commit()
+    # 只有一个项目，但项目下的K线同样计入
+    assert purge.count_owned_records(db, tradingview.owner_id, limit=10) > 10
+
+    deleted = purge.purge_user(tradingview.owner_id, batch_size=20)
+    assert deleted == 51
+
+    count = db.exec(
+        select(func.count())
+        .select_from(TradingViewBar)
+        .where(TradingViewBar.tradingview_id == tradingview.id)
+    ).one()
+    assert count == 0
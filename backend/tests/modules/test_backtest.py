@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.modules.tradingview.backtest import (
+    MAX_ANNUAL_RETURN,
+    _hold,
+    backtest_strategy,
+    run_backtest,
+    validate_strategy,
+)
+from app.modules.tradingview.bars import BarSeries
+
+
+def _bars(n: int = 2000, seed: int = 11) -> BarSeries:
+    close = 100 * np.exp(
+        np.cumsum(np.random.default_rng(seed).normal(scale=0.002, size=n))
+    )
+    return BarSeries.from_columns(
+        "BTCUSD", "1m", np.arange(n) * 60, close, close, close, close
+    )
+
+
+def test_hold_forward_fills_signals() -> None:
+    entries = np.array([0, 1, 0, 0, 0, 1, 0, 0], dtype=bool)
+    exits = np.array([1, 0, 0, 1, 0, 1, 0, 1], dtype=bool)
+    assert _hold(entries, exits).tolist() == [0, 1, 1, 0, 0, 1, 1, 0]
+
+
+def test_engine_matches_bar_by_bar_loop() -> None:
+    bars = _bars()
+    position = np.random.default_rng(1).choice([-1.0, 0.0, 1.0], size=len(bars))
+    fee_bps = 5.0
+    result = run_backtest(bars, position, fee_bps)
+
+    equity, previous, trades, trade_equity = [1.0], 0.0, [], None
+    for i in range(len(bars) - 1):
+        change = abs(position[i] - previous)
+        period = (
+            position[i] * (bars.close[i + 1] / bars.close[i] - 1)
+            - change * fee_bps / 10_000
+        )
+        if position[i] != previous or trade_equity is None:
+            if trade_equity is not None and previous != 0:
+                trades.append(trade_equity - 1)
+            trade_equity = 1.0
+        trade_equity *= 1 + period
+        equity.append(equity[-1] * (1 + period))
+        previous = position[i]
+    if previous != 0:
+        trades.append(trade_equity - 1)
+
+    np.testing.assert_allclose(result.equity, equity, rtol=1e-10)
+    assert result.metrics["trades"] == len(trades)
+    assert result.metrics["win_rate"] == pytest.approx(np.mean(np.array(trades) > 0))
+    assert result.metrics["max_drawdown"] == pytest.approx(
+        max(
+            1 - e / m
+            for e, m in zip(equity, np.maximum.accumulate(equity), strict=True)
+        )
+    )
+
+
+@pytest.mark.parametrize("kind", ["ma_cross", "rsi_reversion", "bollinger_breakout"])
+def test_strategies_produce_valid_positions(kind: str) -> None:
+    bars = _bars()
+    result = backtest_strategy(
+        bars, kind, {"allow_short": True} if kind != "bollinger_breakout" else {}
+    )
+    assert set(np.unique(result.position)) <= {-1.0, 0.0, 1.0}
+    assert result.metrics["bars"] == len(bars)
+    payload = result.to_dict(max_points=100)
+    assert len(payload["equity"]["t"]) == 100
+    assert payload["equity"]["t"][-1] == int(bars.t[-1])
+
+
+def test_validate_strategy() -> None:
+    assert validate_strategy("ma_cross", {"fast": 5})["slow"] == 30
+    for kind, params in (
+        ("unknown", {}),
+        ("ma_cross", {"fast": 50}),
+        ("ma_cross", {"fast": 2.5}),
+        ("ma_cross", {"ma": "wma"}),
+        ("rsi_reversion", {"lower": 60}),
+        ("bollinger_breakout", {"window": 10}),
+    ):
+        with pytest.raises(ValueError):
+            validate_strategy(kind, params)
+
+
+def test_short_through_price_doubling_is_wiped_out() -> None:
+    close = np.array([100.0, 120.0, 250.0, 300.0, 280.0, 290.0])
+    bars = BarSeries.from_columns(
+        "BTCUSD", "1m", np.arange(len(close)) * 60, close, close, close, close
+    )
+    position = np.array([-1.0, -1.0, -1.0, 0.0, 1.0, 1.0])
+    result = run_backtest(bars, position)
+
+    assert np.isfinite(result.equity).all()
+    assert result.equity.min() == 0.0
+    assert result.metrics["total_return"] == -1.0
+    assert result.metrics["max_drawdown"] == 1.0
+    assert result.metrics["trades"] == 2
+    assert result.metrics["win_rate"] == 0.5
+    assert all(np.isfinite(value) for value in result.metrics.values())
+
+
+def test_short_window_annual_return_stays_finite() -> None:
+    # 20 根 1 分钟K线上涨 190%，按复利年化会溢出为 inf
+    close = np.linspace(100, 290, 20)
+    bars = BarSeries.from_columns(
+        "BTCUSD", "1m", np.arange(20) * 60, close, close, close, close
+    )
+    result = run_backtest(bars, np.ones(20))
+    assert result.metrics["annual_return"] == pytest.approx(MAX_ANNUAL_RETURN)
+    json.dumps(result.to_dict(), allow_nan=False)
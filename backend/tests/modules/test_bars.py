@@ -0,0 +1,113 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.modules.tradingview import bars as bars_module
+from app.modules.tradingview.bars import (
+    MAX_NEW_PARTITIONS,
+    BarSeries,
+    ensure_partitions,
+    parse_binary_copy,
+    partition_name,
+    timeframe_seconds,
+    validate_bar_times,
+)
+
+
+def test_from_columns_sorts_and_keeps_last_duplicate() -> None:
+    bars = BarSeries.from_columns(
+        "BTCUSD",
+        "1m",
+        t=[120, 60, 120],
+        open=[2.0, 1.0, 3.0],
+        high=[2.0, 1.0, 3.0],
+        low=[2.0, 1.0, 3.0],
+        close=[2.0, 1.0, 3.0],
+    )
+    assert bars.t.tolist() == [60, 120]
+    assert bars.close.tolist() == [1.0, 3.0]
+    assert bars.volume.tolist() == [0.0, 0.0]
+
+
+def test_from_columns_rejects_mismatched_lengths() -> None:
+    with pytest.raises(ValueError):
+        BarSeries.from_columns(
+            "BTCUSD", "1m", t=[60], open=[1.0, 2.0], high=[1.0], low=[1.0], close=[1.0]
+        )
+
+
+def test_timeframes_and_partition_names() -> None:
+    assert timeframe_seconds("1h") == 3600
+    with pytest.raises(ValueError):
+        timeframe_seconds("7m")
+    assert partition_name(np.datetime64("2024-03", "M")) == "tradingview_bar_p202403"
+
+
+def test_parse_binary_copy() -> None:
+    import struct
+
+    rows = [(60, 1.0, 2.0, 0.5, 1.5, 10.0), (120, 1.5, 2.5, 1.0, 2.0, 0.0)]
+    data = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 4) + b"ext!"
+    for ts, *values in rows:
+        data += struct.pack(">hiq", 6, 8, ts) + b"".join(
+            struct.pack(">id", 8, v) for v in values
+        )
+    data += struct.pack(">h", -1)
+
+    parsed = parse_binary_copy(data)
+    assert parsed["t"].tolist() == [60, 120]
+    assert parsed["low"].tolist() == [0.5, 1.0]
+    assert len(parse_binary_copy(data[:23] + struct.pack(">h", -1))) == 0
+    with pytest.raises(ValueError):
+        parse_binary_copy(b"COPY" + data[4:])
+
+
+def test_validate_bar_times() -> None:
+    now = 1_704_067_200
+    validate_bar_times(np.array([0, now, now + 3600]), now=now)
+    for t in ([-60, now], [now, now + 30 * 86400]):
+        with pytest.raises(ValueError, match="K线时间戳"):
+            validate_bar_times(np.array(t), now=now)
+
+
+class _CatalogEngine:
+    """系统目录中已有 existing 分区；创建分区时记录 DDL"""
+
+    def __init__(self, existing: list) -> None:
+        self.existing = existing
+        self.ddl: list = []
+
+    @contextmanager
+    def connect(self):
+        yield SimpleNamespace(
+            execute=lambda _: SimpleNamespace(scalars=lambda: self.existing)
+        )
+
+    @contextmanager
+    def begin(self):
+        yield SimpleNamespace(execute=lambda stmt, *_: self.ddl.append(str(stmt)))
+
+
+def test_new_partitions_per_batch_are_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(bars_module, "_known_partitions", set())
+    # 1970-2100 的每个月：一次请求不能建出上千个分区
+    t = np.arange(0, 4_102_444_800, 15 * 86400)
+    engine = _CatalogEngine([])
+    with pytest.raises(ValueError, match="分区"):
+        ensure_partitions(engine, t)
+    assert engine.ddl == []
+
+
+def test_existing_partitions_do_not_count_against_cap(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(bars_module, "_known_partitions", set())
+    months = np.arange("2020-01", "2024-01", dtype="datetime64[M]")
+    t = months.astype("datetime64[s]").astype(np.int64)
+    # 其他 worker 已建好全部分区，本进程缓存为空
+    engine = _CatalogEngine([partition_name(m) for m in months[:-1]])
+    assert len(months) > MAX_NEW_PARTITIONS
+    ensure_partitions(engine, t)
+    assert sum("CREATE TABLE" in sql for sql in engine.ddl) == 1
@@ -0,0 +1,37 @@
+from sqlalchemy.dialects import postgresql
+
+from app.models import TradingView, TradingViewBar, User
+from app.modules.cascade import cascade_filter, cascade_paths
+
+
+def test_cascade_paths_follow_foreign_keys_transitively() -> None:
+    paths = {table.name: path for table, path in cascade_paths(User.__table__)}
+    assert paths["tradingview"] == [
+        (TradingView.__table__.c.owner_id, User.__table__.c.id)
+    ]
+    assert [hop[0].table.name for hop in paths["tradingview_bar"]] == [
+        "tradingview_bar",
+        "tradingview",
+    ]
+    assert "user" not in paths
+
+    order = [table.name for table, _ in cascade_paths(User.__table__)]
+    # 子孙表先删，删除项目时不再触发级联
+    for child in (
+        "tradingview_bar",
+        "tradingview_alert",
+        "tradingview_backtest",
+        "tradingview_indicator_state",
+    ):
+        assert order.index(child) < order.index("tradingview")
+    assert order.index("tradingview_backtest") < order.index("tradingview_strategy")
+
+
+def test_cascade_filter_nests_subqueries() -> None:
+    path = dict((t.name, p) for t, p in cascade_paths(TradingView.__table__))[
+        "tradingview_bar"
+    ]
+    condition = cascade_filter(path, TradingView.__table__.c.deleted_at.is_not(None))
+    sql = str(condition.compile(dialect=postgresql.dialect()))
+    assert TradingViewBar.__table__.c.tradingview_id.name in sql
+    assert "SELECT tradingview.id" in sql and "deleted_at IS NOT NULL" in sql
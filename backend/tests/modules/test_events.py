@@ -0,0 +1,153 @@
+import asyncio
+import json
+import threading
+import uuid
+from datetime import timedelta
+
+import jwt
+import pytest
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.modules.tradingview.events import (
+    NOTIFY_MAX_BYTES,
+    EventBroker,
+    PostgresNotifyBackend,
+    create_stream_ticket,
+    make_event,
+    owner_channel,
+    project_channel,
+    psycopg_connect_factory,
+    sse_stream,
+    verify_stream_ticket,
+)
+
+
+def _event(type: str = "updated", tradingview_id=None, owner_id=None, **data):
+    return make_event(
+        type, tradingview_id or uuid.uuid4(), owner_id or uuid.uuid4(), data
+    )
+
+
+def test_fan_out_to_project_and_owner_channels_from_other_thread() -> None:
+    broker = EventBroker()
+    project, owner, other = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    async def run():
+        by_project = broker.subscribe([project_channel(project)])
+        by_owner = broker.subscribe([owner_channel(owner)])
+        unrelated = broker.subscribe([owner_channel(other)])
+        # 同步处理函数在线程池中发布
+        thread = threading.Thread(
+            target=broker.publish, args=(_event("bars", project, owner, close=1.5),)
+        )
+        thread.start()
+        thread.join()
+        received = [
+            await by_project.get(1.0),
+            await by_owner.get(1.0),
+            await unrelated.get(0.05),
+        ]
+        for subscription in (by_project, by_owner, unrelated):
+            broker.unsubscribe(subscription)
+        return received
+
+    first, second, missing = asyncio.run(run())
+    assert first["type"] == second["type"] == "bars"
+    assert first["data"] == {"close": 1.5}
+    assert missing is None
+    assert broker.subscriber_count == 0
+
+
+def test_slow_subscriber_gets_overflow_and_is_skipped() -> None:
+    broker = EventBroker(queue_size=2)
+    project = uuid.uuid4()
+
+    async def run():
+        subscription = broker.subscribe([project_channel(project)])
+        for i in range(5):
+            broker.publish(_event(tradingview_id=project, i=i))
+        await asyncio.sleep(0)
+        events = []
+        while not subscription.queue.empty():
+            events.append(subscription.queue.get_nowait())
+        return events
+
+    assert [e["type"] for e in asyncio.run(run())] == ["overflow"]
+
+
+def test_sse_stream_formats_events_and_nan_as_null() -> None:
+    broker = EventBroker()
+    project = uuid.uuid4()
+
+    async def run():
+        stream = sse_stream(broker, [project_channel(project)], heartbeat_seconds=0.05)
+        chunks = [await stream.__anext__()]
+        broker.publish(_event("bars", project, rsi=float("nan")))
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())
+        await stream.aclose()
+        return chunks
+
+    connected, event, ping = asyncio.run(run())
+    assert connected.startswith(":") and ping == ": ping\n\n"
+    lines = event.strip().split("\n")
+    assert lines[1] == "event: bars"
+    assert json.loads(lines[2][len("data: ") :])["data"] == {"rsi": None}
+    assert broker.subscriber_count == 0
+
+
+def test_notify_payload_is_truncated_and_own_notifications_skipped() -> None:
+    backend = PostgresNotifyBackend(lambda: None)
+    received = []
+    backend._deliver = received.append
+
+    large = backend.encode(_event(payload="x" * NOTIFY_MAX_BYTES))
+    assert len(large.encode()) <= NOTIFY_MAX_BYTES
+    assert json.loads(large)["truncated"] is True
+
+    backend._dispatch(backend.encode(_event()))
+    assert received == []
+    other = PostgresNotifyBackend(lambda: None)
+    backend._dispatch(other.encode(_event("deleted")))
+    assert [e["type"] for e in received] == ["deleted"]
+    assert "origin" not in received[0]
+
+
+def test_connect_factory_keeps_password_out_of_dsn(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    import psycopg
+
+    calls = []
+    monkeypatch.setattr(psycopg, "connect", lambda **kwargs: calls.append(kwargs))
+    url = make_url("postgresql+psycopg://app:s3cret@db:5433/app?sslmode=require")
+    backend = PostgresNotifyBackend(psycopg_connect_factory(url))
+    backend._connect()
+    assert calls == [
+        {
+            "host": "db",
+            "port": 5433,
+            "user": "app",
+            "password": "s3cret",
+            "dbname": "app",
+            "sslmode": "require",
+            "autocommit": True,
+        }
+    ]
+    assert "s3cret" not in repr(vars(backend)) + repr(url)
+
+
+def test_stream_ticket_is_single_purpose() -> None:
+    user_id = uuid.uuid4()
+    ticket = create_stream_ticket(user_id, 30)
+    assert verify_stream_ticket(ticket) == user_id
+    assert verify_stream_ticket(create_stream_ticket(user_id, -1)) is None
+    assert verify_stream_ticket("not-a-ticket") is None
+    # 访问令牌不能作为票据，票据也不能通过 API 鉴权
+    assert (
+        verify_stream_ticket(create_access_token(user_id, timedelta(minutes=5))) is None
+    )
+    with pytest.raises(jwt.InvalidAudienceError):
+        jwt.decode(ticket, settings.SECRET_KEY, algorithms=["HS256"])
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.indicators import (
+    IndicatorEngine,
+    bollinger,
+    ema,
+    nan_to_none,
+    parse_indicator_specs,
+    rsi,
+    sma,
+)
+
+rng = np.random.default_rng(42)
+CLOSE = 100 + np.cumsum(rng.normal(size=3000))
+
+
+def loop_ema(values: np.ndarray, period: int) -> np.ndarray:
+    alpha = 2 / (period + 1)
+    out = np.full(len(values), np.nan)
+    out[period - 1] = values[:period].mean()
+    for i in range(period, len(values)):
+        out[i] = alpha * values[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def loop_rsi(values: np.ndarray, period: int) -> np.ndarray:
+    delta = np.diff(values)
+    gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+    out = np.full(len(values), np.nan)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    out[period] = 100 - 100 / (1 + avg_gain / avg_loss)
+    for i in range(period, len(delta)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+        out[i + 1] = 100 - 100 / (1 + avg_gain / avg_loss)
+    return out
+
+
+@pytest.mark.parametrize("period", [2, 12, 200])
+def test_ema_matches_recursive_definition(period: int) -> None:
+    np.testing.assert_allclose(ema(CLOSE, period), loop_ema(CLOSE, period), rtol=1e-10)
+
+
+def test_rsi_matches_wilder_smoothing() -> None:
+    np.testing.assert_allclose(rsi(CLOSE, 14), loop_rsi(CLOSE, 14), rtol=1e-10)
+
+
+def test_sma_and_bollinger_match_rolling_window() -> None:
+    windows = np.lib.stride_tricks.sliding_window_view(CLOSE, 20)
+    np.testing.assert_allclose(sma(CLOSE, 20)[19:], windows.mean(axis=1))
+    bands = bollinger(CLOSE, 20, 2)
+    np.testing.assert_allclose(
+        bands["upper"][19:], windows.mean(axis=1) + 2 * windows.std(axis=1)
+    )
+    assert np.isnan(bands["lower"][:19]).all()
+
+
+def test_engine_computes_several_indicators() -> None:
+    t = np.arange(len(CLOSE)) * 60
+    bars = BarSeries.from_columns("BTCUSD", "1m", t, CLOSE, CLOSE, CLOSE, CLOSE)
+    specs = parse_indicator_specs("ema:12,macd,bb:20:2.5,rsi")
+    results = IndicatorEngine(bars).compute(specs)
+    assert set(results) == {"ema_12", "macd_12_26_9", "bb_20_2.5", "rsi_14"}
+    np.testing.assert_allclose(
+        results["macd_12_26_9"]["macd"], ema(CLOSE, 12) - ema(CLOSE, 26), equal_nan=True
+    )
+    assert nan_to_none(results["rsi_14"]["value"][:2]) == [None, None]
+
+
+def test_parse_indicator_specs_rejects_unknown() -> None:
+    with pytest.raises(ValueError):
+        parse_indicator_specs("foo:1")
+    with pytest.raises(ValueError):
+        parse_indicator_specs("sma:0")
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        "rsi:0.5",
+        "sma:0.5",
+        "macd:0.5:0.5:0.5",
+        "ema:1",
+        "rsi:1",
+        "macd:12:26:1",
+        "bb:20:nan",
+        "sma:inf",
+    ],
+)
+def test_parse_indicator_specs_requires_integer_periods(spec: str) -> None:
+    with pytest.raises(ValueError):
+        parse_indicator_specs(spec)
+
+
+def test_parse_indicator_specs_accepts_minimum_periods() -> None:
+    assert parse_indicator_specs("sma:1,ema:2,rsi:2,bb:1:0.5") == [
+        ("sma", (1.0,)),
+        ("ema", (2.0,)),
+        ("rsi", (2.0,)),
+        ("bb", (1.0, 0.5)),
+    ]
+
+
+def test_rsi_rejects_non_positive_period() -> None:
+    with pytest.raises(ValueError):
+        rsi(CLOSE, 0)
@@ -0,0 +1,18 @@
+from app.modules.migration_manager import ModuleMigrationManager
+
+
+def test_manifest_is_cached_and_cwd_independent(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    manager = ModuleMigrationManager()
+
+    manifest = manager.manifest
+    assert "001_initial_tradingview_table" in manifest["tradingview"]
+    assert all(len(checksum) == 64 for checksum in manifest["core"].values())
+    assert manager.manifest is manifest
+
+
+def test_schema_version_hash_tracks_enabled_modules() -> None:
+    manager = ModuleMigrationManager()
+    core_only = manager.schema_version_hash(["core"])
+    assert core_only == manager.schema_version_hash(["core"])
+    assert core_only != manager.schema_version_hash(["core", "items"])
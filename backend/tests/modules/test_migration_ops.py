@@ -0,0 +1,148 @@
+import uuid
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app.modules.migration_dry_run import split_sql
+from app.modules.migration_ops import (
+    BackfillProgress,
+    backfill,
+    create_index_concurrently,
+    drop_index_concurrently,
+    execute_with_lock_timeout,
+    pop_online_statements,
+    run_backfill,
+)
+
+
+def test_concurrent_index_statements_are_deferred() -> None:
+    session = Session()
+    create_index_concurrently(
+        session, "idx_item_title", "item", ["title"], where="title IS NOT NULL"
+    )
+    drop_index_concurrently(session, "idx_item_old")
+
+    assert pop_online_statements(session) == [
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_item_title ON "item" (title) WHERE title IS NOT NULL',
+        "DROP INDEX CONCURRENTLY IF EXISTS idx_item_old",
+    ]
+    assert pop_online_statements(session) == []
+
+
+def test_backfill_is_deferred() -> None:
+    session = Session()
+    backfill(session, "item", "title = lower(title)", batch_size=10)
+
+    operations = pop_online_statements(session)
+    assert len(operations) == 1
+    assert callable(operations[0])
+
+
+def test_backfill_progress() -> None:
+    progress = BackfillProgress(
+        table="item",
+        rows_done=250,
+        batches=5,
+        estimated_total=1000,
+        elapsed_seconds=2.0,
+    )
+    assert progress.percent == 25.0
+    assert progress.rows_per_second == 125.0
+
+    unknown = BackfillProgress(
+        table="item", rows_done=10, batches=1, estimated_total=0, elapsed_seconds=0.0
+    )
+    assert unknown.percent is None
+    assert unknown.rows_per_second == 0.0
+
+
+def test_split_sql() -> None:
+    sql = """
+        CREATE TABLE t (id int, note text DEFAULT 'a;b');
+        -- comment; with semicolon
+        CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql;
+        CREATE INDEX idx_t ON t (id)
+    """
+    assert split_sql(sql) == [
+        "CREATE TABLE t (id int, note text DEFAULT 'a;b')",
+        "CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql",
+        "CREATE INDEX idx_t ON t (id)",
+    ]
+
+
+class _RecordingSession:
+    """记录执行的 SQL，第一次执行 DDL 时模拟 lock_timeout"""
+
+    def __init__(self) -> None:
+        self.executed: list[tuple[str, dict]] = []
+        self.failures = 1
+
+    def begin_nested(self) -> nullcontext:
+        return nullcontext()
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.executed.append((sql, params or {}))
+        if sql.startswith("ALTER") and self.failures:
+            self.failures -= 1
+            raise OperationalError(sql, params, SimpleNamespace(sqlstate="55P03"))
+        return SimpleNamespace(scalar=lambda: "0")
+
+
+def test_lock_timeout_is_restored_after_each_attempt() -> None:
+    session = _RecordingSession()
+    execute_with_lock_timeout(
+        session, "ALTER TABLE item ADD COLUMN x int", backoff_seconds=0
+    )
+
+    settings = [params for sql, params in session.executed if "set_config" in sql]
+    assert settings == [{"timeout": "3s"}, {"previous": "0"}] * 2
+    assert "set_config" in session.executed[-1][0]
+
+
+class _UUIDTable:
+    """以 UUID 为主键的表：按 SQL 中的游标条件返回下一批主键"""
+
+    def __init__(self, rows: int) -> None:
+        self.keys = sorted(uuid.uuid4() for _ in range(rows))
+        self.executed: list[tuple[str, dict]] = []
+
+    @contextmanager
+    def connect(self):
+        yield self
+
+    begin = connect
+
+    def execute(self, statement, params=None):
+        sql, params = str(statement), params or {}
+        self.executed.append((sql, params))
+        if "pg_class" in sql:
+            return SimpleNamespace(scalar=lambda: len(self.keys))
+        if "UPDATE" not in sql:
+            return None
+        keys = [
+            k for k in self.keys if "last_key" not in params or k > params["last_key"]
+        ]
+        return [(k,) for k in keys[: params["batch_size"]]]
+
+
+def test_backfill_walks_uuid_keys_without_min() -> None:
+    table = _UUIDTable(5)
+    assert (
+        run_backfill(
+            table, "item", "title = lower(title)", batch_size=2, pause_seconds=0
+        )
+        == 5
+    )
+
+    updates = [(sql, params) for sql, params in table.executed if "UPDATE" in sql]
+    assert len(updates) == 3
+    # Postgres 没有 min(uuid)，第一批不设下界
+    assert not any("MIN(" in sql.upper() for sql, _ in table.executed)
+    assert ":last_key" not in updates[0][0] and "last_key" not in updates[0][1]
+    assert [params["last_key"] for _, params in updates[1:]] == [
+        table.keys[1],
+        table.keys[3],
+    ]
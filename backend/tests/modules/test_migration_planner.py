@@ -0,0 +1,18 @@
+import pytest
+
+from app.modules.migration_planner import sort_modules
+
+
+def test_sort_modules_groups_independent_modules() -> None:
+    waves = sort_modules({"core": [], "items": ["core"], "tradingview": ["core"]})
+    assert waves == [["core"], ["items", "tradingview"]]
+
+
+def test_sort_modules_missing_dependency() -> None:
+    with pytest.raises(RuntimeError):
+        sort_modules({"items": ["core"]})
+
+
+def test_sort_modules_cycle() -> None:
+    with pytest.raises(RuntimeError):
+        sort_modules({"core": [], "a": ["b"], "b": ["a"]})
@@ -0,0 +1,88 @@
+from importlib.metadata import EntryPoint
+
+import pytest
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+
+import app.main
+from app import modules
+from app.modules import ModuleRegistry, resolve_module_path
+
+
+class _DemoModule:
+    """通过 entry point 注册的第三方模块"""
+
+    def get_router(self) -> APIRouter:
+        return APIRouter()
+
+    def get_models(self) -> list:
+        return []
+
+
+@pytest.fixture
+def demo_entry_point(monkeypatch: pytest.MonkeyPatch) -> None:
+    entry_point = EntryPoint(
+        name="demo",
+        value=f"{__name__}:_DemoModule",
+        group=modules.MODULE_ENTRY_POINT_GROUP,
+    )
+    monkeypatch.setattr(
+        modules,
+        "entry_points",
+        lambda group: (
+            [entry_point] if group == modules.MODULE_ENTRY_POINT_GROUP else []
+        ),
+    )
+
+
+def test_builtin_module_is_resolved_and_loaded() -> None:
+    assert resolve_module_path("items") == "app.modules.items:ItemsModule"
+    registry = ModuleRegistry()
+    assert registry.load_module("items")
+    assert registry.modules["items"]["enabled"]
+    assert set(registry.startup_timings["items"]) == {"import_ms", "setup_ms"}
+
+
+@pytest.mark.usefixtures("demo_entry_point")
+def test_entry_point_module_is_resolved_and_loaded() -> None:
+    assert resolve_module_path("demo") == f"{__name__}:_DemoModule"
+    registry = ModuleRegistry()
+    assert registry.load_module("demo")
+    assert isinstance(registry.modules["demo"]["instance"], _DemoModule)
+
+
+@pytest.mark.usefixtures("demo_entry_point")
+def test_unknown_module_raises() -> None:
+    assert resolve_module_path("missing") is None
+    with pytest.raises(ValueError, match="未知模块: missing"):
+        ModuleRegistry().load_module("missing")
+
+
+def test_startup_report_sums_phases_once() -> None:
+    registry = ModuleRegistry()
+    registry.record_timing("core", "import_ms", 10.0)
+    registry.record_timing("core", "router_ms", 2.5)
+    registry.record_timing("items", "setup_ms", 1.0)
+    # 并发执行的迁移按整体墙钟时间计入，不再累加各模块的迁移耗时
+    registry.record_timing("core", "migration_ms", 40.0)
+    registry.record_timing("items", "migration_ms", 30.0)
+    registry.record_phase("migrations_ms", 45.0)
+
+    report = registry.startup_report()
+    assert report["modules"] == {
+        "core": {"import_ms": 10.0, "router_ms": 2.5, "migration_ms": 40.0},
+        "items": {"setup_ms": 1.0, "migration_ms": 30.0},
+    }
+    assert report["phases"] == {"migrations_ms": 45.0}
+    assert report["total_ms"] == 58.5
+
+
+def test_startup_endpoint_returns_report(monkeypatch: pytest.MonkeyPatch) -> None:
+    registry = ModuleRegistry()
+    registry.record_timing("core", "import_ms", 3.0)
+    registry.record_phase("migrations_ms", 4.0)
+    monkeypatch.setattr(app.main, "registry", registry)
+
+    response = TestClient(app.main.app).get("/modules/startup")
+    assert response.status_code == 200
+    assert response.json() == registry.startup_report()
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.resample import (
+    check_resample,
+    parse_timeframe,
+    resample,
+    validate_rollup_chain,
+)
+
+
+def _minute_bars(n: int = 1000, seed: int = 5) -> BarSeries:
+    rng = np.random.default_rng(seed)
+    # 随机缺失约 20% 的分钟
+    t = np.flatnonzero(rng.random(n) > 0.2) * 60 + 1_704_067_200
+    close = 100 + np.cumsum(rng.normal(size=len(t)))
+    open_ = close + rng.normal(size=len(t))
+    return BarSeries.from_columns(
+        "BTCUSD",
+        "1m",
+        t,
+        open_,
+        np.maximum(open_, close) + 1,
+        np.minimum(open_, close) - 1,
+        close,
+        rng.random(len(t)) * 10,
+    )
+
+
+def _reference(bars: BarSeries, seconds: int) -> dict:
+    groups: dict = {}
+    columns = (bars.t, bars.open, bars.high, bars.low, bars.close, bars.volume)
+    for ts, o, h, lo, c, v in zip(*columns, strict=True):
+        key = int(ts) - int(ts) % seconds
+        if key not in groups:
+            groups[key] = [o, h, lo, c, v]
+        else:
+            group = groups[key]
+            group[1], group[2], group[3], group[4] = (
+                max(group[1], h),
+                min(group[2], lo),
+                c,
+                group[4] + v,
+            )
+    return groups
+
+
+@pytest.mark.parametrize("timeframe", ["5m", "15m", "1h", "2h", "1d"])
+def test_resample_matches_group_by(timeframe: str) -> None:
+    bars = _minute_bars()
+    result = resample(bars, timeframe)
+    expected = _reference(bars, parse_timeframe(timeframe))
+    assert result.timeframe == timeframe
+    assert result.t.tolist() == list(expected)
+    rows = np.array(list(expected.values()))
+    for i, col in enumerate(("open", "high", "low", "close", "volume")):
+        np.testing.assert_allclose(getattr(result, col), rows[:, i])
+
+
+def test_cascaded_resample_equals_direct() -> None:
+    bars = _minute_bars()
+    cascaded = resample(resample(bars, "5m"), "1h")
+    direct = resample(bars, "1h")
+    assert cascaded.t.tolist() == direct.t.tolist()
+    np.testing.assert_allclose(cascaded.volume, direct.volume)
+    np.testing.assert_array_equal(cascaded.high, direct.high)
+
+
+def test_timeframe_validation() -> None:
+    assert parse_timeframe("4h") == 4 * 3600
+    assert parse_timeframe("3d") == 3 * 86400
+    assert check_resample("5m", "1h") == 3600
+    for source, target in (("1h", "5m"), ("5m", "7m"), ("1m", "1m")):
+        with pytest.raises(ValueError):
+            check_resample(source, target)
+    with pytest.raises(ValueError):
+        parse_timeframe("1w")
+    with pytest.raises(ValueError):
+        validate_rollup_chain("1m", ["5m", "2h"])
+    assert resample(BarSeries.empty("BTCUSD", "1m"), "5m").timeframe == "5m"
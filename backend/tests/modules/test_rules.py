@@ -0,0 +1,142 @@
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.models import TradingViewAlertRule
+from app.modules.tradingview.rules import (
+    MAX_INDICATOR_LOOKBACK,
+    CompiledRule,
+    RuleFrame,
+    apply_cooldown,
+    find_candidates,
+    validate_rule,
+)
+
+SPEC = "sma:20,rsi:14,macd:12:26:9"
+
+
+def _rule(**fields) -> CompiledRule:
+    defaults = {
+        "id": uuid.uuid4(),
+        "tradingview_id": uuid.uuid4(),
+        "name": "rule",
+        "symbol": "BTCUSD",
+        "timeframe": "1m",
+        "source": "close",
+        "created_at": datetime.now(timezone.utc),
+    }
+    return CompiledRule(TradingViewAlertRule(**{**defaults, **fields}))
+
+
+def _frame(closes, indicators=None) -> RuleFrame:
+    t = np.arange(len(closes)) * 60
+    bars = BarSeries.from_columns("BTCUSD", "1m", t, closes, closes, closes, closes)
+    return RuleFrame(
+        bars, dict(zip(t.tolist(), indicators, strict=True)) if indicators else {}
+    )
+
+
+def _fired(
+    rule: CompiledRule, closes, indicators=None, last_fired=None, start: int = 0
+) -> list:
+    """在窗口中从 start 开始的每根K线上评估，返回各K线是否触发"""
+    frame = _frame(closes, indicators)
+    candidates = find_candidates([rule], frame, list(range(start, len(frame))))
+    fired = {ts for _, ts, _ in apply_cooldown(candidates, {rule.rule.id: last_fired})}
+    return [ts in fired for ts in frame.t[start:]]
+
+
+def test_threshold_respects_cooldown() -> None:
+    rule = _rule(kind="threshold", op="above", value=100, cooldown_seconds=120)
+    assert _fired(rule, [99, 101, 102, 103, 104]) == [False, True, False, True, False]
+    # 其他 worker 已在第 1 根K线触发（数据库中的 last_fired_at）
+    assert _fired(rule, [99, 101, 102, 103, 104], last_fired=60) == [
+        False,
+        False,
+        False,
+        True,
+        False,
+    ]
+
+
+def test_same_bar_fires_once() -> None:
+    rule = _rule(kind="threshold", op="above", value=100)
+    # 最后一根K线被再次推送：已在该K线触发过，不再触发
+    assert _fired(rule, [99, 101, 102], last_fired=120) == [False, False, False]
+    assert _fired(rule, [99, 101, 102], last_fired=60, start=2) == [True]
+
+
+def test_cross_uses_previous_bar_in_window() -> None:
+    rule = _rule(kind="cross", op="above", value=100)
+    assert _fired(rule, [99, 98, 101, 103, 99, 101]) == [
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    # 只评估最后一根时，上一根仍取自窗口
+    assert _fired(rule, [98, 101], start=1) == [True]
+    assert _fired(rule, [101], start=0) == [False]
+
+
+def test_cross_against_indicator() -> None:
+    rule = _rule(kind="cross", op="below", source="close", target="sma_20.value")
+    sma = [{"sma_20": {"value": 100.0}}] * 2 + [{"sma_20": {"value": float("nan")}}]
+    candidates = find_candidates([rule], _frame([101, 99, 99], sma), [1, 2])
+    assert [(ts, value) for _, ts, value in candidates] == [(60, 99)]
+    alert = rule.alert(60, 99)
+    assert alert["value"] == 99 and alert["t"] == 60 and alert["source"] == "rule"
+    # 缺少该K线的指标值（如超出保留的 history）时不触发
+    assert find_candidates([rule], _frame([101, 99]), [1]) == []
+
+
+def test_percent_change_over_lookback() -> None:
+    rule = _rule(kind="percent_change", op="below", value=-5, lookback=2)
+    # 94 / 100、94 / 99 均跌超 5%，90 / 94 未达到
+    assert _fired(rule, [100, 99, 94, 94, 90]) == [False, False, True, True, False]
+
+
+def test_windows() -> None:
+    assert _rule(kind="threshold", op="above").window == 0
+    assert _rule(kind="cross", op="above", target="sma_20.value").indicator_window == 2
+    assert _rule(kind="percent_change", op="above", lookback=5).window == 5
+    assert _rule(kind="percent_change", op="above", lookback=5).indicator_window == 0
+    assert (
+        _rule(
+            kind="percent_change", op="above", source="rsi_14.value", lookback=5
+        ).indicator_window
+        == 6
+    )
+
+
+def test_validate_rule() -> None:
+    validate_rule("cross", "close", "macd_12_26_9.signal", SPEC)
+    with pytest.raises(ValueError):
+        validate_rule("threshold", "rsi_7.value", None, SPEC)
+    with pytest.raises(ValueError):
+        validate_rule("threshold", "close", "sma_20.value", SPEC)
+    validate_rule("percent_change", "close", None, SPEC, lookback=1000)
+    validate_rule(
+        "percent_change", "rsi_14.value", None, SPEC, lookback=MAX_INDICATOR_LOOKBACK
+    )
+    with pytest.raises(ValueError, match="lookback"):
+        validate_rule(
+            "percent_change",
+            "rsi_14.value",
+            None,
+            SPEC,
+            lookback=MAX_INDICATOR_LOOKBACK + 1,
+        )
+
+
+def test_indicator_window_is_capped() -> None:
+    # 已存在的大 lookback 指标规则不会让每次写入持久化上千份指标快照
+    rule = _rule(
+        kind="percent_change", op="above", source="rsi_14.value", lookback=1000
+    )
+    assert rule.indicator_window == MAX_INDICATOR_LOOKBACK + 1
@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.indicators import IndicatorEngine, parse_indicator_specs
+from app.modules.tradingview.streaming import IndicatorSet
+
+SPEC = "sma:20,ema:12,rsi:14,macd:12:26:9,bb:20:2"
+
+
+def _bars(n: int = 500, seed: int = 3) -> BarSeries:
+    close = 30_000 + np.cumsum(np.random.default_rng(seed).normal(scale=25, size=n))
+    return BarSeries.from_columns(
+        "BTCUSD", "1m", np.arange(n) * 60, close, close, close, close
+    )
+
+
+def _assert_matches_batch(indicator_set: IndicatorSet, bars: BarSeries) -> None:
+    batch = IndicatorEngine(bars).compute(parse_indicator_specs(SPEC))
+    for label, outputs in batch.items():
+        for field, values in outputs.items():
+            assert indicator_set.values[label][field] == pytest.approx(
+                values[-1], rel=1e-9
+            ), (label, field)
+
+
+def test_incremental_matches_vectorized() -> None:
+    bars = _bars()
+    indicator_set = IndicatorSet(SPEC)
+    assert indicator_set.apply(bars) == len(bars)
+    _assert_matches_batch(indicator_set, bars)
+
+
+def test_warmup_values_are_null() -> None:
+    indicator_set = IndicatorSet(SPEC)
+    indicator_set.apply(_bars(5))
+    latest = indicator_set.latest()
+    assert latest["t"] == 240
+    assert latest["values"]["sma_20"]["value"] is None
+    assert latest["values"]["rsi_14"]["value"] is None
+
+
+def test_repeated_timestamp_replaces_last_bar() -> None:
+    bars = _bars()
+    indicator_set = IndicatorSet(SPEC)
+    indicator_set.apply(bars)
+    # 未走完的K线被多次推送，最终值与只推送最后一次相同
+    for close in (29_000.0, 31_000.0, bars.close[-1]):
+        indicator_set.update(int(bars.t[-1]), close)
+    _assert_matches_batch(indicator_set, bars)
+    assert indicator_set.update(int(bars.t[-2]), 1.0) is False
+
+
+def test_state_round_trip() -> None:
+    bars = _bars()
+    indicator_set = IndicatorSet(SPEC)
+    indicator_set.apply(
+        BarSeries(
+            bars.symbol,
+            bars.timeframe,
+            *(
+                getattr(bars, col)[:-50]
+                for col in ("t", "open", "high", "low", "close", "volume")
+            ),
+        )
+    )
+    state = json.loads(json.dumps(indicator_set.to_state(), allow_nan=False))
+    restored = IndicatorSet.from_state(state, version=1)
+    restored.apply(
+        BarSeries(
+            bars.symbol,
+            bars.timeframe,
+            *(
+                getattr(bars, col)[-50:]
+                for col in ("t", "open", "high", "low", "close", "volume")
+            ),
+        )
+    )
+    _assert_matches_batch(restored, bars)
+
+
+def test_history_survives_state_round_trip() -> None:
+    bars = _bars(30)
+    indicator_set = IndicatorSet(SPEC)
+    indicator_set.history_size = 3
+    indicator_set.apply(bars)
+    state = json.loads(json.dumps(indicator_set.to_state(), allow_nan=False))
+    restored = IndicatorSet.from_state(state, version=1)
+    assert [ts for ts, _ in restored.history] == [1620, 1680, 1740]
+    assert restored.history_size == 3
+    assert restored.history[-1][1]["sma_20"]["value"] == pytest.approx(
+        indicator_set.values["sma_20"]["value"]
+    )
+    # 本批之前的 history 保留，供规则取上一根K线的指标值
+    restored.update(1800, 1.0)
+    assert [ts for ts, _ in restored.history] == [1620, 1680, 1740, 1800]
@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from app.modules.tradingview.backtest import backtest_strategy
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.sweep import (
+    SharedBars,
+    SweepRunner,
+    attach,
+    default_workers,
+    expand_grid,
+    run_chunk,
+    stream_sweep,
+    summarize,
+)
+
+BASE = {"fast": 10, "slow": 30, "ma": "ema", "allow_short": False}
+
+
+def _bars(n: int = 3000) -> BarSeries:
+    close = 100 * np.exp(
+        np.cumsum(np.random.default_rng(4).normal(scale=0.002, size=n))
+    )
+    return BarSeries.from_columns(
+        "BTCUSD", "1m", np.arange(n) * 60, close, close, close, close
+    )
+
+
+def test_expand_grid_skips_invalid_combinations() -> None:
+    combinations, skipped = expand_grid(
+        "ma_cross", BASE, {"fast": [5, 20], "slow": [10, 40]}, 100
+    )
+    assert [(c["fast"], c["slow"]) for c in combinations] == [
+        (5, 10),
+        (5, 40),
+        (20, 40),
+    ]
+    assert skipped == 1
+    for grid in (
+        {"fast": list(range(1, 30)), "slow": list(range(31, 70))},
+        {"window": [1]},
+        {"fast": []},
+    ):
+        with pytest.raises(ValueError):
+            expand_grid("ma_cross", BASE, grid, 1000)
+
+
+def test_shared_bars_are_memory_mapped() -> None:
+    bars = _bars()
+    shared = SharedBars.create(bars)
+    try:
+        attached = attach(shared)
+        assert isinstance(attached.close, np.memmap)
+        np.testing.assert_array_equal(attached.close, bars.close)
+        np.testing.assert_array_equal(attached.t, bars.t)
+        result = run_chunk(shared, "ma_cross", [(3, BASE)], fee_bps=1.0)
+        assert result == [
+            {
+                "index": 3,
+                "params": BASE,
+                "metrics": backtest_strategy(bars, "ma_cross", BASE, 1.0).metrics,
+            }
+        ]
+    finally:
+        shared.remove()
+    assert not os.path.exists(shared.path)
+
+
+def test_sweep_streams_every_combination() -> None:
+    bars = _bars()
+    combinations, skipped = expand_grid(
+        "ma_cross", BASE, {"fast": [5, 10], "slow": [20, 50, 100]}, 100
+    )
+    runner = SweepRunner(max_workers=1)
+    try:
+        results = list(
+            stream_sweep(
+                runner, bars, "ma_cross", combinations, skipped, 0.0, "sharpe", 2
+            )
+        )
+    finally:
+        runner.shutdown()
+    summary = results.pop()
+    assert summary["done"] and summary["total"] == 6 and summary["failed"] == 0
+    assert sorted(r["index"] for r in results) == list(range(6))
+    best = max(results, key=lambda r: r["metrics"]["sharpe"])
+    assert summary["best"][0] == best
+
+
+class _FlakyPool:
+    """第一块模拟子进程崩溃，其余块在当前进程中执行"""
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.shut_down = False
+
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        self.submitted += 1
+        if self.submitted == 1:
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait: bool, cancel_futures: bool) -> None:
+        self.shut_down = True
+
+
+def test_failed_chunk_yields_errors_and_summary() -> None:
+    combinations, skipped = expand_grid(
+        "ma_cross", BASE, {"fast": [5, 10], "slow": [20, 50, 100]}, 100
+    )
+    runner = SweepRunner(max_workers=1, chunks_per_worker=2)
+    pool = runner._executor = _FlakyPool()
+    results = list(
+        stream_sweep(
+            runner, _bars(), "ma_cross", combinations, skipped, 0.0, "sharpe", 2
+        )
+    )
+
+    summary = results.pop()
+    assert summary["done"] and summary["failed"] == 3 and "error" not in summary
+    assert sorted(r["index"] for r in results) == list(range(6))
+    assert sum("error" in r for r in results) == 3
+    assert len(summary["best"]) == 2
+    # 崩溃的进程池被丢弃，下次扫描重新创建
+    assert pool.shut_down and runner._executor is None
+
+
+def test_default_workers_split_cpus_between_web_workers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert default_workers() == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert default_workers() == 1
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    assert default_workers() == 8
+
+
+def test_summary_is_yielded_when_sweep_cannot_start(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def no_space(_bars):
+        raise OSError("no space left on device")
+
+    monkeypatch.setattr(SharedBars, "create", staticmethod(no_space))
+    results = list(
+        stream_sweep(
+            SweepRunner(max_workers=1),
+            _bars(100),
+            "ma_cross",
+            [BASE],
+            0,
+            0.0,
+            "sharpe",
+            1,
+        )
+    )
+    assert results == [
+        {
+            "done": True,
+            "total": 1,
+            "failed": 0,
+            "skipped": 0,
+            "elapsed_ms": results[0]["elapsed_ms"],
+            "best": [],
+            "error": "no space left on device",
+        }
+    ]
+
+
+def test_summarize_ranks_null_metrics_last() -> None:
+    results = [
+        {"index": 0, "metrics": {"sharpe": None, "max_drawdown": None}},
+        {"index": 1, "metrics": {"sharpe": 1.0, "max_drawdown": 0.3}},
+        {"index": 2, "error": "bad params"},
+        {"index": 3, "metrics": {"sharpe": 2.0, "max_drawdown": 0.1}},
+    ]
+    assert [r["index"] for r in summarize(results, "sharpe", 3)] == [3, 1, 0]
+    assert [r["index"] for r in summarize(results, "max_drawdown", 3)] == [3, 1, 0]
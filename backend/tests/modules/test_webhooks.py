@@ -0,0 +1,88 @@
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.modules.tradingview import webhooks
+from app.modules.tradingview.webhooks import AlertWriter, WebhookSecretCache
+
+
+@pytest.fixture
+def secrets(monkeypatch: pytest.MonkeyPatch) -> dict:
+    """以字典代替 tradingview 表，记录查库次数"""
+    table: dict = {"queries": 0}
+
+    class _Session:
+        def __init__(self, engine) -> None:
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc) -> None:
+            pass
+
+        def execute(self, statement):
+            table["queries"] += 1
+            tradingview_id = statement.whereclause.right.value
+            row = table.get(tradingview_id)
+            return SimpleNamespace(first=lambda: row)
+
+    monkeypatch.setattr(webhooks, "Session", _Session)
+    return table
+
+
+def test_secret_cache_is_bounded_lru(secrets: dict) -> None:
+    cache = WebhookSecretCache(engine=None, max_entries=2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    for tradingview_id in (first, second, third):
+        secrets[tradingview_id] = ("s", uuid.uuid4())
+
+    cache.load(first)
+    cache.load(second)
+    assert cache.get_cached(first) == (True, "s")
+    cache.load(third)
+
+    assert len(cache._entries) == 2
+    assert cache.get_cached(first)[0] and cache.get_cached(third)[0]
+    assert cache.get_cached(second) == (False, None)
+
+
+def test_missing_project_is_cached_briefly(secrets: dict) -> None:
+    cache = WebhookSecretCache(engine=None, negative_ttl_seconds=0)
+    missing = uuid.uuid4()
+
+    assert cache.load(missing) is None
+    assert cache.get_cached(missing) == (False, None)
+    assert secrets["queries"] == 1
+
+
+class _Engine:
+    """批量插入中含有已删除项目的告警时抛出外键错误"""
+
+    def __init__(self, dead: uuid.UUID) -> None:
+        self.dead = dead
+        self.inserted: list = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement, rows) -> None:
+        if any(row["tradingview_id"] == self.dead for row in rows):
+            raise IntegrityError(str(statement), rows, Exception("foreign key"))
+        self.inserted.extend(rows)
+
+
+def test_alert_writer_drops_only_rows_violating_constraints() -> None:
+    alive, dead = uuid.uuid4(), uuid.uuid4()
+    engine = _Engine(dead)
+    writer = AlertWriter(engine)
+    for tradingview_id in (alive, dead, alive):
+        writer.submit(tradingview_id, {"action": "buy"})
+    writer.stop()
+
+    assert [row["tradingview_id"] for row in engine.inserted] == [alive, alive]
+    assert (writer.written, writer.dropped) == (2, 1)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from app.modules.tradingview.bars import BarSeries
+from app.modules.tradingview.wire import (
+    MEDIA_TYPE,
+    bars_columns,
+    decode_series,
+    encode_series,
+    negotiate,
+)
+
+
+def _bars(n: int = 1000) -> BarSeries:
+    close = 100 + np.cumsum(np.random.default_rng(7).normal(size=n))
+    return BarSeries.from_columns(
+        "BTCUSD",
+        "1m",
+        1_704_067_200 + np.arange(n) * 60,
+        close,
+        close + 1,
+        close - 1,
+        close,
+    )
+
+
+@pytest.mark.parametrize("delta", [False, True])
+def test_round_trip(delta: bool) -> None:
+    bars = _bars()
+    body = encode_series({"symbol": "BTCUSD"}, bars_columns(bars), delta=delta)
+    meta, columns = decode_series(body)
+    assert meta == {"symbol": "BTCUSD"}
+    np.testing.assert_array_equal(columns["t"], bars.t)
+    np.testing.assert_array_equal(columns["c"], bars.close)
+    # 每列 8 字节对齐，浮点列可直接建视图
+    assert not columns["c"].flags.owndata
+
+
+def test_delta_encoding_shrinks_timestamps() -> None:
+    columns = bars_columns(_bars())
+    plain = encode_series({}, columns)
+    delta = encode_series({}, columns, delta=True)
+    # 时间戳列由 int64 变为 int32，头部略长
+    assert len(plain) - len(delta) >= 1000 * 4 - 64
+
+
+def test_nan_and_empty_columns() -> None:
+    values = np.array([np.nan, 1.5, 2.5])
+    _, columns = decode_series(
+        encode_series({}, {"t": np.arange(3), "sma_2.value": values}, delta=True)
+    )
+    np.testing.assert_array_equal(columns["sma_2.value"], values)
+    _, columns = decode_series(
+        encode_series({}, {"t": np.empty(0, dtype=np.int64)}, delta=True)
+    )
+    assert len(columns["t"]) == 0
+
+
+def test_negotiate() -> None:
+    assert negotiate(None) is None
+    assert negotiate("application/json") is None
+    assert negotiate(f"application/json, {MEDIA_TYPE}") is False
+    assert negotiate(f"{MEDIA_TYPE}; delta=1") is True
+    assert negotiate(f"{MEDIA_TYPE};q=0") is None
+    with pytest.raises(ValueError):
+        decode_series(b"{}")
@@ -0,0 +1,29 @@
+from benchmarks.http_load import ScenarioResult, find_regressions, percentile
+
+
+def test_percentile_nearest_rank() -> None:
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_find_regressions() -> None:
+    baseline = {"list_items": {"p95_ms": 10.0, "rps": 1000.0}}
+    assert (
+        find_regressions({"list_items": {"p95_ms": 11.0, "rps": 950.0}}, baseline, 0.2)
+        == []
+    )
+    regressions = find_regressions(
+        {"list_items": {"p95_ms": 15.0, "rps": 700.0}}, baseline, 0.2
+    )
+    assert len(regressions) == 2
+
+
+def test_scenario_result_from_latencies() -> None:
+    result = ScenarioResult.from_latencies(
+        "login", [0.01] * 10, errors=1, wall_seconds=0.5
+    )
+    assert result.requests == 10
+    assert result.rps == 20.0
+    assert result.p95_ms == 10.0
@@ -0,0 +1,23 @@
+from benchmarks import micro
+from benchmarks.micro import BENCHMARKS, find_regressions, run_benchmark
+
+
+def test_benchmarks_run(monkeypatch) -> None:
+    # 测试中只验证基准可以运行，K线数量缩小到 2000 根；完整规模用 python -m benchmarks.micro
+    monkeypatch.setattr(micro, "INDICATOR_BARS", 2000)
+    for name, setup in BENCHMARKS.items():
+        # 单次耗时以秒计的基准不在测试中运行
+        if name == "security.verify_password":
+            continue
+        result = run_benchmark(name, setup(), min_time=0.001, rounds=2)
+        assert result.median_us > 0
+
+
+def test_find_regressions() -> None:
+    saved = {"a": {"median_us": 10.0}, "b": {"median_us": 10.0}}
+    results = {
+        "a": {"median_us": 11.0},
+        "b": {"median_us": 13.0},
+        "c": {"median_us": 1.0},
+    }
+    assert find_regressions(results, saved, 0.15) == ["b: 10.0us -> 13.0us"]